@@ -1,35 +1,106 @@
 import copy
 import csv
+import os
 from collections import namedtuple
 from dataclasses import dataclass
-from typing import Tuple, Union
-import dice
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Tuple, Union
 
 import numpy as np
 
-
-@dataclass
+from diceengine import DiceExpression, compile_dice, rolls_from_uniforms
+from schema import Field, Schema
+from weathercodes import CloudCover, PrecipitationType, WindStrength, CLOUD_COVERS, PRECIPITATION_LABELS, \
+    PRECIPITATION_TYPES, PRECIPITATION_WARNINGS, WIND_STRENGTHS
+
+PRECIPITATION_TABLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "precipitation_tables.csv")
+
+_D100 = compile_dice("1d100")
+_D24_START = compile_dice("1d24-1")
+_D360_DIRECTION = compile_dice("1d360-1")
+_NIGHT_TEMPERATURE_DROP = compile_dice("2d6+3")
+_DAILY_TEMPERATURE_VARIATION = compile_dice("2d6-7")
+
+# Every random decision made during a day is taken from its own column of a per-day table of uniform random numbers.
+# That way the hour by hour and the day at a time generators roll exactly the same dice for the same day.
+_TEMPERATURE_TABLE = slice(0, 1)
+_TEMPERATURE_VARIATION = slice(1, 4)
+_TEMPERATURE_DURATION = slice(4, 5)
+_REFRESH_DAYTIME_TEMPERATURE = slice(5, 7)
+_NIGHT_TEMPERATURE = slice(7, 9)
+_EVENING_DAYTIME_TEMPERATURE = slice(9, 11)
+_PRECIPITATION_CHECK = slice(11, 12)
+_PRECIPITATION_TABLE = slice(12, 13)
+_PRECIPITATION_DURATION = slice(13, 15)
+_PRECIPITATION_START = slice(15, 16)
+_WIND_DIRECTION = slice(16, 17)
+_WIND_CLASS = slice(17, 18)
+_CLOUD_COVER = slice(18, 19)
+_WIND_SPEED = slice(19, 43)
+_DAY_ROLL_COLUMNS = 43
+
+# Each day's random numbers come from a Philox stream keyed by the generator's roll key and counted by the day. The roll
+# key is the seed in seeded mode, and picked at random otherwise. A Philox block gives four numbers, so every day gets
+# 11 blocks (44 numbers) of the stream to itself.
+_PHILOX_BLOCKS_PER_DAY = 11
+_PHILOX_COUNTER_SPACE = 2**256
+
+# Seeded generators force the general temperature to be rerolled on every ANCHOR_DAYS'th day. Nothing that happens
+# before an anchor day can then affect the temperature after it, which together with the precipitation running out
+# within a couple of days makes the weather of any day a function of the seed and the few days before it.
+ANCHOR_DAYS = 8
+# Days of weather that have to be simulated before the first day that is exactly the same as in a full simulation
+WARM_UP_DAYS = 3
+
+# How far below zero the precipitation duration counts after precipitation has stopped
+PRECIPITATION_DURATION_FLOOR = -24
+
+# One generated hour in a weather block. Categories are stored as their codes.
+WEATHER_BLOCK_DTYPE = np.dtype([("temperature", np.int16),
+                                ("precipitation", np.uint8),  # PrecipitationType
+                                ("precipitation_duration", np.int8),
+                                ("wind_direction", np.uint16),
+                                ("wind_class", np.uint8),  # WindStrength
+                                ("wind_speed", np.uint16),
+                                ("cloud_cover", np.uint8)])  # CloudCover
+
+# The Weather attribute kept in each field of a weather block
+WEATHER_BLOCK_ATTRIBUTES = MappingProxyType({"temperature": "temperature",
+                                             "precipitation": "precipitation_state",
+                                             "precipitation_duration": "precipitation_duration",
+                                             "wind_direction": "wind_direction",
+                                             "wind_class": "wind_strength",
+                                             "wind_speed": "wind_speed",
+                                             "cloud_cover": "cloud_cover"})
+
+
+@dataclass(frozen=True, slots=True)
 class Weather:
-    """ Contains the weather at one specific hour in time """
+    """
+    Contains the weather at one specific hour in time. Weathers are immutable, so the same object can be handed out
+    to any number of callers without copying it. Use dataclasses.replace() to get a changed copy.
+    """
     temperature: Union[float, None] = 0  # temperature in F, because the rules do F. Use get_temperature() to get in C
-    precipitation_state: str = ""
+    precipitation_state: PrecipitationType = PrecipitationType.NONE
     precipitation_duration: int = 0
     wind_direction: int = 0  # Direction in degrees [0, 359]
-    wind_strength: str = ""  # Wind speed classification as per pathfinder 1E rules
+    wind_strength: WindStrength = WindStrength.LIGHT  # Wind speed classification as per pathfinder 1E rules
     wind_speed: int = 0  # Speed in mph (because the rules write it in that, so in-code it's easier)
-    cloud_cover: str = "None"  # Current cloud cover
+    cloud_cover: CloudCover = CloudCover.CLEAR  # Current cloud cover
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def to_json(self):
-        return {attr: getattr(self,attr) for attr in dir(self) if not attr.startswith("__") and not callable(getattr(self, attr))}
+        return WEATHER_SCHEMA.encode(self)
 
     @staticmethod
     def from_json(json_obj):
-        w = Weather()
-        d = dir(w)
-        for key, val in json_obj.items():
-            if key in d:
-                setattr(w, key, val)
-        return w
+        return WEATHER_SCHEMA.decode(json_obj)
 
     def get_temperature(self):
         """
@@ -51,7 +122,7 @@ class Weather:
         Returns The precipitation state string by itself
         :return: string
         """
-        return self.precipitation_state
+        return PRECIPITATION_LABELS[self.precipitation_state]
 
     def get_precipitation_formatted(self):
         """
@@ -74,18 +145,18 @@ class Weather:
         :return: str
         """
         # Ensure that wind direction makes sense
-        self.wind_direction = self.wind_direction % 360
+        wind_direction = self.wind_direction % 360
         direction_str = ""
-        if (270 + 23) <= self.wind_direction < 360 or 0 <= self.wind_direction < (90 - 23):
+        if (270 + 23) <= wind_direction < 360 or 0 <= wind_direction < (90 - 23):
             direction_str += "North"
-        elif (90 + 23) <= self.wind_direction < (270 - 23):
+        elif (90 + 23) <= wind_direction < (270 - 23):
             direction_str += "South"
 
-        if 23 < self.wind_direction < (180 - 23):
+        if 23 < wind_direction < (180 - 23):
             if direction_str != "":
                 direction_str += "-"
             direction_str += "East"
-        elif (180 + 23) < self.wind_direction < 360 - 23:
+        elif (180 + 23) < wind_direction < 360 - 23:
             if direction_str != "":
                 direction_str += "-"
             direction_str += "West"
@@ -132,7 +203,30 @@ class Weather:
         Returns the formatted cloud cover string
         :return: cloud cover formatted to fit max length
         """
-        return f"{self.cloud_cover:>14}"
+        return f"{self.get_cloud_cover():>14}"
+
+    def get_cloud_cover(self) -> str:
+        """
+        Returns the cloud cover string by itself
+        :return: string
+        """
+        return self.cloud_cover.label
+
+    def sky_str(self) -> str:
+        """
+        Returns what the weather symbol shows: the precipitation if there is any, otherwise the cloud cover
+        :return: string
+        """
+        if self.precipitation_state != PrecipitationType.NONE:
+            return self.get_precipitation()
+        return self.get_cloud_cover()
+
+    def wind_strength_str(self) -> str:
+        """
+        Returns the wind strength classification as a string
+        :return: string
+        """
+        return self.wind_strength.label
 
     def warning_symbols(self, unicode: bool = False) -> str:
         """
@@ -144,7 +238,7 @@ class Weather:
         :param unicode: Use unicode symbols for this (may not be monospace depending on font
         :return: warning string of symbols
         """
-        if self.wind_speed > 50 or self.precipitation_state == "Thunderstorm":
+        if self.wind_speed > 50 or self.precipitation_state == PrecipitationType.THUNDERSTORM:
             if unicode:
                 overall_warning = "⚠"
             else:
@@ -173,28 +267,12 @@ class Weather:
         else:
             temperature_warning = ""
 
-        if "fog" in self.precipitation_state.lower():
-            if unicode:
-                precipitation_warning = "🌫"
-            else:
-                precipitation_warning = "F"
-        elif "thunderstorm" in self.precipitation_state.lower():
-            if unicode:
-                precipitation_warning = "⛈"
-            else:
-                precipitation_warning = "S"
-        elif self.precipitation_state != "":
-            if unicode:
-                precipitation_warning = "🌧"
-            else:
-                precipitation_warning = "R"
-        else:
-            precipitation_warning = ""
+        precipitation_warning = PRECIPITATION_WARNINGS[self.precipitation_state][unicode]
 
         return f"{overall_warning:1}{wind_warning:1}{temperature_warning:1}{precipitation_warning:1}"
 
     def __str__(self):
-        if len(self.precipitation_state) == 0:
+        if self.precipitation_state == PrecipitationType.NONE:
             return f"{self.get_temperature():>5.1f} C"
         else:
             return f"{self.get_temperature():>5.1f} C, {self.get_precipitation()} [{self.precipitation_duration}]"
@@ -206,6 +284,7 @@ class WeatherGeneratorState:
     climate = "temperate"
     elevation = 0
     hour: int = 0
+    day: int = 0  # Days from epoch
     weather: Weather = None
 
     # temperature
@@ -219,7 +298,7 @@ class WeatherGeneratorState:
     current_precipitation_duration: int = 0
     queued_precipitation_start_time: int = 0
     queued_precipitation_duration: int = 0
-    queued_precipitation_type: str = ""
+    queued_precipitation_type: PrecipitationType = PrecipitationType.NONE
 
     # wind
     wind_speed_class: int = 0
@@ -228,21 +307,11 @@ class WeatherGeneratorState:
     cloud_cover_type: int = 0
 
     def to_json(self):
-        res = {attr: getattr(self, attr) for attr in dir(self) if not attr.startswith("__") and attr != "weather" and not callable(getattr(self, attr))}
-        res['weather'] = self.weather.to_json()
-        return res
+        return GENERATOR_STATE_SCHEMA.encode(self)
 
     @staticmethod
     def from_json(json_obj):
-        state = WeatherGeneratorState()
-        d = dir(state)
-        for key, val in json_obj.items():
-            if key in d:
-                if key == "weather":
-                    state.weather = Weather.from_json(val)
-                else:
-                    setattr(state, key, val)
-        return state
+        return GENERATOR_STATE_SCHEMA.decode(json_obj)
 
     def climate_str(self):
         return self.climate.capitalize()
@@ -260,50 +329,258 @@ class WeatherGeneratorState:
         else:
             return "Underground"
 
+
+# Categories are saved as their codes. Older saves have the display strings, which from_json also understands.
+WEATHER_SCHEMA = Schema(Weather, (
+    Field("temperature", default=0),
+    Field("precipitation_state", encode=int, decode=PrecipitationType.from_json, default=PrecipitationType.NONE),
+    Field("precipitation_duration", default=0),
+    Field("wind_direction", default=0),
+    Field("wind_strength", encode=int, decode=WindStrength.from_json, default=WindStrength.LIGHT),
+    Field("wind_speed", default=0),
+    Field("cloud_cover", encode=int, decode=CloudCover.from_json, default=CloudCover.CLEAR),
+))
+
+GENERATOR_STATE_SCHEMA = Schema(WeatherGeneratorState, (
+    Field("season", default=WeatherGeneratorState.season),
+    Field("climate", default=WeatherGeneratorState.climate),
+    Field("elevation", default=WeatherGeneratorState.elevation),
+    Field("hour", default=0),
+    Field("day", default=0),
+    Field("weather", encode=WEATHER_SCHEMA.encode, decode=WEATHER_SCHEMA.decode),
+    Field("temperature_general", default=0),
+    Field("temperature_daytime", default=0),
+    Field("temperature_nighttime", default=0),
+    Field("temperature_change_step", default=0),
+    Field("temperature_refresh_timer", default=0),
+    Field("current_precipitation_duration", default=0),
+    Field("queued_precipitation_start_time", default=0),
+    Field("queued_precipitation_duration", default=0),
+    Field("queued_precipitation_type", encode=int, decode=PrecipitationType.from_json,
+          default=PrecipitationType.NONE),
+    Field("wind_speed_class", default=0),
+    Field("cloud_cover_type", default=0),
+))
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+class GeneratorCheckpoint(NamedTuple):
+    """
+    A saved point of a weather generator that it can be restored to. Together with the roll key the random numbers of
+    the day were derived from, it's enough to replay the rest of that day exactly. The state must not be modified.
+    """
+    state: WeatherGeneratorState
+    roll_key: Union[int, None]  # Roll key of an unseeded generator, or None if the generator was seeded
+
+    def to_json(self):
+        return {'state': self.state.to_json(), 'roll_key': self.roll_key}
+
+    @staticmethod
+    def from_json(json_obj):
+        return GeneratorCheckpoint(state=WeatherGeneratorState.from_json(json_obj['state']),
+                                   roll_key=json_obj['roll_key'])
+
+
+class RollTable(NamedTuple):
+    """
+    A compiled d100 table. A roll lands on the first row whose upper limit is at least as big as the roll.
+    """
+    upper_limits: np.ndarray  # int16 cumulative upper limits of each row
+    labels: tuple  # What each row stands for
+    dice: Tuple[Tuple[DiceExpression, ...], ...]  # Dice columns of the table, indexed as dice[column][row]
+
+    @staticmethod
+    def compile(upper_limits, labels, *dice_columns) -> "RollTable":
+        return RollTable(upper_limits=_read_only(np.array(upper_limits, dtype=np.int16)),
+                         labels=tuple(labels),
+                         dice=tuple(tuple(compile_dice(str(d)) for d in column) for column in dice_columns))
+
+    def find_row(self, roll: int) -> Union[int, None]:
+        """
+        Finds the row a roll lands on
+        :param roll: The roll
+        :return: Row index, or None if the roll is above every row
+        """
+        row = int(np.searchsorted(self.upper_limits, roll))
+        if row >= self.upper_limits.shape[0]:
+            return None
+        return row
+
+
 class ClimateData:
-    def __init__(self):
+    def __init__(self, precipitation_tables_file: str = PRECIPITATION_TABLES_FILE):
+        """
+        All the tables used for generating weather. Building this reads and compiles the precipitation tables, so use
+        get_climate_data() to get the shared, already built copy instead of creating new ones.
+        :param precipitation_tables_file: CSV file to read the precipitation tables from
+        """
         temp_baselines = namedtuple("TemperatureBaseline", ["winter", "spring", "summer", "fall"])
-        self.temperature_baselines = {"cold": temp_baselines(20, 30, 40, 30),
-                                       "temperate": temp_baselines(30, 60, 80, 60),
-                                       "tropical": temp_baselines(50, 75, 95, 75),
-                                       "desert": temp_baselines(50, 75, 95, 75)}
-        self.temperature_variations = {"cold": np.array([[20, 40, 60, 80, 95, 99, 100],
-                                                          ["-3d10", "-2d10", "-1d10", "0d10", "1d10", "2d10", "3d10"],
-                                                          ["1d4", "1d6+1", "1d6+2", "1d6+2", "1d6+1", "1d4", "1d2"]]),
-                                        "temperate": np.array([[5, 15, 35, 65, 85, 95, 100],
-                                                               ["-3d10", "-2d10", "-1d10", "0d10", "1d10", "2d10",
-                                                                "3d10"],
-                                                               ["1d2", "1d4", "1d4+1", "1d6+1", "1d4+1", "1d4",
-                                                                "1d2"]]),
-                                        "tropical": np.array([[10, 25, 55, 85, 100],
-                                                              ["-2d10", "-1d10", "0d10", "1d10", "2d10"],
-                                                              ["1d2", "1d2", "1d4", "1d4", "1d2"]]),
-                                        "desert": np.array([[10, 25, 55, 85, 100],
-                                                            ["-2d10", "-1d10", "0d10", "1d10", "2d10"],
-                                                            ["1d2", "1d2", "1d4", "1d4", "1d2"]])}
+        self.temperature_baselines = MappingProxyType({"cold": temp_baselines(20, 30, 40, 30),
+                                                       "temperate": temp_baselines(30, 60, 80, 60),
+                                                       "tropical": temp_baselines(50, 75, 95, 75),
+                                                       "desert": temp_baselines(50, 75, 95, 75)})
+        # Upper limit of the d100 roll, temperature variation and how many days the variation lasts
+        self.temperature_variations = MappingProxyType({
+            "cold": RollTable.compile([20, 40, 60, 80, 95, 99, 100],
+                                      ["-3d10", "-2d10", "-1d10", "0d10", "1d10", "2d10", "3d10"],
+                                      ["-3d10", "-2d10", "-1d10", "0d10", "1d10", "2d10", "3d10"],
+                                      ["1d4", "1d6+1", "1d6+2", "1d6+2", "1d6+1", "1d4", "1d2"]),
+            "temperate": RollTable.compile([5, 15, 35, 65, 85, 95, 100],
+                                           ["-3d10", "-2d10", "-1d10", "0d10", "1d10", "2d10", "3d10"],
+                                           ["-3d10", "-2d10", "-1d10", "0d10", "1d10", "2d10", "3d10"],
+                                           ["1d2", "1d4", "1d4+1", "1d6+1", "1d4+1", "1d4", "1d2"]),
+            "tropical": RollTable.compile([10, 25, 55, 85, 100],
+                                          ["-2d10", "-1d10", "0d10", "1d10", "2d10"],
+                                          ["-2d10", "-1d10", "0d10", "1d10", "2d10"],
+                                          ["1d2", "1d2", "1d4", "1d4", "1d2"]),
+            "desert": RollTable.compile([10, 25, 55, 85, 100],
+                                        ["-2d10", "-1d10", "0d10", "1d10", "2d10"],
+                                        ["-2d10", "-1d10", "0d10", "1d10", "2d10"],
+                                        ["1d2", "1d2", "1d4", "1d4", "1d2"])})
         precip_frequency_baseline = namedtuple("PrecipitationFrequencyBaseline", ["spring", "summer", "fall", "winter"])
-        self.precipitation_frequency_baselines = {"cold": precip_frequency_baseline(2, 1, 2, 3),
-                                                   "temperate": precip_frequency_baseline(2, 3, 2, 1),
-                                                   "tropical": precip_frequency_baseline(3, 2, 3, 1),
-                                                   "desert": precip_frequency_baseline(0, 0, 0, 2)}
+        self.precipitation_frequency_baselines = MappingProxyType({"cold": precip_frequency_baseline(2, 1, 2, 3),
+                                                                   "temperate": precip_frequency_baseline(2, 3, 2, 1),
+                                                                   "tropical": precip_frequency_baseline(3, 2, 3, 1),
+                                                                   "desert": precip_frequency_baseline(0, 0, 0, 2)})
         ele_baseline = namedtuple("ElevationBaseline", ['temp_change', 'intensity', 'frequency_change'])
-        self.elevation_baselines = {"sea level": ele_baseline(10, 2, 0),
-                                     "lowland": ele_baseline(0, 1, 0),
-                                     "highland": ele_baseline(-10, 1, -1)}
-        self.precipitation_chances: np.array = [5, 15, 30, 60, 95]
-        self.wind_speed_table = np.array([[50, 80, 90, 95, 100], ["Light winds", "Moderate winds", "Strong winds", "Severe winds", "Windstorm"], ["1d11+1", "1d10+10", "1d10+20", "1d20+30", "1d20+50"]])
-        self.cloud_cover_types = np.array(["", "Light clouds", "Medium clouds", "Overcast"])
+        self.elevation_baselines = MappingProxyType({"sea level": ele_baseline(10, 2, 0),
+                                                     "lowland": ele_baseline(0, 1, 0),
+                                                     "highland": ele_baseline(-10, 1, -1)})
+        self.precipitation_chances: Tuple[int, ...] = (5, 15, 30, 60, 95)
+        self.wind_speed_table = RollTable.compile([50, 80, 90, 95, 100], WIND_STRENGTHS,
+                                                  ["1d11+1", "1d10+10", "1d10+20", "1d20+30", "1d20+50"])
+        self.cloud_cover_table = RollTable.compile([50, 70, 85, 100], CLOUD_COVERS)
+
+        # Precipitation tables keyed by (intensity, frozen). Intensity goes from 0 (light) to 3 (torrential).
+        self.precipitation_tables = MappingProxyType(self._read_precipitation_tables(precipitation_tables_file))
+
+        self.seasons: np.array = _read_only(np.array(["winter", "spring", "summer", "fall"]))
+        self.climates: np.array = _read_only(np.array(["cold", "temperate", "tropical", "desert"]))
+
+    @staticmethod
+    def _read_precipitation_tables(filename: str) -> Dict[Tuple[int, bool], RollTable]:
+        """
+        Reads the precipitation tables from file. The file has a block of 10 rows for each intensity: a title row and
+        up to 9 rows of table. Unfrozen precipitation is in the first three columns and frozen in the last three.
+        :param filename: CSV file to read
+        :return: Compiled tables keyed by (intensity, frozen)
+        """
+        with open(filename, newline="") as csvfile:
+            rows = list(csv.reader(csvfile, delimiter=","))
+        tables = {}
+        for intensity in range(len(rows) // 10 + 1):
+            block = rows[10 * intensity + 1:10 * intensity + 10]
+            if len(block) == 0:
+                break
+            for frozen in (False, True):
+                columns = slice(3, 6) if frozen else slice(0, 3)
+                table_rows = [row[columns] for row in block if any(cell.strip() != "" for cell in row[columns])]
+                tables[(intensity, frozen)] = RollTable.compile([int(row[0]) for row in table_rows],
+                                                                [PrecipitationType.from_label(row[1])
+                                                                 for row in table_rows],
+                                                                [row[2] for row in table_rows])
+        return tables
+
+
+@lru_cache(maxsize=None)
+def get_climate_data() -> ClimateData:
+    """
+    Returns the process-wide climate data. It is built on the first call and shared by everything after that.
+    :return: ClimateData
+    """
+    return ClimateData()
+
+
+def weather_to_block_row(weather: Weather, row: np.ndarray) -> None:
+    """
+    Writes a Weather into a one element slice of a weather block
+    :param weather: Weather to write
+    :param row: The slice to write into
+    :return: None
+    """
+    row["temperature"] = weather.temperature
+    row["precipitation"] = weather.precipitation_state
+    # Older saves let the duration count down without a limit
+    row["precipitation_duration"] = max(weather.precipitation_duration, PRECIPITATION_DURATION_FLOOR)
+    row["wind_direction"] = weather.wind_direction
+    row["wind_class"] = weather.wind_strength
+    row["wind_speed"] = weather.wind_speed
+    row["cloud_cover"] = weather.cloud_cover
+
+
+def block_row_to_weather(row: np.void) -> Weather:
+    """
+    Converts a single hour of a weather block into a Weather
+    :param row: Element of an array of WEATHER_BLOCK_DTYPE, or anything else that can be indexed by its field names
+    :return: Weather
+    """
+    return Weather(temperature=int(row["temperature"]),
+                   precipitation_state=PRECIPITATION_TYPES[row["precipitation"]],
+                   precipitation_duration=int(row["precipitation_duration"]),
+                   wind_direction=int(row["wind_direction"]),
+                   wind_strength=WIND_STRENGTHS[row["wind_class"]],
+                   wind_speed=int(row["wind_speed"]),
+                   cloud_cover=CLOUD_COVERS[row["cloud_cover"]])
+
+
+@lru_cache(maxsize=2)
+def _warning_symbol_table(unicode: bool) -> Tuple[str, ...]:
+    """
+    Every warning string Weather.warning_symbols can give, indexed as block_warning_symbols looks them up
+    :param unicode: Use unicode symbols
+    :return: Tuple of warning strings
+    """
+    overall_warnings = ("", "⚠" if unicode else "!")
+    wind_warnings = ("", "➢" if unicode else "W")
+    temperature_warnings = ("", "❄" if unicode else "T", "🌡" if unicode else "T")
+    return tuple(f"{overall:1}{wind:1}{temperature:1}{precipitation[unicode]:1}"
+                 for overall in overall_warnings for wind in wind_warnings for temperature in temperature_warnings
+                 for precipitation in PRECIPITATION_WARNINGS)
+
+
+def block_warning_symbols(block: np.ndarray, unicode: bool = False) -> List[str]:
+    """
+    Gives the Weather.warning_symbols of every hour of a weather block without building Weathers
+    :param block: Array of WEATHER_BLOCK_DTYPE
+    :param unicode: Use unicode symbols
+    :return: List of warning strings, one per hour
+    """
+    overall = (block["wind_speed"] > 50) | (block["precipitation"] == PrecipitationType.THUNDERSTORM)
+    wind = block["wind_speed"] > 20
+    temperature = np.where(block["temperature"] < 32, 1, np.where(block["temperature"] > 90, 2, 0))
+    keys = ((overall.astype(np.int64) * 2 + wind) * 3 + temperature) * len(PRECIPITATION_WARNINGS) \
+        + block["precipitation"]
+    table = _warning_symbol_table(unicode)
+    return [table[key] for key in keys.tolist()]
+
+
+def new_seed() -> int:
+    """
+    Picks a random seed for a seeded weather generator
+    :return: Seed that fits into 63 bits
+    """
+    return int(np.random.default_rng().integers(2**63))
 
-        self.seasons: np.array = np.array(["winter", "spring", "summer", "fall"])
-        self.climates: np.array = np.array(["cold", "temperate", "tropical", "desert"])
 
 class WeatherGenerator:
-    def __init__(self):
+    def __init__(self, rng: np.random.Generator = None, seed: int = None):
         """
         Creates a weather generator. Before use, use the initialize() function to ensure that things like temperature
         and precipitation are initialized.
+        :param rng: Random generator used to pick the roll key when there is no seed. A fresh default generator is used
+                    if not given.
+        :param seed: If given, the random numbers of each day are derived from the seed and the day instead of a random
+                     roll key, so the weather of a day is the same no matter how it was reached
         """
-        self.climate_data = ClimateData()
+        self.climate_data = get_climate_data()
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self.seed = seed
+        self._roll_key = seed if seed is not None else int(self._rng.integers(2**63))
+        self._current_day_rolls: Union[np.ndarray, None] = None  # Random numbers for the day the state is in
 
         # State
         self._state = WeatherGeneratorState()
@@ -327,13 +604,13 @@ class WeatherGenerator:
             elevation_string = "highland"
         return elevation_string
 
-    def _get_precipitation_intensity_table(self, climate: str, elevation: int, frozen: bool) -> np.array:
+    def _get_precipitation_intensity_table(self, climate: str, elevation: int, frozen: bool) -> RollTable:
         """
-        Fetches the table for rolling precipitation intensity and duration from file
+        Fetches the table for rolling precipitation intensity and duration
         :param climate: Which climate to fetch for
         :param elevation: Which elevation to fetch for (in ft from sea level)
         :param frozen: Whether the precipitation is frozen or not
-        :return: The 2D table containing %die upper limit, precipitation type and intensity, and duration in hours
+        :return: The table of %die upper limits, precipitation types and durations in hours
         """
         elevation_string = self._elevation_to_str(elevation)
         precipitation = self.climate_data.elevation_baselines[elevation_string].intensity
@@ -347,64 +624,145 @@ class WeatherGenerator:
         if precipitation > 3:
             precipitation = 3
 
-        # precipitation data from csv
-        with open("./precipitation_tables.csv") as csvfile:
-            reader = csv.reader(csvfile, delimiter=",")
-            indexes = np.arange(1, 10)
-            indexes += 10 * precipitation
-            rows = np.array([row for idx, row in enumerate(reader) if idx in indexes])
+        return self.climate_data.precipitation_tables[(precipitation, frozen)]
 
-        if frozen:
-            rows = rows[:, 3:]
-        else:
-            rows = rows[:, :3]
+    def _day_rolls(self) -> np.ndarray:
+        """
+        Returns the table of uniform random numbers for the current day, drawing a new one if there is none
+        :return: 1D array with _DAY_ROLL_COLUMNS numbers from [0, 1)
+        """
+        if self._current_day_rolls is None:
+            self._current_day_rolls = self._keyed_day_rolls(self._state.day, 1)[0]
+        return self._current_day_rolls
 
-        return rows[np.invert(np.all(rows == '', axis=1))]
+    def _keyed_day_rolls(self, first_day: int, days: int) -> np.ndarray:
+        """
+        Derives the random numbers of consecutive days from the roll key
+        :param first_day: The first day in days from epoch
+        :param days: Number of days
+        :return: Array of shape (days, _DAY_ROLL_COLUMNS)
+        """
+        bit_generator = np.random.Philox(key=self._roll_key,
+                                         counter=(first_day * _PHILOX_BLOCKS_PER_DAY) % _PHILOX_COUNTER_SPACE)
+        numbers = np.random.Generator(bit_generator).random(days * _PHILOX_BLOCKS_PER_DAY * 4)
+        return numbers.reshape(days, _PHILOX_BLOCKS_PER_DAY * 4)[:, :_DAY_ROLL_COLUMNS]
 
-    @staticmethod
-    def _get_precipitation(precipitation_intensity_table: np.array) -> Tuple[str, int, int]:
+    def _next_anchor_day(self, day: int) -> Union[int, None]:
+        """
+        Finds the first anchor day at or after the given day
+        :param day: Day from epoch
+        :return: The anchor day, or None if the generator isn't seeded
+        """
+        if self.seed is None:
+            return None
+        return day + (-day) % ANCHOR_DAYS
+
+    def warm_up_start(self, day: int) -> int:
+        """
+        Finds the day from which a seeded generator has to be run so that the given day comes out exactly as it would
+        from a simulation started any earlier
+        :param day: Day from epoch
+        :return: An anchor day at least WARM_UP_DAYS before the day
+        """
+        return (day - WARM_UP_DAYS) // ANCHOR_DAYS * ANCHOR_DAYS
+
+    def settled_hour(self, time_from_epoch: int) -> Union[int, None]:
+        """
+        Finds the first hour whose weather a seeded generator computes without looking at anything before the given
+        hour, such as the climate or elevation then
+        :param time_from_epoch: The hour
+        :return: Time from epoch, or None if the generator isn't seeded
+        """
+        anchor_day = self._next_anchor_day(-(-time_from_epoch // 24))
+        if anchor_day is None:
+            return None
+        return (anchor_day + WARM_UP_DAYS) * 24
+
+    def warm_up_state(self, day: int, season: str, climate: str, elevation: int) -> WeatherGeneratorState:
+        """
+        Creates a state for starting a seeded warm-up. None of its values matter from WARM_UP_DAYS days onwards.
+        :param day: The first day to generate. Should be a day returned by warm_up_start().
+        :param season: Season of the first day
+        :param climate: Current climate
+        :param elevation: Current elevation in ft above sea level
+        :return: State at the last hour of the day before
+        """
+        state = WeatherGeneratorState()
+        state.hour = 23
+        state.day = day - 1
+        state.season = season
+        state.climate = climate
+        state.elevation = elevation
+        state.temperature_refresh_timer = 1
+        state.current_precipitation_duration = PRECIPITATION_DURATION_FLOOR
+        state.queued_precipitation_start_time = -10
+        state.weather = Weather(temperature=0, precipitation_state=PrecipitationType.NONE,
+                                precipitation_duration=PRECIPITATION_DURATION_FLOOR)
+        return state
+
+    def _get_precipitation(self, precipitation_intensity_table: RollTable) -> Tuple[PrecipitationType, int, int]:
         """
         Rolls a precipitation type from the precipitation intensity table
         :param precipitation_intensity_table: Precipitation intensity table fetched using
                _get_precipitation_intensity_table
         :return: Precipitation intensity, start time (in hours from this moment), duration in hours
         """
-        r = dice.roll("1d100")
-        for row in precipitation_intensity_table:
-            if sum(r) <= int(row[0]):
-                intensity_str = row[1]
-                duration = sum(dice.roll(row[2]))
-                break
-        else:
-            intensity_str = "<Error>"
-            duration = 1
+        rolls = self._day_rolls()
+        r = _D100.from_uniforms(rolls[_PRECIPITATION_TABLE])
+        row = precipitation_intensity_table.find_row(r)
+        if row is None:
+            row = len(precipitation_intensity_table.labels) - 1
+        precipitation_type = precipitation_intensity_table.labels[row]
+        duration = precipitation_intensity_table.dice[0][row].from_uniforms(rolls[_PRECIPITATION_DURATION])
         # TODO: If thunderstorm, set wind to higher
-        start_time = dice.roll("1d24-1")
-        return intensity_str, start_time, duration
+        start_time = _D24_START.from_uniforms(rolls[_PRECIPITATION_START])
+        return precipitation_type, start_time, duration
 
-    def _check_for_precipitation(self, season: str, climate: str, elevation: int) -> bool:
+    def _get_precipitation_chance(self, season: str, climate: str, elevation: int) -> int:
         """
-        Roll precipitation chance to see whether there's precipitation in the next 24 hours
+        Figures out the percentage chance of there being precipitation during a day
         :param season: Current season
         :param climate: Current climate
         :param elevation: Current elevation in ft above sea level.
-        :return: True, if there is precipitation. False if there is not.
+        :return: Chance in percent
         """
         elevation_str = self._elevation_to_str(elevation)
-        frequency = int(self.climate_data.precipitation_frequency_baselines[climate]._asdict()[season])
+        frequency = getattr(self.climate_data.precipitation_frequency_baselines[climate], season)
         elevation_adjustment = self.climate_data.elevation_baselines[elevation_str].frequency_change
         frequency += elevation_adjustment
         if frequency < 0:
             frequency = 0
         if frequency > 4:
             frequency = 4
-        precipitation_chance = int(self.climate_data.precipitation_chances[frequency])
-        r = dice.roll("1d100")
-        if sum(r) <= precipitation_chance:
+        return self.climate_data.precipitation_chances[frequency]
+
+    def _check_for_precipitation(self, season: str, climate: str, elevation: int) -> bool:
+        """
+        Roll precipitation chance to see whether there's precipitation in the next 24 hours
+        :param season: Current season
+        :param climate: Current climate
+        :param elevation: Current elevation in ft above sea level.
+        :return: True, if there is precipitation. False if there is not.
+        """
+        precipitation_chance = self._get_precipitation_chance(season, climate, elevation)
+        r = _D100.from_uniforms(self._day_rolls()[_PRECIPITATION_CHECK])
+        if r <= precipitation_chance:
             return True
         else:
             return False
 
+    def _get_temperature_baseline(self, season: str, climate: str, elevation: int) -> int:
+        """
+        Returns the baseline temperature that the temperature variations are rolled on top of
+        :param season: Current season
+        :param climate: Current climate
+        :param elevation: Current elevation in ft above sea level
+        :return: Temperature in F
+        """
+        baseline_temp = getattr(self.climate_data.temperature_baselines[climate], season)
+        elevation_str = self._elevation_to_str(elevation)
+        return baseline_temp + self.climate_data.elevation_baselines[elevation_str].temp_change
+
     def _get_temperature(self, season: str, climate: str, elevation: int) -> Tuple[int, int]:
         """
         Calculates the general temperature for the next few days.
@@ -413,46 +771,33 @@ class WeatherGenerator:
         :param elevation: Current elevation in ft above sea level
         :return: Temperature in F and the duration of this temperature
         """
-        baseline_temp = self.climate_data.temperature_baselines[climate]._asdict()[season]
-        elevation_str = self._elevation_to_str(elevation)
-        elevation_adjustment = self.climate_data.elevation_baselines[elevation_str].temp_change
+        rolls = self._day_rolls()
         variation_table = self.climate_data.temperature_variations[climate]
-        r = sum(dice.roll("1d100"))
-        for row in variation_table.T:
-            if r <= int(row[0]):
-                variation = dice.roll(row[1])
-                try:
-                    variation = sum(variation)
-                except TypeError:
-                    pass
-                variation_duration = dice.roll(row[2])
-                try:
-                    variation_duration = sum(variation_duration)
-                except TypeError:
-                    pass
-                break
+        row = variation_table.find_row(_D100.from_uniforms(rolls[_TEMPERATURE_TABLE]))
+        if row is not None:
+            variation = variation_table.dice[0][row].from_uniforms(rolls[_TEMPERATURE_VARIATION])
+            variation_duration = variation_table.dice[1][row].from_uniforms(rolls[_TEMPERATURE_DURATION])
         else:
             variation = 0
             variation_duration = -1
-        return baseline_temp + elevation_adjustment + int(variation), int(variation_duration)
+        return self._get_temperature_baseline(season, climate, elevation) + variation, variation_duration
 
-    @staticmethod
-    def _get_night_temperature(temperature: int) -> int:
+    def _get_night_temperature(self, temperature: int) -> int:
         """
         Returns nightly temperature based on current temperature
         :param temperature: Current daytime temperature
         :return: nighttime temperature
         """
-        return temperature - dice.roll("2d6+3")
+        return temperature - _NIGHT_TEMPERATURE_DROP.from_uniforms(self._day_rolls()[_NIGHT_TEMPERATURE])
 
-    @staticmethod
-    def _get_temperature_daily_variation(temperature: int) -> int:
+    def _get_temperature_daily_variation(self, temperature: int, columns: slice) -> int:
         """
         Returns daytime temperature for the current daily variation
         :param temperature: Current daytime temperature
+        :param columns: Which columns of the day's rolls to use
         :return: Today's daytime temperature
         """
-        return temperature + dice.roll("2d6-7")
+        return temperature + _DAILY_TEMPERATURE_VARIATION.from_uniforms(self._day_rolls()[columns])
 
     def advance_hour(self) -> Weather:
         """
@@ -463,6 +808,8 @@ class WeatherGenerator:
         # daily reset
         if self._state.hour == 24:
             self._state.hour = 0
+            self._state.day += 1
+            self._current_day_rolls = None
             if self._check_for_precipitation(self._state.season, self._state.climate, self._state.elevation):
                 frozen = self._state.weather.temperature < 32
                 table = self._get_precipitation_intensity_table(self._state.climate, self._state.elevation, frozen)
@@ -472,61 +819,57 @@ class WeatherGenerator:
                 self._state.queued_precipitation_duration = duration
             else:
                 self._state.queued_precipitation_duration = 0
-                self._state.queued_precipitation_type = ""
+                self._state.queued_precipitation_type = PrecipitationType.NONE
                 self._state.queued_precipitation_start_time = -10
             self._state.temperature_refresh_timer -= 1
-            if self._state.temperature_refresh_timer <= 0:
+            if self._state.temperature_refresh_timer <= 0 or self._next_anchor_day(self._state.day) == self._state.day:
                 self._state.temperature_general, self._state.temperature_refresh_timer = self._get_temperature(
                     self._state.season, self._state.climate, self._state.elevation)
-                self._state.temperature_daytime = self._get_temperature_daily_variation(self._state.temperature_general)
+                self._state.temperature_daytime = self._get_temperature_daily_variation(
+                    self._state.temperature_general, _REFRESH_DAYTIME_TEMPERATURE)
                 self._state.temperature_change_step = \
                     (self._state.temperature_daytime - self._state.temperature_nighttime) // 4
+        rolls = self._day_rolls()
+        previous = self._state.weather
 
         # temperature variations
+        temperature = previous.temperature
         if 9 > self._state.hour >= 6 or 21 > self._state.hour >= 18:
-            self._state.weather.temperature += self._state.temperature_change_step
+            temperature += self._state.temperature_change_step
         if self._state.hour == 9:
-            self._state.weather.temperature = self._state.temperature_daytime
+            temperature = self._state.temperature_daytime
             self._state.temperature_nighttime = self._get_night_temperature(self._state.temperature_general)
             self._state.temperature_change_step = \
                 (self._state.temperature_nighttime - self._state.temperature_daytime) // 4
         if self._state.hour == 21:
-            self._state.weather.temperature = self._state.temperature_nighttime
-            self._state.temperature_daytime = self._get_temperature_daily_variation(self._state.temperature_general)
+            temperature = self._state.temperature_nighttime
+            self._state.temperature_daytime = self._get_temperature_daily_variation(
+                self._state.temperature_general, _EVENING_DAYTIME_TEMPERATURE)
             self._state.temperature_change_step = \
                 (self._state.temperature_daytime - self._state.temperature_nighttime) // 4
 
-        # precipitation
-        self._state.current_precipitation_duration -= 1
+        # precipitation. The duration keeps counting down after precipitation stops, but only the last few hours of
+        # that matter so it's capped to keep it bounded.
+        self._state.current_precipitation_duration = max(self._state.current_precipitation_duration - 1,
+                                                         PRECIPITATION_DURATION_FLOOR)
+        precipitation_state = previous.precipitation_state
         if self._state.current_precipitation_duration == 0:
-            self._state.weather.precipitation_state = ""
+            precipitation_state = PrecipitationType.NONE
         if self._state.hour == self._state.queued_precipitation_start_time:
-            self._state.weather.precipitation_state = self._state.queued_precipitation_type
+            precipitation_state = self._state.queued_precipitation_type
             self._state.current_precipitation_duration = self._state.queued_precipitation_duration
-        self._state.weather.precipitation_duration = self._state.current_precipitation_duration
 
         # Wind
+        wind_direction = previous.wind_direction
         if self._state.hour == 0:
-            self._state.weather.wind_direction = dice.roll("1d360-1")
-            r = sum(dice.roll("1d100"))
-            for i, row in enumerate(self.climate_data.wind_speed_table.T):
-                if r <= int(row[0]):
-                    self._state.wind_speed_class = i
-                    break
-            else:
-                self._state.wind_speed_class = 0
+            wind_direction = _D360_DIRECTION.from_uniforms(rolls[_WIND_DIRECTION])
+            wind_speed_class = self.climate_data.wind_speed_table.find_row(_D100.from_uniforms(rolls[_WIND_CLASS]))
+            self._state.wind_speed_class = wind_speed_class if wind_speed_class is not None else 0
 
         # Cloud cover.
         if self._state.hour == 0:
-            r = sum(dice.roll("1d100"))
-            if r <= 50:
-                self._state.cloud_cover_type = 0
-            elif r <= 70:
-                self._state.cloud_cover_type = 1
-            elif r <= 85:
-                self._state.cloud_cover_type = 2
-            elif r <= 100:
-                self._state.cloud_cover_type = 3
+            self._state.cloud_cover_type = self.climate_data.cloud_cover_table.find_row(
+                _D100.from_uniforms(rolls[_CLOUD_COVER]))
 
         minimum_clouds = 0
         if self._state.current_precipitation_duration > 0:
@@ -539,29 +882,280 @@ class WeatherGenerator:
             if 3 - time_until_next_precipitation > minimum_clouds:
                 minimum_clouds = 3 - time_until_next_precipitation
 
-        if self._state.queued_precipitation_type == "Thunderstorm" or self._state.queued_precipitation_type == "Thunderstorm":
+        if self._state.queued_precipitation_type == PrecipitationType.THUNDERSTORM:
             minimum_wind_class = minimum_clouds - 1
         else:
             minimum_wind_class = 0
 
         if self._state.cloud_cover_type < minimum_clouds:
-            cloud_cover = self.climate_data.cloud_cover_types[minimum_clouds]
+            cloud_cover = CLOUD_COVERS[minimum_clouds]
         else:
-            cloud_cover = self.climate_data.cloud_cover_types[self._state.cloud_cover_type]
+            cloud_cover = CLOUD_COVERS[self._state.cloud_cover_type]
 
         if self._state.wind_speed_class < minimum_wind_class:
             wind_speed_class = minimum_wind_class
         else:
             wind_speed_class = self._state.wind_speed_class
 
-        self._state.weather.wind_strength = self.climate_data.wind_speed_table.T[wind_speed_class, 1]
-        self._state.weather.wind_speed = int(dice.roll(self.climate_data.wind_speed_table.T[wind_speed_class, 2]))
-
-        self._state.weather.cloud_cover = cloud_cover
-
+        wind_speed_column = _WIND_SPEED.start + self._state.hour
+        wind_speed = self.climate_data.wind_speed_table.dice[0][wind_speed_class].from_uniforms(
+            rolls[wind_speed_column:wind_speed_column + 1])
+
+        self._state.weather = Weather(temperature=temperature,
+                                      precipitation_state=precipitation_state,
+                                      precipitation_duration=self._state.current_precipitation_duration,
+                                      wind_direction=wind_direction,
+                                      wind_strength=self.climate_data.wind_speed_table.labels[wind_speed_class],
+                                      wind_speed=wind_speed,
+                                      cloud_cover=cloud_cover)
         return self._state.weather
 
-    def initialize(self, season: str, climate: str, elevation: int, hour: int) -> Weather:
+    def generate_block(self, state: WeatherGeneratorState, hours: int,
+                       checkpoints: List[Tuple[int, GeneratorCheckpoint]] = None) \
+            -> Tuple[np.ndarray, WeatherGeneratorState]:
+        """
+        Generates weather for many hours at once. Partial days at the start and the end are generated hour by hour, but
+        all the whole days in between are simulated a day at a time with NumPy. Each day rolls its dice from the same
+        per-day table of random numbers as advance_hour does, so the results follow exactly the same rules.
+        :param state: State to start from. It is not modified.
+        :param hours: Number of hours to generate
+        :param checkpoints: If given, a checkpoint at the first hour of every generated day is appended to this list as
+                            (index in the block, checkpoint)
+        :return: Structured array of WEATHER_BLOCK_DTYPE with the weather for each of the hours following the state,
+                 and the generator state at the last generated hour
+        """
+        self.set_state(copy.deepcopy(state))
+        block = np.zeros(hours, dtype=WEATHER_BLOCK_DTYPE)
+        i = 0
+        # Finish off the current day
+        while i < hours and self._state.hour != 23:
+            self._advance_into_block(block, i, checkpoints)
+            i += 1
+        full_days = (hours - i) // 24
+        if full_days > 0:
+            day_rolls = self._keyed_day_rolls(self._state.day + 1, full_days)
+            block[i:i + full_days * 24] = self._generate_days(day_rolls, checkpoints, i)
+            i += full_days * 24
+        while i < hours:
+            self._advance_into_block(block, i, checkpoints)
+            i += 1
+        return block, self._state
+
+    def _advance_into_block(self, block: np.ndarray, i: int, checkpoints: List[Tuple[int, GeneratorCheckpoint]]) -> None:
+        """
+        Advances an hour and writes the weather into a weather block
+        :param block: Weather block to write into
+        :param i: Index of the hour in the block
+        :param checkpoints: List to append a checkpoint to if a new day started, or None
+        :return: None
+        """
+        weather_to_block_row(self.advance_hour(), block[i:i + 1])
+        if checkpoints is not None and self._state.hour == 0:
+            checkpoints.append((i, self.get_checkpoint()))
+
+    def _generate_days(self, day_rolls: np.ndarray, checkpoints: List[Tuple[int, GeneratorCheckpoint]] = None,
+                       offset: int = 0) -> np.ndarray:
+        """
+        Simulates whole days starting from a state at hour 23. The state is moved to hour 23 of the last day.
+        :param day_rolls: Table of uniform random numbers, one row of _DAY_ROLL_COLUMNS per day
+        :param checkpoints: If given, a checkpoint at the first hour of each day is appended to this list
+        :param offset: Index of the first hour in the block the checkpoints are for
+        :return: Structured array of WEATHER_BLOCK_DTYPE, 24 hours per day
+        """
+        state = self._state
+        days = day_rolls.shape[0]
+        climate_data = self.climate_data
+
+        # Roll everything that can be rolled up front. Some of it goes unused, but a roll is much cheaper than a branch.
+        precipitation_chance = self._get_precipitation_chance(state.season, state.climate, state.elevation)
+        has_precipitation = _D100.from_uniforms(day_rolls[:, _PRECIPITATION_CHECK]) \
+            <= precipitation_chance
+        precipitation_roll = _D100.from_uniforms(day_rolls[:, _PRECIPITATION_TABLE])
+        precipitation_start = _D24_START.from_uniforms(day_rolls[:, _PRECIPITATION_START])
+        precipitation_by_frozen = []
+        for frozen in (False, True):
+            table = self._get_precipitation_intensity_table(state.climate, state.elevation, frozen)
+            rows = np.minimum(np.searchsorted(table.upper_limits, precipitation_roll), table.upper_limits.shape[0] - 1)
+            codes = np.array(table.labels, dtype=np.int64)[rows]
+            durations = rolls_from_uniforms(table.dice[0], rows, day_rolls[:, _PRECIPITATION_DURATION])
+            precipitation_by_frozen.append((codes, durations))
+
+        variation_table = climate_data.temperature_variations[state.climate]
+        variation_rows = np.minimum(
+            np.searchsorted(variation_table.upper_limits, _D100.from_uniforms(day_rolls[:, _TEMPERATURE_TABLE])),
+            variation_table.upper_limits.shape[0] - 1)
+        general_roll = self._get_temperature_baseline(state.season, state.climate, state.elevation) + \
+            rolls_from_uniforms(variation_table.dice[0], variation_rows, day_rolls[:, _TEMPERATURE_VARIATION])
+        general_duration = rolls_from_uniforms(variation_table.dice[1], variation_rows,
+                                               day_rolls[:, _TEMPERATURE_DURATION])
+        refresh_daytime = _DAILY_TEMPERATURE_VARIATION.from_uniforms(day_rolls[:, _REFRESH_DAYTIME_TEMPERATURE])
+        evening_daytime = _DAILY_TEMPERATURE_VARIATION.from_uniforms(day_rolls[:, _EVENING_DAYTIME_TEMPERATURE])
+        night_drop = _NIGHT_TEMPERATURE_DROP.from_uniforms(day_rolls[:, _NIGHT_TEMPERATURE])
+
+        # The general temperature is the only thing that really has to be walked through in order. Only the days on
+        # which it gets rerolled need to be visited though.
+        refresh = np.zeros(days, dtype=bool)
+        durations_list = general_duration.tolist()
+        first_day = state.day + 1
+        day = max(state.temperature_refresh_timer - 1, 0)
+        timer = state.temperature_refresh_timer - days
+        anchor = self._next_anchor_day(first_day)
+        if anchor is not None:
+            day = min(day, anchor - first_day)
+        while day < days:
+            refresh[day] = True
+            timer = durations_list[day] - (days - 1 - day)
+            next_day = day + max(durations_list[day], 1)
+            if anchor is not None:
+                next_day = min(next_day, self._next_anchor_day(first_day + day + 1) - first_day)
+            day = next_day
+        general_index = np.maximum.accumulate(np.where(refresh, np.arange(days), -1))
+        general = np.where(general_index >= 0, general_roll[np.maximum(general_index, 0)], state.temperature_general)
+
+        nighttime = general - night_drop
+        previous_nighttime = np.concatenate(([state.temperature_nighttime], nighttime[:-1]))
+        evening_daytime = general + evening_daytime
+        daytime = np.where(refresh, general + refresh_daytime,
+                           np.concatenate(([state.temperature_daytime], evening_daytime[:-1])))
+        morning_temperature = np.concatenate(([state.weather.temperature], nighttime[:-1]))
+        morning_step = (daytime - previous_nighttime) // 4
+        if not refresh[0]:
+            morning_step[0] = state.temperature_change_step
+
+        # Precipitation gets rolled from the frozen table if it's below freezing when the day starts
+        frozen = morning_temperature < 32
+        precipitation_code = np.where(has_precipitation,
+                                      np.where(frozen, precipitation_by_frozen[1][0], precipitation_by_frozen[0][0]), 0)
+        duration = np.where(has_precipitation,
+                            np.where(frozen, precipitation_by_frozen[1][1], precipitation_by_frozen[0][1]), 0)
+        start_time = np.where(has_precipitation, precipitation_start, -10)
+
+        # A day ends with whatever precipitation started during it, or with the previous day's counting down. As no
+        # precipitation lasts for more than a day, this settles after a couple of rounds.
+        started_end_duration = duration - (23 - start_time)
+        started_end_code = np.where(started_end_duration > 0, precipitation_code, 0)
+        end_duration = np.where(has_precipitation, started_end_duration, PRECIPITATION_DURATION_FLOOR)
+        end_code = np.where(has_precipitation, started_end_code, 0)
+        initial_code = int(state.weather.precipitation_state)
+        while True:
+            start_duration = np.concatenate(([state.current_precipitation_duration], end_duration[:-1]))
+            start_code = np.concatenate(([initial_code], end_code[:-1]))
+            carried_duration = np.maximum(start_duration - 24, PRECIPITATION_DURATION_FLOOR)
+            new_end_duration = np.where(has_precipitation, started_end_duration, carried_duration)
+            new_end_code = np.where(has_precipitation, started_end_code, np.where(carried_duration > 0, start_code, 0))
+            if np.array_equal(new_end_duration, end_duration) and np.array_equal(new_end_code, end_code):
+                break
+            end_duration, end_code = new_end_duration, new_end_code
+
+        # Expand the days into hours
+        hour = np.arange(24)[None, :]
+        block = np.zeros((days, 24), dtype=WEATHER_BLOCK_DTYPE)
+
+        evening_step = (nighttime - daytime) // 4
+        temperatures = np.empty((days, 24), dtype=np.int64)
+        temperatures[:, :6] = morning_temperature[:, None]
+        temperatures[:, 6:9] = morning_temperature[:, None] + morning_step[:, None] * np.arange(1, 4)[None, :]
+        temperatures[:, 9:18] = daytime[:, None]
+        temperatures[:, 18:21] = daytime[:, None] + evening_step[:, None] * np.arange(1, 4)[None, :]
+        temperatures[:, 21:] = nighttime[:, None]
+        block["temperature"] = temperatures
+
+        started = (start_time[:, None] >= 0) & (hour >= start_time[:, None])
+        durations = np.where(started, duration[:, None] - (hour - start_time[:, None]),
+                             np.maximum(start_duration[:, None] - (hour + 1), PRECIPITATION_DURATION_FLOOR))
+        durations = np.where(started, np.maximum(durations, PRECIPITATION_DURATION_FLOOR), durations)
+        codes = np.where(started, precipitation_code[:, None], start_code[:, None])
+        block["precipitation"] = np.where(durations > 0, codes, 0)
+        block["precipitation_duration"] = durations
+
+        minimum_clouds = np.where(durations > 0, 3, np.where(durations > -3, 2 + durations, 0))
+        time_until_next_precipitation = start_time[:, None] - hour
+        upcoming = (time_until_next_precipitation > 0) & (time_until_next_precipitation <= 3)
+        minimum_clouds = np.where(upcoming, np.maximum(minimum_clouds, 3 - time_until_next_precipitation),
+                                  minimum_clouds)
+        cloud_cover_type = np.searchsorted(climate_data.cloud_cover_table.upper_limits,
+                                           _D100.from_uniforms(day_rolls[:, _CLOUD_COVER]))
+        block["cloud_cover"] = np.maximum(cloud_cover_type[:, None], minimum_clouds)
+
+        wind_table = climate_data.wind_speed_table
+        wind_speed_class = np.minimum(
+            np.searchsorted(wind_table.upper_limits,
+                            _D100.from_uniforms(day_rolls[:, _WIND_CLASS])),
+            wind_table.upper_limits.shape[0] - 1)
+        thunderstorm = precipitation_code == PrecipitationType.THUNDERSTORM
+        minimum_wind_class = np.where(thunderstorm[:, None], minimum_clouds - 1, 0)
+        wind_classes = np.maximum(wind_speed_class[:, None], minimum_wind_class)
+        block["wind_class"] = wind_classes
+        block["wind_speed"] = rolls_from_uniforms(wind_table.dice[0], wind_classes.reshape(-1),
+                                                  day_rolls[:, _WIND_SPEED].reshape(-1, 1)).reshape(days, 24)
+        block["wind_direction"] = _D360_DIRECTION.from_uniforms(
+            day_rolls[:, _WIND_DIRECTION])[:, None]
+
+        if checkpoints is not None:
+            day_start_values = {
+                "temperature_general": general,
+                "temperature_daytime": daytime,
+                "temperature_nighttime": previous_nighttime,
+                "temperature_change_step": morning_step,
+                "temperature_refresh_timer": np.where(
+                    general_index >= 0,
+                    general_duration[np.maximum(general_index, 0)] - (np.arange(days) - general_index),
+                    state.temperature_refresh_timer - 1 - np.arange(days)),
+                "current_precipitation_duration": block[:, 0]["precipitation_duration"],
+                "queued_precipitation_start_time": start_time,
+                "queued_precipitation_duration": duration,
+                "wind_speed_class": wind_speed_class,
+                "cloud_cover_type": cloud_cover_type}
+            self._append_day_checkpoints(checkpoints, offset, block,
+                                         np.where(start_time >= 0, precipitation_code, 0), day_start_values)
+
+        # Leave the generator where the hour by hour generator would be at the end of the last day
+        last = days - 1
+        state.hour = 23
+        state.day += days
+        state.temperature_general = int(general[last])
+        state.temperature_refresh_timer = int(timer)
+        state.temperature_daytime = int(evening_daytime[last])
+        state.temperature_nighttime = int(nighttime[last])
+        state.temperature_change_step = int((evening_daytime[last] - nighttime[last]) // 4)
+        state.current_precipitation_duration = int(end_duration[last])
+        state.queued_precipitation_type = PRECIPITATION_TYPES[precipitation_code[last]] \
+            if start_time[last] >= 0 else PrecipitationType.NONE
+        state.queued_precipitation_start_time = int(start_time[last])
+        state.queued_precipitation_duration = int(duration[last])
+        state.wind_speed_class = int(wind_speed_class[last])
+        state.cloud_cover_type = int(cloud_cover_type[last])
+        state.weather = block_row_to_weather(block[last, 23])
+        self._current_day_rolls = day_rolls[last]
+        return block.reshape(-1)
+
+    def _append_day_checkpoints(self, checkpoints: List[Tuple[int, GeneratorCheckpoint]], offset: int,
+                                block: np.ndarray, queued_precipitation_codes: np.ndarray,
+                                day_start_values: Dict[str, np.ndarray]) -> None:
+        """
+        Builds checkpoints at the first hour of each day simulated by _generate_days
+        :param checkpoints: List to append the checkpoints to
+        :param offset: Index of the first hour in the block the checkpoints are for
+        :param block: The generated weather, one row of 24 hours per day
+        :param queued_precipitation_codes: Precipitation rolled for each day, 0 for none
+        :param day_start_values: Value of each integer state field at the first hour of each day
+        :return: None
+        """
+        columns = {name: values.tolist() for name, values in day_start_values.items()}
+        roll_key = self._roll_key if self.seed is None else None
+        queued_types = [PRECIPITATION_TYPES[code] for code in queued_precipitation_codes.tolist()]
+        for day in range(block.shape[0]):
+            state = WeatherGeneratorState(**{name: values[day] for name, values in columns.items()})
+            state.hour = 0
+            state.day = self._state.day + 1 + day
+            state.season = self._state.season
+            state.climate = self._state.climate
+            state.elevation = self._state.elevation
+            state.weather = block_row_to_weather(block[day, 0])
+            state.queued_precipitation_type = queued_types[day]
+            checkpoints.append((offset + day * 24, GeneratorCheckpoint(state=state, roll_key=roll_key)))
+
+    def initialize(self, season: str, climate: str, elevation: int, hour: int, day: int = 0) -> Weather:
         """
         Initializes the weather generator. in practice, it just sets the time to hour 23, then rolls it forward for 25
         hours to let the temperature settle in, then rolls it to the day hour specified. This ensure that the generator
@@ -570,14 +1164,17 @@ class WeatherGenerator:
         :param climate: Current climate
         :param elevation: Current elevation in ft above sea level
         :param hour: Hour in the day (24h format) to initialize to
+        :param day: Day from epoch to initialize to
         :return: Current weather
         """
         self._state = WeatherGeneratorState()
+        self._current_day_rolls = None
         self._state.hour = 23
+        self._state.day = day - 2
         self._state.season = season
         self._state.climate = climate
         self._state.elevation = elevation
-        self._state.weather = Weather(temperature=0, precipitation_state="")
+        self._state.weather = Weather(temperature=0, precipitation_state=PrecipitationType.NONE)
         for _ in range(24 + 1 + hour):
             self.advance_hour()
         return self._state.weather
@@ -616,10 +1213,10 @@ class WeatherGenerator:
 
     def get_weather(self) -> Weather:
         """
-        Return current weather
+        Return current weather. Weathers are immutable, so this is the generator's own object and not a copy.
         :return: Current Weather
         """
-        return copy.deepcopy(self._state.weather)
+        return self._state.weather
 
     def get_state(self) -> WeatherGeneratorState:
         """
@@ -635,6 +1232,27 @@ class WeatherGenerator:
         :return: None
         """
         self._state = state
+        self._current_day_rolls = None
+
+    def get_checkpoint(self) -> GeneratorCheckpoint:
+        """
+        Saves the generator so that it can later be put back to exactly where it is now
+        :return: Checkpoint of the current state
+        """
+        return GeneratorCheckpoint(state=copy.deepcopy(self._state),
+                                   roll_key=self._roll_key if self.seed is None else None)
+
+    def restore_checkpoint(self, checkpoint: GeneratorCheckpoint) -> None:
+        """
+        Puts the generator back to a checkpoint. Advancing from it gives the same weather as it did originally, up until
+        the end of the day.
+        :param checkpoint: Checkpoint to restore
+        :return: None
+        """
+        self._state = copy.deepcopy(checkpoint.state)
+        self._current_day_rolls = None
+        if checkpoint.roll_key is not None and self.seed is None:
+            self._roll_key = checkpoint.roll_key
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from campaignfile import write_campaign_file
+from dndcalendar import DnDCalendar
+
+AUTOSAVE_INTERVAL_SECONDS = 60.0  # Longest a change waits to be autosaved while the calendar keeps changing
+AUTOSAVE_QUIET_SECONDS = 5.0  # How long the calendar has to go without changes before they're autosaved
+AUTOSAVE_POLL_SECONDS = 0.5  # How often the thread looks for changes
+AUTOSAVE_DEFAULT_PATH = "autosave.dndc"  # Where a campaign that hasn't been saved yet is autosaved
+
+
+def autosave_path(save_path: str) -> str:
+    """
+    Where a campaign is autosaved. Never the save itself, so that the journal of a campaign file and the chunks a
+    calendar reads from its save stay as they were saved.
+    :param save_path: Path the campaign was last saved to or loaded from, or "" if there isn't one
+    :return: Path of the autosave, a campaign file
+    """
+    if not save_path:
+        return AUTOSAVE_DEFAULT_PATH
+    return f"{os.path.splitext(save_path)[0]}.autosave.dndc"
+
+
+@dataclass
+class AutosaveMetrics:
+    """ What the autosaves have cost. Times are in seconds. """
+    saves: int = 0
+    failures: int = 0
+    last_error: Optional[str] = None  # Why the last failed autosave failed
+    snapshot_seconds: float = 0.0  # Taking the snapshot of the last autosave, of which only part holds the lock
+    max_snapshot_seconds: float = 0.0
+    total_snapshot_seconds: float = 0.0
+    write_seconds: float = 0.0  # Writing the last autosave, which the calendar doesn't wait for
+    max_write_seconds: float = 0.0
+    total_write_seconds: float = 0.0
+    bytes_written: int = 0  # Size of the last autosave
+
+
+class Autosaver:
+    def __init__(self, calendar: DnDCalendar, path: str, info: Callable[[], Dict[str, object]],
+                 interval_seconds: float = AUTOSAVE_INTERVAL_SECONDS, quiet_seconds: float = AUTOSAVE_QUIET_SECONDS):
+        """
+        Saves a calendar into a campaign file in a background thread whenever it has been edited, see
+        DnDCalendar.changes. Weather generated while scrolling and changes of the info alone, such as moving the cursor,
+        aren't autosaved, but the info as it is is saved along with the next edit. An edit is saved once the calendar
+        has gone quiet_seconds without another one, or interval_seconds after it was made if the calendar keeps
+        changing. Each autosave writes a snapshot of the calendar, see DnDCalendar.snapshot, so the calendar is only
+        locked while the snapshot is taken and not while the file is written. The file is written next to the path and
+        moved over it, so an autosave that fails midway leaves the last one as it was.
+        :param calendar: The calendar
+        :param path: Path to autosave to
+        :param info: Called from the thread to get the save name, cursor time and calendar used to save with
+        :param interval_seconds: Longest a change waits to be autosaved
+        :param quiet_seconds: How long the calendar has to go without changes before they're autosaved
+        """
+        self._calendar = calendar
+        self.path = path
+        self._info = info
+        self.interval_seconds = interval_seconds
+        self.quiet_seconds = quiet_seconds
+        self.metrics = AutosaveMetrics()
+        # Changes of the calendar when it was last autosaved, loaded or saved
+        self._saved = calendar.changes
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="Autosaver", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the thread, waiting for the autosave it's writing, if any
+        :return: None
+        """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self) -> None:
+        seen = self._saved
+        changed_at = unsaved_since = None
+        while not self._stop.wait(AUTOSAVE_POLL_SECONDS):
+            now = time.monotonic()
+            state = self._calendar.changes
+            if state != seen:
+                seen = state
+                changed_at = now
+            if state == self._saved:
+                unsaved_since = None
+                continue
+            if unsaved_since is None:
+                unsaved_since = now
+            if now - changed_at >= self.quiet_seconds or now - unsaved_since >= self.interval_seconds:
+                self.save()
+                unsaved_since = None
+
+    def save(self) -> bool:
+        """
+        Autosaves the calendar as it is now. Called by the thread, but can be called from anywhere else too.
+        :return: Whether the autosave was written. A failure of any kind is recorded in the metrics instead of raised.
+        """
+        try:
+            state = self._calendar.changes
+            info = self._info()
+            start = time.perf_counter()
+            snapshot = self._calendar.snapshot()
+            snapshot_done = time.perf_counter()
+            write_campaign_file(self.path, snapshot, info)
+            bytes_written = os.path.getsize(self.path)
+        except Exception as e:
+            # Whatever went wrong, such as the disk filling up or the save the calendar reads from going away, the
+            # thread carries on and tries again later
+            self.metrics.failures += 1
+            self.metrics.last_error = f"{type(e).__name__}: {e}"
+            return False
+        end = time.perf_counter()
+        self._saved = state
+        metrics = self.metrics
+        metrics.saves += 1
+        metrics.snapshot_seconds = snapshot_done - start
+        metrics.max_snapshot_seconds = max(metrics.max_snapshot_seconds, metrics.snapshot_seconds)
+        metrics.total_snapshot_seconds += metrics.snapshot_seconds
+        metrics.write_seconds = end - snapshot_done
+        metrics.max_write_seconds = max(metrics.max_write_seconds, metrics.write_seconds)
+        metrics.total_write_seconds += metrics.write_seconds
+        metrics.bytes_written = bytes_written
+        return True
@@ -0,0 +1,921 @@
+"""
+Rough performance benchmarks for the calendar internals. Run with `python benchmarks.py [benchmark names]`. Without
+arguments every benchmark is run.
+"""
+import copy
+import dataclasses
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Tuple
+
+import numpy as np
+
+from autosave import Autosaver
+from campaigndatabase import open_campaign_database, write_campaign_database
+from campaignfile import read_campaign_file, write_campaign_file
+from campaignjournal import compact_campaign, open_campaign, write_campaign
+from climatetimeline import ClimateTimeline
+from diceengine import compile_dice
+from dndcalendar import DnDCalendar, Event, HistoryStore, Hour, HISTORY_CACHE_BYTES
+from jsonimport import import_json_save
+from pregenerator import Pregenerator
+from seedsave import SEED_SAVE_EXTENSION, read_seed_save, verify_seed_save, write_seed_save
+from WeatherGenerator import PRECIPITATION_DURATION_FLOOR, WEATHER_BLOCK_DTYPE, Weather, WeatherGenerator, \
+    WeatherGeneratorState, block_row_to_weather
+from weathercodes import PrecipitationType, PRECIPITATION_LABELS, PRECIPITATION_WARNINGS
+
+HOURS_IN_YEAR = 303 * 24
+
+
+def _timed(function, repeats: int = 1) -> float:
+    """
+    Runs a function and returns the average time per call in seconds
+    :param function: Function taking no arguments
+    :param repeats: How many times to call it
+    :return: Average seconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def _synthetic_calendar(years: int, island_spacing: int = 24 * 5) -> DnDCalendar:
+    """
+    Creates a calendar with generated islands spread over the given number of years without running the generator
+    :param years: How many years of history to fake
+    :param island_spacing: Hours between the starts of generated islands
+    :return: DnDCalendar
+    """
+    calendar = DnDCalendar()
+    calendar.show_generating_popup = False
+    island = np.zeros(24 * 3, dtype=WEATHER_BLOCK_DTYPE)
+    for island_start in range(0, years * HOURS_IN_YEAR, island_spacing):
+        calendar.history.write_block(island_start, island)
+    return calendar
+
+
+def bench_get_time_miss():
+    """ Time spent figuring out what to generate on a get_time miss as the history grows """
+    print("get_time miss planning latency")
+    for years in (1, 2, 5, 10, 20):
+        calendar = _synthetic_calendar(years)
+        miss_time = calendar._generated_hours.end + 10  # Close enough to continue on from the last island
+        latency = _timed(lambda: calendar._plan_generation(miss_time), repeats=1000)
+        # What every miss used to cost: sorting all generated hours
+        full_sort = _timed(lambda: np.sort(np.array(list(calendar.history.keys()))), repeats=10)
+        print(f"  {years:>2} years, {len(calendar.history):>7} hours: {latency * 1e6:8.2f} us "
+              f"(full sort of history: {full_sort * 1e6:10.2f} us)")
+
+
+def bench_dice():
+    """ Throughput of compiled dice expressions and of the hour-by-hour generator that uses them """
+    rng = np.random.default_rng()
+    d100 = compile_dice("1d100")
+    single = _timed(lambda: d100.roll(rng), repeats=10000)
+    batch = _timed(lambda: d100.roll_many(rng, 10000), repeats=100)
+    print("Dice rolls")
+    print(f"  single 1d100:        {single * 1e6:8.2f} us/roll")
+    print(f"  batch of 10000 1d100: {batch * 1e6:8.2f} us/batch ({batch / 10000 * 1e9:.1f} ns/roll)")
+
+    generator = WeatherGenerator(rng)
+    generator.initialize(season="summer", climate="temperate", elevation=1500, hour=0)
+
+    def advance():
+        generator.get_weather()
+        generator.advance_hour()
+    per_hour = _timed(advance, repeats=HOURS_IN_YEAR)
+    print(f"  sequential generator: {1 / per_hour:10.0f} hours/s")
+
+
+def bench_block():
+    """ Hour by hour generation compared to generating a year at a time """
+    generator = WeatherGenerator()
+    generator.initialize(season="summer", climate="temperate", elevation=1500, hour=23)
+    state = generator.get_state()
+
+    sequential_generator = WeatherGenerator()
+    sequential_generator.set_state(copy.deepcopy(state))
+
+    def sequential_year():
+        for _ in range(HOURS_IN_YEAR):
+            sequential_generator.get_weather()
+            sequential_generator.advance_hour()
+    sequential = _timed(sequential_year)
+    block_time = _timed(lambda: generator.generate_block(state, HOURS_IN_YEAR), repeats=10)
+    print("Weather generation, 1 year")
+    print(f"  hour by hour: {HOURS_IN_YEAR / sequential:12.0f} hours/s")
+    print(f"  block:        {HOURS_IN_YEAR / block_time:12.0f} hours/s ({sequential / block_time:.0f}x)")
+
+    # Both paths follow the same rules, so with the same random numbers they give the same weather
+    block, _ = WeatherGenerator(np.random.default_rng(1)).generate_block(state, HOURS_IN_YEAR * 10)
+    sequential_generator = WeatherGenerator(np.random.default_rng(2))
+    sequential_generator.set_state(copy.deepcopy(state))
+    temperatures = []
+    precipitation_hours = 0
+    for _ in range(HOURS_IN_YEAR * 10):
+        weather = sequential_generator.advance_hour()
+        temperatures.append(weather.temperature)
+        precipitation_hours += weather.precipitation_state != PrecipitationType.NONE
+    print(f"  mean temperature, block {block['temperature'].mean():6.2f} F, hour by hour {np.mean(temperatures):6.2f} F")
+    print(f"  precipitation,    block {(block['precipitation'] > 0).mean():6.2%},   "
+          f"hour by hour {precipitation_hours / (HOURS_IN_YEAR * 10):6.2%}")
+
+
+def bench_random_access():
+    """ Computing a single far away day with a seed compared to replaying every hour up to it """
+    generator = WeatherGenerator(seed=1)
+    print("Weather of a single day, seeded")
+    for years in (1, 10, 100):
+        day = years * HOURS_IN_YEAR // 24
+
+        def warm_up():
+            warm_up_day = generator.warm_up_start(day)
+            state = generator.warm_up_state(warm_up_day, "summer", "temperate", 1500)
+            generator.generate_block(state, (day - warm_up_day + 1) * 24)
+        latency = _timed(warm_up, repeats=100)
+        replay = _timed(lambda: generator.generate_block(generator.warm_up_state(0, "summer", "temperate", 1500),
+                                                         (day + 1) * 24), repeats=3)
+        print(f"  day {day:>6}: warm-up {latency * 1e6:8.1f} us, replay from epoch {replay * 1e6:10.1f} us")
+
+
+def bench_checkpoints():
+    """ Size of the saved generator state and the time to get the state at any hour back """
+    calendar = DnDCalendar()
+    calendar.show_generating_popup = False
+    for t in range(0, HOURS_IN_YEAR, 24 * 5):
+        calendar.get_time(t)
+    hours = len(calendar.history)
+    checkpoint_bytes = len(json.dumps(calendar.to_json()['checkpoints']))
+    # Older saves had a full generator state on every hour
+    per_hour_bytes = hours * len(json.dumps(calendar.get_generator_state(hours // 2).to_json()))
+    print(f"Generator state of {hours} hours")
+    print(f"  checkpoints: {len(calendar._checkpoints):6} {checkpoint_bytes / 1024:8.1f} KiB")
+    print(f"  per hour:    {hours:6} {per_hour_bytes / 1024:8.1f} KiB ({per_hour_bytes / checkpoint_bytes:.1f}x)")
+    latency = _timed(lambda: calendar.get_generator_state(24 * 7 + 23), repeats=100)
+    print(f"  state at the last hour of a day: {latency * 1e6:8.1f} us")
+
+
+def bench_history_memory():
+    """ Memory taken by 10 years of generated history, as Hour objects and as a HistoryStore """
+    hours = 10 * HOURS_IN_YEAR
+    block, _ = WeatherGenerator(seed=1).generate_block(WeatherGenerator(seed=1).warm_up_state(0, "summer", "temperate",
+                                                                                             1500), hours)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    history = {t: Hour(time_from_epoch=t, weather=block_row_to_weather(block[t]), events=[]) for t in range(hours)}
+    dict_bytes = tracemalloc.get_traced_memory()[0] - before
+    del history
+    before = tracemalloc.get_traced_memory()[0]
+    store = HistoryStore()
+    store.write_block(0, block)
+    store_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"History of {hours} hours")
+    print(f"  Dict[int, Hour]: {dict_bytes / 2**20:8.2f} MiB")
+    print(f"  HistoryStore:    {store_bytes / 2**20:8.2f} MiB ({dict_bytes / store_bytes:.0f}x smaller)")
+    latency = _timed(lambda: store[hours // 2], repeats=10000)
+    print(f"  building one Hour from the store: {latency * 1e6:6.2f} us")
+
+
+def bench_history_cache():
+    """ Memory taken by scrolling a day at a time across decades, with and without a memory budget for the history """
+    print("Scrolling across 20 years a day at a time")
+    for budget in (None, HISTORY_CACHE_BYTES // 4):
+        calendar = DnDCalendar(seed=1, history_budget_bytes=budget)
+        calendar.show_generating_popup = False
+        tracemalloc.start()
+        start = time.perf_counter()
+        for t in range(0, 20 * HOURS_IN_YEAR, 24):
+            calendar.get_time(t)
+        elapsed = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        label = "unbounded" if budget is None else f"{budget / 2**10:.0f} KiB budget"
+        print(f"  {label:>15}: {memory / 2**20:7.2f} MiB traced, {calendar.history.nbytes / 2**20:5.2f} MiB of "
+              f"weather, {len(calendar._checkpoints):6} checkpoints, {elapsed:5.2f} s")
+        counters = calendar.history.counters
+        # Scrolling back over the start has to recompute what was dropped
+        back = _timed(lambda: [calendar.get_time(t) for t in range(0, 24 * 30, 24)]) / 30
+        print(f"  {'':>15}  {counters.hits} hits, {counters.misses} misses, {counters.evictions} evictions, "
+              f"a day back at the start {back * 1e6:8.1f} us")
+
+
+def bench_pregeneration():
+    """ Holding the scroll key for ten days, with the missing hours generated on the spot or in the background """
+    shown_hours = 48
+    key_repeat = 1 / 60
+    print(f"Scrolling forward a step every {key_repeat * 1e3:.0f} ms with {shown_hours} hours shown")
+    for seed in (1, None):
+        for background in (False, True):
+            calendar = DnDCalendar(seed=seed)
+            calendar.show_generating_popup = False
+            pregenerator = Pregenerator(calendar) if background else None
+            if pregenerator is not None:
+                pregenerator.start()
+            latencies = []
+            stalls = 0
+            for cursor in range(0, 24 * 10):
+                if pregenerator is not None:
+                    pregenerator.follow(cursor, 1, margin=shown_hours // 2 + 1)
+                shown = range(cursor - shown_hours // 2, cursor + shown_hours // 2)
+                with calendar.lock:
+                    stalls += any(t not in calendar.history for t in shown)
+                start = time.perf_counter()
+                for t in shown:
+                    calendar.get_time(t)
+                latencies.append(time.perf_counter() - start)
+                time.sleep(key_repeat)
+            if pregenerator is not None:
+                pregenerator.stop()
+            label = f"{'seeded' if seed is not None else 'unseeded'}, {'background' if background else 'on the spot'}"
+            # The first step has nothing generated yet either way
+            print(f"  {label:>25}: {stalls - 1:3} later steps generated on the spot, "
+                  f"median {np.median(latencies[1:]) * 1e3:6.2f} ms, worst {max(latencies[1:]) * 1e3:6.2f} ms")
+
+
+def bench_hour_range():
+    """ Getting what a frame of the calendar window draws, an hour at a time and as one range """
+    calendar = DnDCalendar(seed=1)
+    calendar.show_generating_popup = False
+    rng = np.random.default_rng(1)
+    for event in _random_events(2000, rng):
+        calendar.add_event(event)
+    print("Hours of one frame")
+    for shown_hours in (24, 48, 96):
+        start = 5 * HOURS_IN_YEAR
+
+        def per_hour():
+            for t in range(start, start + shown_hours):
+                date_info = calendar.reckoningHandler.epoch_to_date(t, 'human')
+                hour = calendar.get_time(t)
+                date_info.date_string(short=True), date_info.time_string()
+                hour.weather.warning_symbols(False), hour.event_str(40)
+
+        def one_range():
+            hours = calendar.get_range(start, start + shown_hours, 'human')
+            for row in range(shown_hours):
+                hours.dates[row], hours.hours[row], hours.warnings[row], hours.event_str(row, 40)
+
+        one_range()
+        print(f"  {shown_hours:3} hours: an hour at a time {_timed(per_hour, repeats=50) * 1e3:6.2f} ms, "
+              f"as a range {_timed(one_range, repeats=50) * 1e3:6.2f} ms")
+
+
+def bench_climate_change():
+    """ Changing the climate of one month in the middle of the history, compared to regenerating everything after it """
+    print("Changing the climate of a month, with the climate changing every month")
+    for years in (1, 5, 20):
+        hours = years * HOURS_IN_YEAR
+        calendar = DnDCalendar(seed=1)
+        calendar.show_generating_popup = False
+        climates = list(calendar.get_climates())
+        for month in range(hours // (24 * 30)):
+            calendar.climate_timeline.set(month * 24 * 30, climate=climates[month % len(climates)])
+        block, checkpoints = calendar.compute_weather(0, hours)
+        calendar._checkpoints.update(checkpoints)
+        calendar.history.write_block(0, block)
+        start = (hours // (24 * 30) // 2) * 24 * 30 + 5
+        choice = iter(climates * 10)
+
+        def change():
+            calendar.change_climate(start, next(choice))
+            calendar.get_range(start - 24, start + 24 * 40, 'human')
+
+        def change_and_regenerate_after():
+            calendar.change_climate(start, next(choice))
+            calendar.regenerate_weather(start)
+
+        change_time = _timed(change, repeats=3)
+        stale = calendar._stale_hours.total_length
+        everything_time = _timed(change_and_regenerate_after, repeats=3)
+        print(f"  {years:2} years: regenerating the affected hours {change_time * 1e3:8.1f} ms, "
+              f"everything after {everything_time * 1e3:8.1f} ms ({stale} hours left stale)")
+
+
+def bench_climate_timeline():
+    """ Editing the climate of a region of the history, and looking up and saving a long climate timeline """
+    print("Changing the climate of a week, then reading it")
+    for years in (1, 5, 20):
+        hours = years * HOURS_IN_YEAR
+        calendar = DnDCalendar(seed=1)
+        calendar.show_generating_popup = False
+        block, checkpoints = calendar.compute_weather(0, hours)
+        calendar._checkpoints.update(checkpoints)
+        calendar.history.write_block(0, block)
+        climates = list(calendar.get_climates())
+        start = hours // 2 + 5
+        choice = iter(climates * 10)
+
+        def edit():
+            calendar.change_region(start, start + 24 * 7, climate=next(choice))
+
+        def edit_and_read():
+            edit()
+            calendar.get_range(start - 24, start + 24 * 14, 'human')
+
+        edit_time = _timed(edit, repeats=10)
+        stale = calendar._stale_hours.total_length
+        print(f"  {years:2} years: edit {edit_time * 1e6:7.1f} us, {stale} hours to regenerate, "
+              f"edit and read {_timed(edit_and_read, repeats=5) * 1e3:6.1f} ms")
+
+    rng = np.random.default_rng(1)
+    for segments in (10, 1000, 100000):
+        timeline = ClimateTimeline("temperate", 1500)
+        starts = np.cumsum(rng.integers(1, 24 * 30, size=segments)).tolist()
+        for start in starts:
+            timeline.set(start, climate=climates[int(rng.integers(len(climates)))],
+                         elevation=int(rng.integers(0, 20)) * 500)
+        queries = rng.integers(0, starts[-1], size=1000).tolist()
+        lookup = _timed(lambda: [timeline.at(t) for t in queries]) / len(queries)
+        listed = len(json.dumps([[start, *timeline.at(start)] for start in timeline.boundaries(-1, starts[-1] + 1)]))
+        columns = len(json.dumps(timeline.to_json()))
+        print(f"  {len(timeline):6} segments: lookup {lookup * 1e9:5.0f} ns, saved as a list {listed / 1024:7.1f} KiB, "
+              f"in columns {columns / 1024:7.1f} KiB")
+
+
+def _precipitation_warning_by_string(precipitation: str) -> str:
+    """ How the precipitation warning used to be picked, by searching the display string """
+    if "fog" in precipitation.lower():
+        return "F"
+    elif "thunderstorm" in precipitation.lower():
+        return "S"
+    elif precipitation != "":
+        return "R"
+    return ""
+
+
+def bench_weather_codes():
+    """ Picking warning symbols from category codes compared to searching the display strings """
+    block, _ = WeatherGenerator(seed=1).generate_block(WeatherGenerator(seed=1).warm_up_state(0, "summer", "temperate",
+                                                                                             1500), HOURS_IN_YEAR)
+    weathers = [block_row_to_weather(row) for row in block]
+    labels = [PRECIPITATION_LABELS[weather.precipitation_state] for weather in weathers]
+    by_code = _timed(lambda: [PRECIPITATION_WARNINGS[weather.precipitation_state][0] for weather in weathers],
+                     repeats=5)
+    by_string = _timed(lambda: [_precipitation_warning_by_string(label) for label in labels], repeats=5)
+    all_warnings = _timed(lambda: [weather.warning_symbols() for weather in weathers], repeats=5)
+    print(f"Warning symbols for {HOURS_IN_YEAR} hours")
+    print(f"  precipitation warning from codes:   {by_code / HOURS_IN_YEAR * 1e9:6.0f} ns/hour")
+    print(f"  precipitation warning from strings: {by_string / HOURS_IN_YEAR * 1e9:6.0f} ns/hour")
+    print(f"  all warning symbols:                {all_warnings / HOURS_IN_YEAR * 1e9:6.0f} ns/hour")
+    dumped = json.dumps([weather.to_json() for weather in weathers[:24]])
+    print(f"  one day of weather as JSON: {len(dumped)} bytes")
+
+
+@dataclasses.dataclass
+class _MutableWeather:
+    """ How Weather used to be laid out, a plain dataclass with a __dict__ """
+    temperature: int = 0
+    precipitation_state: PrecipitationType = PrecipitationType.NONE
+    precipitation_duration: int = 0
+    wind_direction: int = 0
+    wind_strength: int = 0
+    wind_speed: int = 0
+    cloud_cover: int = 0
+
+
+def _allocations(function, calls: int):
+    """
+    Calls a function repeatedly, keeping every result alive, and measures what was allocated
+    :param function: Function taking no arguments
+    :param calls: How many times to call it
+    :return: Tuple of (allocated blocks per call, allocated bytes per call)
+    """
+    results = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(calls):
+        results.append(function())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    differences = [d for d in after.compare_to(before, "filename") if d.size_diff > 0]
+    # The list holding the results isn't part of what's being measured
+    blocks = sum(d.count_diff for d in differences) - 1
+    size = sum(d.size_diff for d in differences) - sys.getsizeof(results)
+    return blocks / calls, size / calls
+
+
+def bench_weather_allocations():
+    """ Allocations for each hour handed out by get_weather, with a mutable Weather copied every time and now """
+    generator = WeatherGenerator(seed=1)
+    generator.initialize(season="summer", climate="temperate", elevation=1500, hour=0)
+    weather = generator.get_weather()
+    mutable = _MutableWeather(**{field.name: getattr(weather, field.name) for field in dataclasses.fields(Weather)})
+
+    old_blocks, old_bytes = _allocations(lambda: copy.deepcopy(mutable), HOURS_IN_YEAR)
+    new_blocks, new_bytes = _allocations(generator.get_weather, HOURS_IN_YEAR)
+    old_time = _timed(lambda: copy.deepcopy(mutable), repeats=HOURS_IN_YEAR)
+    new_time = _timed(generator.get_weather, repeats=HOURS_IN_YEAR)
+    print(f"get_weather over {HOURS_IN_YEAR} hours")
+    print(f"  mutable + deepcopy: {old_blocks:5.1f} allocations, {old_bytes:6.0f} bytes, "
+          f"{old_time * 1e6:6.2f} us per hour")
+    print(f"  immutable, shared:  {new_blocks:5.1f} allocations, {new_bytes:6.0f} bytes, "
+          f"{new_time * 1e6:6.2f} us per hour")
+
+    # Each generated hour still makes one new Weather, which is now a lot smaller
+    old_record = sys.getsizeof(mutable) + sys.getsizeof(mutable.__dict__)
+    print(f"  size of one record: mutable {old_record} bytes, slotted {sys.getsizeof(weather)} bytes")
+    generated_blocks, generated_bytes = _allocations(generator.advance_hour, HOURS_IN_YEAR)
+    print(f"  advance_hour:       {generated_blocks:5.1f} allocations, {generated_bytes:6.0f} bytes per hour")
+
+
+def _reflective_to_json(obj) -> dict:
+    """ How objects used to be serialized, by looking their attributes up with dir() """
+    return {attr: getattr(obj, attr) for attr in dir(obj)
+            if not attr.startswith("__") and not callable(getattr(obj, attr))}
+
+
+def _reflective_from_json(obj, json_obj):
+    """ How objects used to be deserialized, by checking every key against dir() and setting it """
+    d = dir(obj)
+    for key, val in json_obj.items():
+        if key in d:
+            setattr(obj, key, val)
+    return obj
+
+
+def bench_save_round_trip():
+    """ Saving and loading a calendar with years of generated history """
+    years = 5
+    hours = years * HOURS_IN_YEAR
+    calendar = DnDCalendar(seed=1)
+    calendar.show_generating_popup = False
+    block, checkpoints = calendar.compute_weather(0, hours)
+    calendar.history.write_block(0, block)
+    calendar._checkpoints.update(checkpoints)
+
+    saved = calendar.to_json()
+    dumped = json.dumps(saved)
+    loaded = json.loads(dumped)
+    encode = _timed(calendar.to_json, repeats=3)
+    dumps = _timed(lambda: json.dumps(saved), repeats=3)
+    loads = _timed(lambda: json.loads(dumped), repeats=3)
+    decode = _timed(lambda: DnDCalendar.from_json(loaded), repeats=3)
+    print(f"Save of {years} years, {hours} hours, {len(dumped) / 2**20:.1f} MiB of JSON")
+    print(f"  to_json:    {hours / encode:10.0f} hours/s")
+    print(f"  json.dumps: {hours / dumps:10.0f} hours/s")
+    print(f"  json.loads: {hours / loads:10.0f} hours/s")
+    print(f"  from_json:  {hours / decode:10.0f} hours/s")
+    print(f"  round trip: {hours / (encode + dumps + loads + decode):10.0f} hours/s")
+
+    # The same objects serialized by reflection, the way every class used to do it
+    weather = calendar.history[hours // 2].weather
+    state = calendar.get_generator_state(hours // 2)
+    weather_json = weather.to_json()
+    state_json = state.to_json()
+    for name, schema_time, reflective_time in (
+            ("Weather to_json", _timed(weather.to_json, repeats=10000),
+             _timed(lambda: _reflective_to_json(weather), repeats=10000)),
+            ("Weather from_json", _timed(lambda: Weather.from_json(weather_json), repeats=10000),
+             _timed(lambda: _reflective_from_json(_MutableWeather(), weather_json), repeats=10000)),
+            ("state to_json", _timed(state.to_json, repeats=10000),
+             _timed(lambda: _reflective_to_json(state), repeats=10000)),
+            ("state from_json", _timed(lambda: WeatherGeneratorState.from_json(state_json), repeats=10000),
+             _timed(lambda: _reflective_from_json(WeatherGeneratorState(), state_json), repeats=10000))):
+        print(f"  {name:<18} schema {schema_time * 1e6:6.2f} us, reflection {reflective_time * 1e6:6.2f} us "
+              f"({reflective_time / schema_time:.0f}x)")
+
+
+def bench_campaign_file():
+    """ Saving and opening a campaign as a JSON save and as a campaign file """
+    for years in (5, 20):
+        hours = years * HOURS_IN_YEAR
+        calendar = DnDCalendar(seed=1)
+        calendar.show_generating_popup = False
+        block, checkpoints = calendar.compute_weather(0, hours)
+        calendar._checkpoints.update(checkpoints)
+        calendar.history.write_block(0, block)
+        info = {'save_name': "Benchmark", 'current_time': hours // 2, 'calendar_used': 'human'}
+        print(f"Campaign of {years} years")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "campaign.json")
+
+            def save_json():
+                with open(path, 'w') as f:
+                    json.dump(dict(info, calendar=calendar.to_json()), f)
+
+            def open_json():
+                with open(path) as f:
+                    opened = DnDCalendar.from_json(json.load(f)['calendar'], history_budget_bytes=HISTORY_CACHE_BYTES)
+                opened.get_range(hours // 2 - 24, hours // 2 + 24, 'human')
+
+            save_time, open_time = _timed(save_json), _timed(open_json)
+            print(f"  {'JSON':<6} {save_time * 1e3:8.1f} ms to save, {open_time * 1e3:8.1f} ms to open and show a "
+                  f"frame, {os.path.getsize(path) / 2**20:7.2f} MiB")
+            for compression in ("none", "zlib", "lzma"):
+                path = os.path.join(directory, f"campaign.{compression}.dndc")
+
+                def open_file():
+                    opened, _ = read_campaign_file(path, history_budget_bytes=HISTORY_CACHE_BYTES)
+                    opened.get_range(hours // 2 - 24, hours // 2 + 24, 'human')
+
+                save_time = _timed(lambda: write_campaign_file(path, calendar, info, compression))
+                open_time = _timed(open_file, repeats=5)
+                print(f"  {compression:<6} {save_time * 1e3:8.1f} ms to save, {open_time * 1e3:8.1f} ms to open and "
+                      f"show a frame, {os.path.getsize(path) / 2**20:7.2f} MiB")
+
+
+def bench_journal():
+    """ Saving a large campaign after a small edit, by appending to the journal and by writing the whole file """
+    years = 20
+    hours = years * HOURS_IN_YEAR
+    calendar = DnDCalendar(seed=1)
+    calendar.show_generating_popup = False
+    block, checkpoints = calendar.compute_weather(0, hours)
+    calendar._checkpoints.update(checkpoints)
+    calendar.history.write_block(0, block)
+    info = {'save_name': "Benchmark", 'current_time': hours // 2, 'calendar_used': 'human'}
+    print(f"Campaign of {years} years")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "campaign.dndc")
+        journal = compact_campaign(path, calendar, info)
+        edits = [0]
+
+        def edit_and_save(save):
+            edits[0] += 1
+            calendar.add_event(Event("Somewhere", f"Event number {edits[0]}", edits[0] * 24, 2))
+            save()
+
+        def append():
+            nonlocal journal
+            journal = write_campaign(path, calendar, info, journal)
+
+        append_time = _timed(lambda: edit_and_save(append), repeats=100)
+        rewrite_time = _timed(lambda: edit_and_save(lambda: compact_campaign(path, calendar, info)), repeats=5)
+        print(f"  save after adding an event: journal {append_time * 1e3:7.2f} ms, "
+              f"whole file {rewrite_time * 1e3:7.2f} ms")
+        for changes in (0, 100, 1000):
+            journal = compact_campaign(path, calendar, info)
+            for _ in range(changes):
+                edit_and_save(lambda: None)
+            journal = write_campaign(path, calendar, info, journal)
+            open_time = _timed(lambda: open_campaign(path, history_budget_bytes=HISTORY_CACHE_BYTES))
+            print(f"  open with {changes:>4} changes in the journal: {open_time * 1e3:7.2f} ms, "
+                  f"journal {journal.size / 1024:7.1f} KiB")
+
+
+def bench_campaign_database():
+    """ Opening, reading through and saving a campaign database """
+    years = 10
+    hours = years * HOURS_IN_YEAR
+    calendar = DnDCalendar(seed=1)
+    calendar.show_generating_popup = False
+    block, checkpoints = calendar.compute_weather(0, hours)
+    calendar._checkpoints.update(checkpoints)
+    calendar.history.write_block(0, block)
+    info = {'save_name': "Benchmark", 'current_time': hours // 2, 'calendar_used': 'human'}
+    print(f"Campaign of {years} years")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "campaign.sqlite")
+        create_time = _timed(lambda: write_campaign_database(path, calendar, info).close())
+        print(f"  create: {create_time * 1e3:8.1f} ms, {os.path.getsize(path) / 2**20:6.2f} MiB")
+
+        def open_database():
+            opened, _, database = open_campaign_database(path, history_budget_bytes=HISTORY_CACHE_BYTES)
+            opened.show_generating_popup = False
+            opened.get_range(hours // 2 - 24, hours // 2 + 24, 'human')
+            return opened, database
+
+        open_time = _timed(lambda: open_database()[1].close(), repeats=5)
+        print(f"  open and show a frame: {open_time * 1e3:8.2f} ms")
+        opened, database = open_database()
+        tracemalloc.start()
+        start = time.perf_counter()
+        for t in range(0, hours, 24 * 7):
+            opened.get_range(t, t + 24 * 7, 'human')
+        scroll_time = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  read through a week at a time: {scroll_time * 1e3:8.1f} ms, peak {peak / 2**20:6.2f} MiB allocated, "
+              f"{opened.history.nbytes / 2**20:5.2f} MiB of weather in memory")
+        edits = [0]
+
+        def edit_and_save():
+            edits[0] += 1
+            opened.add_event(Event("Somewhere", f"Event number {edits[0]}", edits[0] * 24, 2))
+            write_campaign_database(path, opened, info, database)
+
+        print(f"  save after adding an event: {_timed(edit_and_save, repeats=20) * 1e3:8.2f} ms")
+        database.close()
+
+
+def bench_seed_save():
+    """ Size of a seeded campaign as a campaign file and as a seed save, and reading through the regenerated weather """
+    years = 10
+    hours = years * HOURS_IN_YEAR
+    calendar = DnDCalendar(seed=1)
+    calendar.show_generating_popup = False
+    block, checkpoints = calendar.compute_weather(0, hours)
+    calendar._checkpoints.update(checkpoints)
+    calendar.history.write_block(0, block)
+    info = {'save_name': "Benchmark", 'current_time': hours // 2, 'calendar_used': 'human'}
+    print(f"Campaign of {years} years")
+    with tempfile.TemporaryDirectory() as directory:
+        campaign_path = os.path.join(directory, "campaign.dndc")
+        seed_path = os.path.join(directory, f"campaign{SEED_SAVE_EXTENSION}")
+        campaign_time = _timed(lambda: write_campaign_file(campaign_path, calendar, info))
+        print(f"  campaign file: {campaign_time * 1e3:8.1f} ms, {os.path.getsize(campaign_path) / 2**10:8.1f} KiB")
+        seed_time = _timed(lambda: write_seed_save(seed_path, calendar, info))
+        print(f"  seed save:     {seed_time * 1e3:8.1f} ms, {os.path.getsize(seed_path) / 2**10:8.1f} KiB")
+
+        def open_seed_save():
+            opened, _, _ = read_seed_save(seed_path, history_budget_bytes=HISTORY_CACHE_BYTES)
+            opened.show_generating_popup = False
+            opened.get_range(hours // 2 - 24, hours // 2 + 24, 'human')
+            return opened
+
+        print(f"  open the seed save and show a frame: {_timed(open_seed_save, repeats=5) * 1e3:8.2f} ms")
+        opened = open_seed_save()
+        start = time.perf_counter()
+        for t in range(0, hours, 24 * 7):
+            opened.get_range(t, t + 24 * 7, 'human')
+        print(f"  read through a week at a time: {(time.perf_counter() - start) * 1e3:8.1f} ms")
+        original, _ = read_campaign_file(campaign_path)  # The saved calendar reads its history from the seed save now
+        verification = verify_seed_save(original, opened, 0, hours)
+        print(f"  {verification.hours_compared} hours regenerated, bit-identical: {verification.identical}")
+
+
+def bench_autosave():
+    """ Redrawing the calendar while it's autosaved in the background, and the cost of each autosave """
+    years = 20
+    hours = years * HOURS_IN_YEAR
+    calendar = DnDCalendar(seed=1, history_budget_bytes=HISTORY_CACHE_BYTES)
+    calendar.show_generating_popup = False
+    calendar.pregenerate(0, hours, hours)
+    for i in range(2000):
+        calendar.add_event(Event("Somewhere", f"Event number {i}", i * 37, 5))
+    info = {'save_name': "Benchmark", 'current_time': 0, 'calendar_used': 'human'}
+    print(f"Campaign of {years} years")
+
+    def redraw_times(seconds: float) -> Tuple[np.ndarray, np.ndarray]:
+        # A redraw of a week after each key press, moving a day at a time. Also returns how long each redraw waited
+        # for the lock of the calendar.
+        times = []
+        waits = []
+        t = 0
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            start = time.perf_counter()
+            with calendar.lock:
+                waits.append(time.perf_counter() - start)
+                calendar.get_range(t, t + 24 * 7, 'human')
+            times.append(time.perf_counter() - start)
+            t = (t + 24) % hours
+            time.sleep(0.005)
+        return np.array(times), np.array(waits)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "campaign.autosave.dndc")
+        print(f"  save in the foreground: {_timed(lambda: write_campaign_file(path, calendar, info)) * 1e3:8.1f} ms")
+        idle = redraw_times(2.0)
+        autosaver = Autosaver(calendar, path, lambda: info)
+        stop = threading.Event()
+
+        def autosave_continuously():
+            while not stop.is_set():
+                calendar.add_event(Event("Somewhere", "Edited", 0, 1))
+                autosaver.save()
+
+        thread = threading.Thread(target=autosave_continuously)
+        thread.start()
+        busy = redraw_times(4.0)
+        stop.set()
+        thread.join()
+        metrics = autosaver.metrics
+        for name, (times, waits) in (("idle", idle), ("while autosaving", busy)):
+            print(f"  redraw {name}: median {np.median(times) * 1e3:6.2f} ms, 99th percentile "
+                  f"{np.percentile(times, 99) * 1e3:6.2f} ms, max {times.max() * 1e3:6.2f} ms, longest wait for the lock "
+                  f"{waits.max() * 1e3:6.2f} ms")
+        print(f"  {metrics.saves} autosaves: snapshot {metrics.total_snapshot_seconds / metrics.saves * 1e3:6.2f} ms "
+              f"(max {metrics.max_snapshot_seconds * 1e3:6.2f} ms), write "
+              f"{metrics.total_write_seconds / metrics.saves * 1e3:6.1f} ms, {metrics.bytes_written / 2**20:5.2f} MiB")
+
+
+def _run_measured(code: str) -> Tuple[float, float]:
+    """
+    Runs code in a new Python process, so that its peak memory isn't mixed up with that of this one. Peak RSS is read
+    from /proc, so this only works on Linux. getrusage would also count the peak of this process, which it keeps
+    across the exec.
+    :param code: Code setting 'seconds' to the time it took
+    :return: Time taken in seconds and peak RSS of the process in MiB
+    """
+    code += "\nprint(seconds, open('/proc/self/status').read().split('VmHWM:')[1].split()[0])"
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    seconds, max_rss = result.stdout.split()[-2:]
+    return float(seconds), int(max_rss) / 1024
+
+
+def bench_json_import():
+    """ Loading a 100 MB JSON save with json.load and from_json, and with the streaming importer """
+    years = 63
+    hours = years * HOURS_IN_YEAR
+    calendar = DnDCalendar(seed=1)
+    calendar.show_generating_popup = False
+    block, checkpoints = calendar.compute_weather(0, hours)
+    calendar._checkpoints.update(checkpoints)
+    calendar.history.write_block(0, block)
+    calendar_json = calendar.to_json()
+    # Like in the saves of older versions, the duration counts down for as long as it stays dry, far past what the
+    # weather columns hold
+    durations = block['precipitation_duration'].astype(np.int64)
+    dry = durations == PRECIPITATION_DURATION_FLOOR
+    last_wet = np.maximum.accumulate(np.where(dry, -1, np.arange(hours)))
+    durations[dry] -= (np.arange(hours) - last_wet - 1)[dry]
+    for t, duration in zip(range(hours), durations.tolist()):
+        calendar_json['history'][t]['weather']['precipitation_duration'] = duration
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "campaign.json")
+        with open(path, 'w') as f:
+            json.dump({'save_name': "Benchmark", 'current_time': hours // 2, 'calendar_used': 'human',
+                       'calendar': calendar_json}, f)
+        del calendar, calendar_json, block, checkpoints, durations
+        print(f"Save of {years} years, {os.path.getsize(path) / 2**20:.1f} MiB")
+        setup = "import json, time\nfrom dndcalendar import DnDCalendar\nfrom jsonimport import import_json_save\n"
+        _, baseline = _run_measured(setup + "seconds = 0")
+        print(f"  {'imports only':<22} {'':>8}    peak RSS {baseline:7.1f} MiB")
+        loaders = {"json.load + from_json": "with open(path) as f:\n"
+                                            "    DnDCalendar.from_json(json.load(f)['calendar'])",
+                   "streaming importer": "import_json_save(path)"}
+        for name, load in loaders.items():
+            seconds, peak = _run_measured(f"{setup}path = {path!r}\nstart = time.perf_counter()\n{load}\n"
+                                          f"seconds = time.perf_counter() - start")
+            print(f"  {name:<22} {seconds:6.2f} s    peak RSS {peak:7.1f} MiB")
+        with open(path) as f:
+            loaded = DnDCalendar.from_json(json.load(f)['calendar'])
+        assert json.dumps(import_json_save(path)[0].to_json(), sort_keys=True) == \
+            json.dumps(loaded.to_json(), sort_keys=True)
+        print("  Same calendar both ways")
+
+
+def bench_event_saves():
+    """ Size and load time of saved events, as an event table and with every event on every hour it's on """
+    print("Saved events, 200 events")
+    for duration in (1, 24, 24 * 7):
+        store = HistoryStore()
+        for i in range(200):
+            store.add_event(Event("Somewhere", f"Event number {i}", i * (HOURS_IN_YEAR - duration) // 200, duration))
+        table = json.loads(json.dumps(store.events_to_json()))
+        per_hour = json.loads(json.dumps({t: [event.to_json() for event in store.events.at(t)]
+                                          for t in range(HOURS_IN_YEAR) if len(store.events.at(t)) > 0}))
+        table_load = _timed(lambda: HistoryStore.from_json({}, table), repeats=5)
+        per_hour_load = _timed(lambda: [[Event.from_json(event) for event in events] for events in per_hour.values()],
+                               repeats=5)
+        table_bytes = len(json.dumps(table))
+        per_hour_bytes = len(json.dumps(per_hour))
+        print(f"  {duration:>3} hours each: table {table_bytes / 1024:7.1f} KiB {table_load * 1e3:6.2f} ms, "
+              f"per hour {per_hour_bytes / 1024:7.1f} KiB {per_hour_load * 1e3:6.2f} ms")
+
+
+def _random_events(count: int, rng: np.random.Generator):
+    """
+    Makes events spread over ten years, mostly short but some lasting weeks
+    :param count: How many events to make
+    :param rng: Random generator
+    :return: List of events
+    """
+    starts = rng.integers(0, 10 * HOURS_IN_YEAR, size=count).tolist()
+    durations = np.where(rng.random(count) < 0.9, rng.integers(1, 12, size=count),
+                         rng.integers(24, 24 * 30, size=count)).tolist()
+    return [Event("Somewhere", f"Event number {i}", start, duration)
+            for i, (start, duration) in enumerate(zip(starts, durations))]
+
+
+def bench_event_index():
+    """ The event index compared to keeping a list of events on every hour """
+    rng = np.random.default_rng(1)
+    events = _random_events(10000, rng)
+    queries = rng.integers(0, 10 * HOURS_IN_YEAR, size=1000).tolist()
+
+    def build_index():
+        store = HistoryStore()
+        for event in events:
+            store.add_event(event)
+        return store
+    store = build_index()
+
+    # How events used to be kept
+    def build_per_hour():
+        hours = {}
+        for event in events:
+            for t in range(event.start_time_epoch, event.start_time_epoch + event.duration):
+                hours.setdefault(t, []).append(event)
+        return hours
+    per_hour = build_per_hour()
+
+    def remove_from_per_hour(event):
+        for t in range(event.start_time_epoch, event.start_time_epoch + event.duration + 1):
+            if t in per_hour and event in per_hour[t]:
+                per_hour[t].remove(event)
+
+    def week_from_per_hour(start):
+        found = {}
+        for t in range(start, start + 24 * 7):
+            for event in per_hour.get(t, ()):
+                found[event.id] = event
+        return sorted(found.values(), key=lambda e: e.start_time_epoch)
+
+    print(f"{len(events)} events")
+    add_index = _timed(build_index)
+    add_per_hour = _timed(build_per_hour)
+    print(f"  add all:           index {add_index * 1e3:7.2f} ms, per hour {add_per_hour * 1e3:8.2f} ms")
+    week_index = _timed(lambda: [store.events.overlapping(t, t + 24 * 7) for t in queries]) / len(queries)
+    week_per_hour = _timed(lambda: [week_from_per_hour(t) for t in queries]) / len(queries)
+    print(f"  events of a week:  index {week_index * 1e6:7.2f} us, per hour {week_per_hour * 1e6:8.2f} us")
+    hour_index = _timed(lambda: [store.events.at(t) for t in queries]) / len(queries)
+    hour_per_hour = _timed(lambda: [per_hour.get(t, []) for t in queries]) / len(queries)
+    print(f"  events of an hour: index {hour_index * 1e6:7.2f} us, per hour {hour_per_hour * 1e6:8.2f} us")
+    removed = events[::10]
+    remove_index = _timed(lambda: [store.remove_event(event) for event in removed]) / len(removed)
+    remove_per_hour = _timed(lambda: [remove_from_per_hour(event) for event in removed]) / len(removed)
+    print(f"  remove one:        index {remove_index * 1e6:7.2f} us, per hour {remove_per_hour * 1e6:8.2f} us")
+
+
+_SEARCH_WORDS = ("dragon", "goblin", "tavern", "castle", "market", "ambush", "storm", "ritual", "merchant", "caravan",
+                 "temple", "bandit", "festival", "harbor", "ruins", "council", "wedding", "funeral", "duel", "heist")
+
+
+def bench_event_search():
+    """ Keyword search over event locations and descriptions compared to scanning every event """
+    rng = np.random.default_rng(1)
+    events = _random_events(10000, rng)
+    words = [f"{word}{i}" for i in range(50) for word in _SEARCH_WORDS]  # 1000 distinct words
+    for event in events:
+        event.location = words[int(rng.integers(len(words)))].capitalize()
+        event.description = " ".join(words[i] for i in rng.integers(len(words), size=8).tolist())
+    store = HistoryStore()
+    for event in events:
+        store.add_event(event)
+
+    def scan(query):
+        terms = query.casefold().split()
+        found = []
+        for event in events:
+            event_words = f"{event.location} {event.description}".casefold().split()
+            if all(any(word.startswith(term) for word in event_words) for term in terms):
+                found.append(event)
+        return sorted(found, key=lambda e: e.start_time_epoch)
+
+    print(f"Search over {len(events)} events")
+    for query in ("dragon7", "drag", "tavern1 storm", "castle42 festival3"):
+        indexed = _timed(lambda: store.events.search(query), repeats=20)
+        scanned = _timed(lambda: scan(query), repeats=2)
+        hits = len(store.events.search(query))
+        print(f"  {query!r:<22} {hits:5} hits: index {indexed * 1e3:7.3f} ms, scan {scanned * 1e3:8.2f} ms")
+    event = events[0]
+    update = _timed(lambda: store.move_event(event), repeats=1000)
+    print(f"  re-indexing an edited event: {update * 1e6:6.2f} us")
+
+
+def bench_location_timeline():
+    """ Where the party was, from the location timeline and by scanning every event """
+    rng = np.random.default_rng(1)
+    events = _random_events(10000, rng)
+    places = [f"Place {i}" for i in range(200)]
+    for event in events:
+        event.location = places[int(rng.integers(len(places)))]
+    store = HistoryStore()
+    for event in events:
+        store.add_event(event)
+    timeline = store.events.locations
+    queries = rng.integers(0, 10 * HOURS_IN_YEAR, size=1000).tolist()
+
+    def scan_location_at(t):
+        latest = None
+        for event in events:
+            if event.start_time_epoch <= t and (latest is None or event.start_time_epoch > latest.start_time_epoch):
+                latest = event
+        return None if latest is None else latest.location
+
+    def scan_dwell_times():
+        ordered = sorted(events, key=lambda e: e.start_time_epoch)
+        dwell = {}
+        for event, following in zip(ordered, ordered[1:]):
+            dwell[event.location] = dwell.get(event.location, 0) + following.start_time_epoch - event.start_time_epoch
+        return dwell
+
+    location_at = _timed(lambda: [timeline.location_at(t) for t in queries]) / len(queries)
+    scanned_location_at = _timed(lambda: [scan_location_at(t) for t in queries[:10]]) / 10
+    print(f"Location timeline of {len(events)} events at {len(places)} places")
+    print(f"  location at a time: timeline {location_at * 1e6:7.2f} us, scan {scanned_location_at * 1e6:9.2f} us")
+    print(f"  visits to a place:  timeline {_timed(lambda: timeline.visits(places[0]), repeats=100) * 1e6:7.2f} us")
+    print(f"  dwell times:        timeline {_timed(timeline.dwell_times, repeats=100) * 1e6:7.2f} us, "
+          f"scan {_timed(scan_dwell_times, repeats=5) * 1e6:9.2f} us")
+    event = events[0]
+    print(f"  moving an event:    {_timed(lambda: store.move_event(event), repeats=1000) * 1e6:7.2f} us")
+
+
+BENCHMARKS = {name[len("bench_"):]: function for name, function in list(globals().items())
+              if name.startswith("bench_")}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in selected:
+        BENCHMARKS[name]()
@@ -7,6 +7,8 @@ import curses
 from text_changers import TextBiggener, WeatherSymbols
 from dateprompt import DatePrompt
 from eventeditwindow import EventEditWindow
+from pregenerator import Pregenerator
+from searchprompt import SearchPrompt
 
 
 class CalendarSelectionMode(Enum):
@@ -46,8 +48,27 @@ class CalendarWindow:
         self._event_start: int = self._weather_start + self._weather_width + 3
 
         self._resize_window()
+        # Generates the hours around the cursor in the background, ahead of where it's moving
+        self._pregenerator = Pregenerator(calendar)
+        self._pregenerator.start()
+        self._follow_cursor()
         #self.redraw()
 
+    def _follow_cursor(self, direction: int = 1) -> None:
+        """
+        Lets the pre-generator know where the cursor moved
+        :param direction: 1 if the cursor moved forward in time, -1 if backwards
+        :return: None
+        """
+        self._pregenerator.follow(self._cursor_time, direction, margin=self._shown_hours_amount // 2 + 1)
+
+    def close(self) -> None:
+        """
+        Stops the background generation of the window
+        :return: None
+        """
+        self._pregenerator.stop()
+
     def _resize_window(self) -> None:
         """
         Figures out window size related variables
@@ -149,16 +170,15 @@ class CalendarWindow:
         :return: None
         """
         start_time = self._cursor_time - (self._shown_hours_amount // 2)
+        hours = self._calendar.get_range(start_time, start_time + self._shown_hours_amount, self._used_calendar)
 
         start_row = 3
         for row in range(self._shown_hours_amount):
             current_time = start_time + row
             selected_day = False
-            date_info = self._calendar.reckoningHandler.epoch_to_date(current_time, self._used_calendar)
-            calendar_info = self._calendar.get_time(current_time)
 
             # draw date
-            datestr = f"{date_info.date_string(short=True):>{self._date_width}}"
+            datestr = f"{hours.dates[row]:>{self._date_width}}"
             if self._selection_mode == CalendarSelectionMode.TIME:
                 if current_time == self._cursor_time:
                     selected_day = True
@@ -170,15 +190,15 @@ class CalendarWindow:
             self._window.addstr(start_row+row, self._date_start, datestr)
 
             # Draw time
-            time_str = f"[{date_info.time_string()}]"
+            time_str = f"[{hours.hours[row]:0>2}:00]"
             self._window.addstr(start_row+row, self._time_start, time_str)
 
             # Draw weather
-            weather_str = f"{calendar_info.weather.warning_symbols(False)}"
+            weather_str = hours.warnings[row]
             self._window.addstr(start_row+row, self._weather_start, f"{weather_str}")
 
             # Draw events
-            event_str = f"{calendar_info.event_str(maxwidth=self._events_width)}"
+            event_str = f"{hours.event_str(row, maxwidth=self._events_width)}"
             self._window.addstr(start_row+row, self._event_start, event_str)
 
             if selected_day:
@@ -216,21 +236,25 @@ class CalendarWindow:
         self._window.addstr(9, date_str_start, date_str)
 
         # Draw climate and elevation
-        climate_ele_str = f"{calendar_info.generator_state.season_str()} - {calendar_info.generator_state.climate_str()} - {calendar_info.generator_state.elevation_str()}"
+        generator_state = self._calendar.get_generator_state(calendar_info.time_from_epoch)
+        climate_ele_str = f"{generator_state.season_str()} - {generator_state.climate_str()} - {generator_state.elevation_str()}"
         climate_str_width = len(climate_ele_str)
         climate_str_start = start_x + content_width//2-climate_str_width//2
         self._window.addstr(10, climate_str_start, climate_ele_str)
 
+        # Draw where the party is
+        location = self._calendar.location_at(self._cursor_time)
+        if location is not None:
+            location_str = f"{location[:content_width]}"
+            self._window.addstr(11, start_x + content_width//2-len(location_str)//2, location_str)
+
         # Draw weather symbol
         weather_symbols = WeatherSymbols()
-        if calendar_info.weather.precipitation_state != "":
-            weather = calendar_info.weather.precipitation_state
-        else:
-            weather = calendar_info.weather.cloud_cover
-        weather_symbol = weather_symbols.weather_string_to_symbol(weather)
+        weather_symbol = weather_symbols.weather_to_symbol(calendar_info.weather)
         symbol_start = start_x + content_width - 16  # Offset for temperature
         for y, l in enumerate(weather_symbol):
             self._window.addstr(12+y, symbol_start, f"{l:^14}")
+        weather = calendar_info.weather.sky_str()
         if weather == "":
             weather = "Clear"
         self._window.addstr(17, symbol_start+1, f"{weather:^13}")
@@ -239,7 +263,7 @@ class CalendarWindow:
         wind_label = f"{'Wind':^17}"
         wind_top = f"{calendar_info.weather.wind_direction_short()} {calendar_info.weather.wind_speed_str()}"
         wind_top = f"{wind_top:^17}"
-        wind_bot = f"{calendar_info.weather.wind_strength:^17}"
+        wind_bot = f"{calendar_info.weather.wind_strength_str():^17}"
 
         self._window.addstr(12, start_x, wind_label)
         self._window.addstr(13, start_x, wind_top)
@@ -263,6 +287,7 @@ class CalendarWindow:
         add_selected = False
         #del_selected = False
         jump_selected = False
+        search_selected = False
         menu_selected = False
         if self._selection_mode == CalendarSelectionMode.EDIT:
             if self._edit_cursor == 0:
@@ -272,12 +297,15 @@ class CalendarWindow:
             elif self._edit_cursor == 1:
                 jump_selected = True
             elif self._edit_cursor == 2:
+                search_selected = True
+            elif self._edit_cursor == 3:
                 menu_selected = True
 
         Button.draw_button(window=self._window, start_y=start_y, start_x=start_x+1, height=3, width=13, text="Add Event", selected=add_selected)
         # Button.draw_button(window=self._window, start_y=start_y+3, start_x=start_x+1, height=3, width=13, text="Del Event", selected=del_selected)
         Button.draw_button(window=self._window, start_y=start_y+3, start_x=start_x+1, height=3, width=13, text="Jump to", selected=jump_selected)
-        Button.draw_button(window=self._window, start_y=start_y+6, start_x=start_x+1, height=3, width=13, text="Menu", selected=menu_selected)
+        Button.draw_button(window=self._window, start_y=start_y+6, start_x=start_x+1, height=3, width=13, text="Search", selected=search_selected)
+        Button.draw_button(window=self._window, start_y=start_y+9, start_x=start_x+1, height=3, width=13, text="Menu", selected=menu_selected)
 
         maxwidth = self._info_panel_width - 17
 
@@ -329,6 +357,7 @@ class CalendarWindow:
         """
         if self._selection_mode == CalendarSelectionMode.TIME:
             self._cursor_time -= 1
+            self._follow_cursor(-1)
             self.draw_hours()
             self.draw_side_panel()
             self.draw_event_list()
@@ -346,10 +375,11 @@ class CalendarWindow:
         """
         if self._selection_mode == CalendarSelectionMode.TIME:
             self._cursor_time += 1
+            self._follow_cursor(1)
             self.draw_hours()
             self.draw_side_panel()
             self.draw_event_list()
-        elif self._selection_mode == CalendarSelectionMode.EDIT and self._edit_cursor < 2:
+        elif self._selection_mode == CalendarSelectionMode.EDIT and self._edit_cursor < 3:
             self._edit_cursor += 1
             self.draw_event_list()
         elif self._selection_mode == CalendarSelectionMode.EVENT and len(self._calendar.get_time(self._cursor_time).events) > self._event_cursor+1:
@@ -371,16 +401,24 @@ class CalendarWindow:
                 date, calendar_name = DatePrompt.execute(self._cursor_time, self._used_calendar)
                 self._cursor_time = date
                 self._used_calendar = calendar_name
+                self._follow_cursor()
                 self.redraw()
             elif self._edit_cursor == 2:
+                found_time = SearchPrompt.execute(self._calendar, self._used_calendar)
+                if found_time is not None:
+                    self._cursor_time = found_time
+                    self._follow_cursor()
+                self.redraw()
+            elif self._edit_cursor == 3:
                 return 0
         elif self._selection_mode == CalendarSelectionMode.EVENT:
             event = self._calendar.get_time(self._cursor_time).events[self._event_cursor]
-            # Remove event during editing and put it back in if not deleted
-            self._calendar.remove_event(event)
+            # The event is edited in place, so afterwards it's either removed or moved to its new time
             event = EventEditWindow.execute(window_width=curses.COLS-self._info_panel_width-1, start_time=event.start_time_epoch, calendar_used=self._used_calendar, event=event)
-            if not event.delete_event:
-                self._calendar.add_event(event)
+            if event.delete_event:
+                self._calendar.remove_event(event)
+            else:
+                self._calendar.move_event(event)
             if len(self._calendar.get_time(self._cursor_time).events) == 0:
                 self._selection_mode = CalendarSelectionMode.EDIT
                 self._event_cursor = 0
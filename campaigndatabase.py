@@ -0,0 +1,296 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from WeatherGenerator import GeneratorCheckpoint, WEATHER_BLOCK_DTYPE
+from campaignfile import InvalidCampaignFileException
+from dndcalendar import DnDCalendar, HISTORY_CHUNK_HOURS
+from intervalset import IntervalSet
+
+CAMPAIGN_DATABASE_VERSION = 1
+CAMPAIGN_DATABASE_EXTENSION = ".sqlite"
+DATABASE_CACHE_KIB = 2048  # Pages SQLite keeps in memory, on top of the chunks the history keeps
+_SQLITE_MAGIC = b"SQLite format 3\0"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS hours (start INTEGER PRIMARY KEY, end INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS chunks (chunk_index INTEGER PRIMARY KEY, weather BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS checkpoints (time INTEGER PRIMARY KEY, checkpoint TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS events (id TEXT PRIMARY KEY, start INTEGER NOT NULL, end INTEGER NOT NULL,
+                                   event TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS climate_segments (start INTEGER PRIMARY KEY, climate TEXT NOT NULL,
+                                             elevation INTEGER NOT NULL);
+"""
+
+
+def is_campaign_database(path: str) -> bool:
+    """
+    Checks whether a file is an SQLite database, as opposed to a campaign file or a JSON save
+    :param path: Path of the file
+    :return: True if the file starts with the SQLite magic
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+
+
+class CampaignDatabase:
+    def __init__(self, path: str):
+        """
+        A campaign saved in an SQLite database. Opening only reads the settings, the events and the climate timeline.
+        Like a CampaignFile, the weather and the checkpoints of a chunk are read when they're asked for, and saving
+        again with save() only writes the chunks and events that changed, in one transaction.
+        Tables:
+            settings: the info saved with the campaign and the calendar save without its history, events and climate
+                      timeline, as JSON by key
+            hours: the runs of generated hours
+            chunks: the weather columns of each chunk one after another, compressed with zlib
+            checkpoints: the generator checkpoints as JSON by hour
+            events: the events as JSON, with their start and end hours
+            climate_segments: the segments of the climate timeline
+        :param path: Path of the database
+        :raises InvalidCampaignFileException: If the database isn't a campaign database, or is from a newer version
+        """
+        self.path = path
+        self._lock = threading.RLock()  # Chunks can be read by whichever thread uses the calendar, also while saving
+        if not is_campaign_database(path):
+            raise InvalidCampaignFileException(path, "{} is not a campaign database")
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(f"PRAGMA cache_size = -{DATABASE_CACHE_KIB}")
+        try:
+            settings = {key: json.loads(value) for key, value in self._connection.execute("SELECT key, value "
+                                                                                          "FROM settings")}
+        except sqlite3.DatabaseError:
+            self._connection.close()
+            raise InvalidCampaignFileException(path, "{} is not a campaign database")
+        if 'version' not in settings:
+            self._connection.close()
+            raise InvalidCampaignFileException(path, "{} is not a campaign database")
+        if settings['version'] > CAMPAIGN_DATABASE_VERSION:
+            self._connection.close()
+            raise InvalidCampaignFileException(path, f"{{}} is from a newer version {settings['version']} of the "
+                                                     f"campaign database than the supported version "
+                                                     f"{CAMPAIGN_DATABASE_VERSION}")
+        self.info: Dict[str, object] = settings['info']  # Save name, cursor time and calendar used
+        self._calendar_json = settings['calendar']
+        self._climate_initial = settings['climate_initial']
+        self._columns = [(name, np.dtype(dtype)) for name, dtype in settings['columns']]
+        self.hours = IntervalSet(self._connection.execute("SELECT start, end FROM hours").fetchall())
+        self.chunk_indexes = [chunk_index for chunk_index, in
+                              self._connection.execute("SELECT chunk_index FROM chunks ORDER BY chunk_index")]
+        # Event JSON as it is in the database by event id, to find the events that changed
+        self._saved_events: Dict[str, str] = dict(self._connection.execute("SELECT id, event FROM events"))
+
+    @staticmethod
+    def create(path: str, calendar: DnDCalendar, info: Dict[str, object]) -> "CampaignDatabase":
+        """
+        Saves a calendar into a new database, replacing whatever is at the path. The database is written next to the
+        path and then moved over it, so a save that fails midway leaves the old file as it was.
+        :param path: Path of the database
+        :param calendar: The calendar
+        :param info: Save name, cursor time and calendar used, or whatever else the database should remember
+        :return: CampaignDatabase the calendar now reads its history from
+        """
+        temporary_path = f"{path}.tmp"
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        with calendar.lock:
+            connection = sqlite3.connect(temporary_path)
+            try:
+                connection.executescript(_SCHEMA)
+                chunk_indexes = calendar.history.chunk_indexes()
+                with connection:
+                    _write(connection, calendar, info, chunk_indexes, {})
+            finally:
+                connection.close()
+            os.replace(temporary_path, path)
+            database = CampaignDatabase(path)
+            calendar.history_saved(database, chunk_indexes)
+        return database
+
+    def save(self, calendar: DnDCalendar, info: Dict[str, object]) -> None:
+        """
+        Saves the changes made to a calendar since it was last saved into this database, in one transaction. If the
+        calendar wasn't read from this database, everything is written.
+        :param calendar: The calendar
+        :param info: Save name, cursor time and calendar used, or whatever else the database should remember
+        :return: None
+        """
+        with calendar.lock, self._lock:
+            chunk_indexes = calendar.unsaved_chunks(self)
+            with self._connection:
+                settings = _write(self._connection, calendar, info, chunk_indexes, self._saved_events)
+            self.info = info
+            self._calendar_json = settings['calendar']
+            self._climate_initial = settings['climate_initial']
+            self.hours = IntervalSet(list(calendar.history.generated_hours))
+            self.chunk_indexes = sorted(set(self.chunk_indexes).union(chunk_indexes))
+            calendar.history_saved(self, chunk_indexes)
+
+    def calendar_json(self) -> dict:
+        """
+        The calendar save without the weather of the history and the checkpoints, as DnDCalendar.to_json(weather=False)
+        :return: JSON object
+        """
+        calendar_json = dict(self._calendar_json)
+        calendar_json['events'] = {event_id: json.loads(event) for event_id, event in self._saved_events.items()}
+        with self._lock:
+            segments = self._connection.execute("SELECT start, climate, elevation FROM climate_segments "
+                                                "ORDER BY start").fetchall()
+        names = sorted({self._climate_initial[0]}.union(climate for _, climate, _ in segments))
+        index = {name: i for i, name in enumerate(names)}
+        starts = [start for start, _, _ in segments]
+        calendar_json['climate_timeline'] = {
+            'climates': names,
+            'initial': [index[self._climate_initial[0]], self._climate_initial[1]],
+            'start_deltas': [start - before for start, before in zip(starts, [0] + starts)],
+            'climate': [index[climate] for _, climate, _ in segments],
+            'elevation': [elevation for _, _, elevation in segments]}
+        return calendar_json
+
+    def read_chunk(self, chunk_index: int) -> Dict[str, np.ndarray]:
+        """
+        Reads the weather of a chunk
+        :param chunk_index: Index of the chunk
+        :return: Read-only weather columns by WEATHER_BLOCK_DTYPE field
+        """
+        with self._lock:
+            weather, = self._connection.execute("SELECT weather FROM chunks WHERE chunk_index = ?",
+                                                (chunk_index,)).fetchone()
+        data = zlib.decompress(weather)
+        columns = {}
+        column_offset = 0
+        for name, dtype in self._columns:
+            column = np.frombuffer(data, dtype=dtype, count=HISTORY_CHUNK_HOURS, offset=column_offset)
+            column_offset += column.nbytes
+            if name in WEATHER_BLOCK_DTYPE.names:
+                columns[name] = column.astype(WEATHER_BLOCK_DTYPE[name], copy=False)
+        for name in WEATHER_BLOCK_DTYPE.names:
+            if name not in columns:
+                columns[name] = np.zeros(HISTORY_CHUNK_HOURS, dtype=WEATHER_BLOCK_DTYPE[name])  # From a newer version
+        return columns
+
+    def read_checkpoints(self, chunk_index: int) -> Dict[int, GeneratorCheckpoint]:
+        """
+        Reads the generator checkpoints of a chunk
+        :param chunk_index: Index of the chunk
+        :return: Checkpoints by time from epoch
+        """
+        start = chunk_index * HISTORY_CHUNK_HOURS
+        with self._lock:
+            rows = self._connection.execute("SELECT time, checkpoint FROM checkpoints WHERE time >= ? AND time < ?",
+                                            (start, start + HISTORY_CHUNK_HOURS)).fetchall()
+        return {t: GeneratorCheckpoint.from_json(json.loads(checkpoint)) for t, checkpoint in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def _write(connection: sqlite3.Connection, calendar: DnDCalendar, info: Dict[str, object],
+           chunk_indexes: Iterable[int], saved_events: Dict[str, str]) -> Dict[str, object]:
+    """
+    Writes a calendar into a database, in the transaction the connection is in
+    :param connection: Connection to the database
+    :param calendar: The calendar, locked by the caller
+    :param info: Save name, cursor time and calendar used, or whatever else the database should remember
+    :param chunk_indexes: Chunks of the history to write. The rest are the same as in the database.
+    :param saved_events: Event JSON in the database by event id, updated to what's written
+    :return: The settings written
+    """
+    calendar_json = calendar.to_json(weather=False)
+    del calendar_json['events']
+    events = {event.id: event for event in calendar.history.events}
+    timeline = calendar_json.pop('climate_timeline')
+    names = timeline['climates']
+    settings = {'version': CAMPAIGN_DATABASE_VERSION, 'info': info, 'calendar': calendar_json,
+                'climate_initial': [names[timeline['initial'][0]], timeline['initial'][1]],
+                'columns': [[name, WEATHER_BLOCK_DTYPE[name].str] for name in WEATHER_BLOCK_DTYPE.names]}
+    connection.executemany("INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                           [(key, json.dumps(value)) for key, value in settings.items()])
+    starts = np.cumsum(timeline['start_deltas'], dtype=np.int64).tolist()
+    connection.execute("DELETE FROM climate_segments")
+    connection.executemany("INSERT INTO climate_segments VALUES (?, ?, ?)",
+                           [(start, names[climate], elevation)
+                            for start, climate, elevation in zip(starts, timeline['climate'], timeline['elevation'])])
+    connection.execute("DELETE FROM hours")
+    connection.executemany("INSERT INTO hours VALUES (?, ?)", list(calendar.history.generated_hours))
+    for chunk_index in chunk_indexes:
+        start = chunk_index * HISTORY_CHUNK_HOURS
+        block = calendar.history.read_block(start, start + HISTORY_CHUNK_HOURS)
+        weather = zlib.compress(b"".join(block[name].tobytes() for name in WEATHER_BLOCK_DTYPE.names))
+        connection.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?)", (chunk_index, weather))
+        connection.execute("DELETE FROM checkpoints WHERE time >= ? AND time < ?", (start, start + HISTORY_CHUNK_HOURS))
+        connection.executemany("INSERT INTO checkpoints VALUES (?, ?)",
+                               [(t, json.dumps(checkpoint.to_json()))
+                                for t, checkpoint in calendar.chunk_checkpoints(chunk_index).items()])
+    removed = [(event_id,) for event_id in saved_events.keys() if event_id not in events]
+    changed = {}
+    for event_id, event in events.items():
+        event_json = json.dumps(event.to_json())
+        if saved_events.get(event_id) != event_json:
+            changed[event_id] = (event_id, event.start_time_epoch, event.start_time_epoch + event.duration, event_json)
+    connection.executemany("DELETE FROM events WHERE id = ?", removed)
+    connection.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?)", list(changed.values()))
+    for event_id, in removed:
+        del saved_events[event_id]
+    saved_events.update((event_id, row[3]) for event_id, row in changed.items())
+    return settings
+
+
+def open_campaign_database(path: str, history_budget_bytes: int = None) \
+        -> Tuple[DnDCalendar, Dict[str, object], CampaignDatabase]:
+    """
+    Opens a campaign database. The history is read from the database a chunk at a time as it's used.
+    :param path: Path of the database
+    :param history_budget_bytes: Memory the weather of the history may take, see DnDCalendar
+    :return: The calendar, the info saved with it, and the database the calendar reads from
+    :raises InvalidCampaignFileException: If the database isn't a campaign database, or is from a newer version
+    """
+    database = CampaignDatabase(path)
+    calendar = DnDCalendar.from_json(database.calendar_json(), history_budget_bytes=history_budget_bytes)
+    calendar.attach_saved_history(database)
+    return calendar, database.info, database
+
+
+def write_campaign_database(path: str, calendar: DnDCalendar, info: Dict[str, object],
+                            database: CampaignDatabase = None) -> CampaignDatabase:
+    """
+    Saves a calendar into a campaign database. If the database at the path is the one given, only the changes since
+    the calendar was last saved into it are written, otherwise a new database is written over the path.
+    :param path: Path of the database
+    :param calendar: The calendar
+    :param info: Save name, cursor time and calendar used, or whatever else the database should remember
+    :param database: The database the calendar was opened from or last saved into, if any
+    :return: The database the calendar now reads its history from
+    """
+    if database is not None and os.path.abspath(database.path) == os.path.abspath(path):
+        database.save(calendar, info)
+        return database
+    return CampaignDatabase.create(path, calendar, info)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    # Converts a JSON save into a campaign database: campaigndatabase.py save.json campaign.sqlite
+    with open(sys.argv[1]) as f:
+        data = json.load(f)
+    if 'calendar' not in data:
+        data = {'calendar': data}  # Only the calendar, without the info the menu saves with it
+    calendar = DnDCalendar.from_json(data.pop('calendar'))
+    calendar.show_generating_popup = False
+    start = time.perf_counter()
+    write_campaign_database(sys.argv[2], calendar, data).close()
+    print(f"Saved in {time.perf_counter() - start:.2f} s, {os.path.getsize(sys.argv[2]) / 2**20:.2f} MiB")
+    start = time.perf_counter()
+    opened, info, _ = open_campaign_database(sys.argv[2])
+    opened.show_generating_popup = False
+    print(f"Opened in {(time.perf_counter() - start) * 1e3:.1f} ms, {info}")
+    assert json.dumps(opened.to_json(), sort_keys=True) == json.dumps(calendar.to_json(), sort_keys=True)
+    print("Same calendar as the JSON save")
@@ -0,0 +1,256 @@
+import gc
+import json
+import lzma
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Tuple
+
+import numpy as np
+
+from WeatherGenerator import GeneratorCheckpoint, WEATHER_BLOCK_DTYPE
+from dndcalendar import DnDCalendar, HISTORY_CHUNK_HOURS
+from intervalset import IntervalSet
+
+CAMPAIGN_FILE_MAGIC = b"DNDCAMP\0"
+CAMPAIGN_FILE_VERSION = 1
+# Magic, container version, compression of the index, offset and length of the index
+_HEADER = struct.Struct("<8sHHQQ")
+_ALIGNMENT = 8  # Sections start at multiples of this, so uncompressed columns can be used straight from the file
+
+# Compressions by the number they're saved as: (name, compress, decompress)
+_COMPRESSIONS = {0: ("none", bytes, bytes), 1: ("zlib", zlib.compress, zlib.decompress),
+                 2: ("lzma", lzma.compress, lzma.decompress)}
+_COMPRESSION_IDS = {name: compression_id for compression_id, (name, _, _) in _COMPRESSIONS.items()}
+
+
+class InvalidCampaignFileException(Exception):
+    """ Exception raised when a file is not a campaign file this version can read
+
+        Attributes:
+            path -- path of the file
+            message -- explanation of the error
+    """
+
+    def __init__(self, path: str, message: str = "{} is not a campaign file"):
+        self.path = path
+        self.message = message.format(path)
+        super().__init__(self.message)
+
+
+def is_campaign_file(path: str) -> bool:
+    """
+    Checks whether a file is a binary campaign file, as opposed to a JSON save
+    :param path: Path of the file
+    :return: True if the file starts with the campaign file magic
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(CAMPAIGN_FILE_MAGIC)) == CAMPAIGN_FILE_MAGIC
+
+
+class CampaignFile:
+    def __init__(self, path: str):
+        """
+        A campaign file opened for reading. Opening only reads the header and the index, which has the settings and
+        the events of the calendar and where each chunk of the history is. The weather and the checkpoints of a chunk
+        are read when they're asked for. The file is memory mapped, so uncompressed chunks are used straight from it.
+        Layout of the file:
+            header: magic, container version, compression of the index, offset and length of the index
+            for each chunk of the history: the weather columns one after another, then the checkpoints as JSON, each
+                                           compressed on its own
+            index: JSON with the calendar save without its history, the hours of the history and the place of each
+                   chunk
+        :param path: Path of the file
+        :raises InvalidCampaignFileException: If the file isn't a campaign file, or is from a newer version
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise InvalidCampaignFileException(path)  # Empty file
+        if len(self._map) < _HEADER.size:
+            raise InvalidCampaignFileException(path)
+        magic, version, compression, index_offset, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != CAMPAIGN_FILE_MAGIC:
+            raise InvalidCampaignFileException(path)
+        if version > CAMPAIGN_FILE_VERSION:
+            raise InvalidCampaignFileException(path, f"{{}} is from a newer version {version} of the campaign file "
+                                                     f"format than the supported version {CAMPAIGN_FILE_VERSION}")
+        index = json.loads(_COMPRESSIONS[compression][2](self._map[index_offset:index_offset + index_length]))
+        self.info: Dict[str, object] = index['info']  # Save name, cursor time and calendar used
+        self.calendar_json = index['calendar']
+        self.hours = IntervalSet(index['hours'])
+        self._columns = [(name, np.dtype(dtype)) for name, dtype in index['columns']]
+        # Offset, length and compression of the weather, then of the checkpoints, by chunk index
+        self._chunks: Dict[int, Tuple[int, int, int, int, int, int]] = {int(key): tuple(val)
+                                                                         for key, val in index['chunks'].items()}
+        self.chunk_indexes = sorted(self._chunks.keys())
+
+    def close(self) -> None:
+        """
+        Unmaps the file. Uncompressed chunks are read as views into the map, so the calendar has to copy or drop them
+        first, see DnDCalendar.close_saved_history. If some are still left elsewhere, such as in a snapshot that was
+        saved, the file stays mapped until they're gone.
+        :return: None
+        """
+        try:
+            self._map.close()
+        except BufferError:
+            # Snapshots are only freed by the garbage collector, as their history refers back to them
+            gc.collect()
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+
+    def _section(self, offset: int, length: int, compression: int):
+        if compression == 0:
+            return memoryview(self._map)[offset:offset + length]
+        return _COMPRESSIONS[compression][2](self._map[offset:offset + length])
+
+    def read_chunk(self, chunk_index: int) -> Dict[str, np.ndarray]:
+        """
+        Reads the weather of a chunk
+        :param chunk_index: Index of the chunk
+        :return: Read-only weather columns by WEATHER_BLOCK_DTYPE field
+        """
+        offset, length, compression, _, _, _ = self._chunks[chunk_index]
+        data = self._section(offset, length, compression)
+        columns = {}
+        column_offset = 0
+        for name, dtype in self._columns:
+            column = np.frombuffer(data, dtype=dtype, count=HISTORY_CHUNK_HOURS, offset=column_offset)
+            column_offset += column.nbytes
+            if name in WEATHER_BLOCK_DTYPE.names:
+                columns[name] = column.astype(WEATHER_BLOCK_DTYPE[name], copy=False)
+        for name in WEATHER_BLOCK_DTYPE.names:
+            if name not in columns:
+                columns[name] = np.zeros(HISTORY_CHUNK_HOURS, dtype=WEATHER_BLOCK_DTYPE[name])  # From a newer version
+        return columns
+
+    def read_checkpoints(self, chunk_index: int) -> Dict[int, GeneratorCheckpoint]:
+        """
+        Reads the generator checkpoints of a chunk
+        :param chunk_index: Index of the chunk
+        :return: Checkpoints by time from epoch
+        """
+        _, _, _, offset, length, compression = self._chunks[chunk_index]
+        checkpoints_json = json.loads(bytes(self._section(offset, length, compression)))
+        return {int(key): GeneratorCheckpoint.from_json(val) for key, val in checkpoints_json.items()}
+
+
+def _compress(data: bytes, compression: str) -> Tuple[bytes, int]:
+    """
+    Compresses a section, unless compressing doesn't make it smaller
+    :param data: The section
+    :param compression: Name of the compression
+    :return: The data to write and the id of the compression it was written with
+    """
+    compression_id = _COMPRESSION_IDS[compression]
+    if compression_id != 0:
+        compressed = _COMPRESSIONS[compression_id][1](data)
+        if len(compressed) < len(data):
+            return compressed, compression_id
+    return data, 0
+
+
+def _write_section(f, data: bytes) -> int:
+    """
+    Writes a section at the next aligned offset
+    :param f: File open for binary writing
+    :param data: The section
+    :return: Offset of the section
+    """
+    f.write(b"\0" * (-f.tell() % _ALIGNMENT))
+    offset = f.tell()
+    f.write(data)
+    return offset
+
+
+def write_campaign_file(path: str, calendar: DnDCalendar, info: Dict[str, object], compression: str = "zlib") -> None:
+    """
+    Saves a calendar into a campaign file. The file is written next to the path and then moved over it, so a save that
+    fails midway leaves the old file as it was. If the calendar reads its history from the file that's replaced, the
+    old file is closed before it's replaced and the calendar reads from the new one instead.
+    :param path: Path to save to
+    :param calendar: The calendar
+    :param info: Save name, cursor time and calendar used, or whatever else the file should remember
+    :param compression: "none", "zlib" or "lzma". Each chunk is compressed on its own.
+    :return: None
+    """
+    names = WEATHER_BLOCK_DTYPE.names
+    temporary_path = f"{path}.tmp"
+    with calendar.lock:
+        saved_history = calendar.saved_history
+        replaces_saved = isinstance(saved_history, CampaignFile) and \
+            os.path.abspath(saved_history.path) == os.path.abspath(path)
+        with open(temporary_path, 'wb') as f:
+            f.write(_HEADER.pack(CAMPAIGN_FILE_MAGIC, CAMPAIGN_FILE_VERSION, 0, 0, 0))
+            chunks = {}
+            for chunk_index in calendar.history.chunk_indexes():
+                start = chunk_index * HISTORY_CHUNK_HOURS
+                block = calendar.history.read_block(start, start + HISTORY_CHUNK_HOURS)
+                weather, weather_compression = _compress(b"".join(block[name].tobytes() for name in names),
+                                                         compression)
+                weather_offset = _write_section(f, weather)
+                checkpoints_json = {t: checkpoint.to_json()
+                                    for t, checkpoint in calendar.chunk_checkpoints(chunk_index).items()}
+                checkpoints, checkpoints_compression = _compress(json.dumps(checkpoints_json).encode(), compression)
+                checkpoints_offset = _write_section(f, checkpoints)
+                chunks[chunk_index] = [weather_offset, len(weather), weather_compression,
+                                       checkpoints_offset, len(checkpoints), checkpoints_compression]
+            index = {'info': info, 'calendar': calendar.to_json(weather=False),
+                     'hours': [[start, end] for start, end in calendar.history.generated_hours],
+                     'columns': [[name, WEATHER_BLOCK_DTYPE[name].str] for name in names], 'chunks': chunks}
+            index_data, index_compression = _compress(json.dumps(index).encode(), compression)
+            index_offset = _write_section(f, index_data)
+            f.seek(0)
+            f.write(_HEADER.pack(CAMPAIGN_FILE_MAGIC, CAMPAIGN_FILE_VERSION, index_compression, index_offset,
+                                 len(index_data)))
+            f.flush()
+            os.fsync(f.fileno())
+        if replaces_saved:
+            # A file can't be replaced while it's mapped on every platform. The calendar reads the new one instead.
+            calendar.close_saved_history()
+        os.replace(temporary_path, path)
+        if replaces_saved:
+            calendar.history_saved(CampaignFile(path), chunks.keys())
+
+
+def read_campaign_file(path: str, history_budget_bytes: int = None) -> Tuple[DnDCalendar, Dict[str, object]]:
+    """
+    Opens a campaign file. The history is read from the file a chunk at a time as it's used.
+    :param path: Path of the file
+    :param history_budget_bytes: Memory the weather of the history may take, see DnDCalendar
+    :return: The calendar and the info it was saved with
+    :raises InvalidCampaignFileException: If the file isn't a campaign file, or is from a newer version
+    """
+    campaign_file = CampaignFile(path)
+    calendar = DnDCalendar.from_json(campaign_file.calendar_json, history_budget_bytes=history_budget_bytes)
+    calendar.attach_saved_history(campaign_file)
+    return calendar, campaign_file.info
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    # Converts a JSON save into a campaign file and back: campaignfile.py save.json campaign.dndc
+    with open(sys.argv[1]) as f:
+        data = json.load(f)
+    if 'calendar' not in data:
+        data = {'calendar': data}  # Only the calendar, without the info the menu saves with it
+    start = time.perf_counter()
+    calendar = DnDCalendar.from_json(data.pop('calendar'))
+    calendar.show_generating_popup = False
+    print(f"Loaded {len(calendar.history)} hours from JSON in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    write_campaign_file(sys.argv[2], calendar, data)
+    print(f"Saved in {time.perf_counter() - start:.2f} s, {os.path.getsize(sys.argv[2]) / 2**20:.2f} MiB")
+    start = time.perf_counter()
+    opened, info = read_campaign_file(sys.argv[2])
+    opened.show_generating_popup = False
+    print(f"Opened in {(time.perf_counter() - start) * 1e3:.1f} ms, {info}")
+    assert json.dumps(opened.to_json(), sort_keys=True) == json.dumps(calendar.to_json(), sort_keys=True)
+    print("Same calendar as the JSON save")
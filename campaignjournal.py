@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from campaignfile import InvalidCampaignFileException, read_campaign_file, write_campaign_file
+from dndcalendar import DnDCalendar
+
+JOURNAL_FORMAT_VERSION = 1
+JOURNAL_COMPACT_BYTES = 4 * 2**20  # Size of the journal after which saving writes the whole campaign file again
+
+
+def journal_path(campaign_path: str) -> str:
+    """
+    Path of the journal that goes with a campaign file
+    :param campaign_path: Path of the campaign file
+    :return: Path of the journal
+    """
+    return f"{campaign_path}.journal"
+
+
+def _encode_record(record: dict) -> bytes:
+    """
+    Encodes a record as a line of the journal: the CRC-32 of the JSON in hex, a space and the JSON
+    :param record: JSON object
+    :return: The line
+    """
+    data = json.dumps(record, separators=(',', ':')).encode()
+    return b"%08x %s\n" % (zlib.crc32(data), data)
+
+
+def _read_records(path: str) -> Tuple[List[dict], int]:
+    """
+    Reads the records of a journal up to the first one that wasn't written completely or is corrupt, such as when
+    the program stopped in the middle of a write
+    :param path: Path of the journal
+    :return: The records, and the length of the file up to the end of the last one
+    """
+    records = []
+    length = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n") or len(line) < 10:
+                break
+            checksum, data = line[:8], line[9:-1]
+            try:
+                if int(checksum, 16) != zlib.crc32(data):
+                    break
+                records.append(json.loads(data))
+            except ValueError:
+                break
+            length += len(line)
+    return records, length
+
+
+def _fsync_directory(path: str) -> None:
+    """
+    Makes a rename in the directory of a file durable. Not possible on every platform, where renames are left to the
+    file system.
+    :param path: Path of a file in the directory
+    :return: None
+    """
+    try:
+        descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+class CampaignJournal:
+    def __init__(self, path: str, journal_id: str, length: int):
+        """
+        Journal of the changes made to a calendar since its campaign file was written. The calendar records every
+        change into the journal, and they're kept in memory until commit() appends them to the file, so saving after a
+        small change only writes that change. The journal starts with a header naming the campaign file it follows,
+        so a journal left from before the campaign file was last written is never replayed onto it.
+        Use create() for a new journal and open_campaign() for an existing one.
+        :param path: Path of the journal
+        :param journal_id: Id of the journal, the same as in the campaign file
+        :param length: Length of the journal up to its last complete record. Anything after it is cut off.
+        """
+        self.path = path
+        self.journal_id = journal_id
+        self._lock = threading.Lock()  # Records come from whichever thread changes the calendar
+        self._pending: List[bytes] = []
+        self.pending_bytes = 0
+        # Set by the calendar when it leaves generated weather out of the journal, such as pregenerated hours. The
+        # next save writes the whole campaign file, which has them.
+        self.missing_weather = False
+        with open(path, 'r+b') as f:
+            f.truncate(length)
+        self.size = length  # Bytes in the file
+
+    @staticmethod
+    def create(path: str, journal_id: str) -> "CampaignJournal":
+        """
+        Starts a new, empty journal, replacing any old one
+        :param path: Path of the journal
+        :param journal_id: Id of the journal, the same as in the campaign file
+        :return: CampaignJournal
+        """
+        header = _encode_record({'journal': journal_id, 'version': JOURNAL_FORMAT_VERSION})
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+        _fsync_directory(path)
+        return CampaignJournal(path, journal_id, len(header))
+
+    def record(self, change: dict) -> None:
+        """
+        Records a change, to be written by the next commit()
+        :param change: JSON object, see DnDCalendar.apply_change
+        :return: None
+        """
+        line = _encode_record(change)
+        with self._lock:
+            self._pending.append(line)
+            self.pending_bytes += len(line)
+
+    def record_info(self, info: Dict[str, object]) -> None:
+        """
+        Records a change of the info saved with the campaign, such as the cursor time
+        :param info: The new info
+        :return: None
+        """
+        self.record({'change': 'info', 'info': info})
+
+    def commit(self) -> int:
+        """
+        Appends the recorded changes to the file and waits for them to be on the disk
+        :return: Number of bytes written
+        """
+        with self._lock:
+            pending = b"".join(self._pending)
+            self._pending.clear()
+            self.pending_bytes = 0
+            with open(self.path, 'ab') as f:
+                f.write(pending)
+                f.flush()
+                os.fsync(f.fileno())
+            self.size += len(pending)
+        return len(pending)
+
+
+def open_campaign(path: str, history_budget_bytes: int = None) \
+        -> Tuple[DnDCalendar, Dict[str, object], Optional[CampaignJournal]]:
+    """
+    Opens a campaign file and replays the changes in its journal
+    :param path: Path of the campaign file
+    :param history_budget_bytes: Memory the weather of the history may take, see DnDCalendar
+    :return: The calendar, the info saved with it, and the journal the calendar now records into. The journal is None
+             if the file has no journal yet, in which case the next write_campaign writes the whole file.
+    :raises InvalidCampaignFileException: If the file isn't a campaign file, or it or its journal is from a newer
+                                          version
+    """
+    calendar, info = read_campaign_file(path, history_budget_bytes=history_budget_bytes)
+    info = dict(info)
+    journal_id = info.pop('journal', None)
+    records, length = [], 0
+    if journal_id is not None and os.path.exists(journal_path(path)):
+        records, length = _read_records(journal_path(path))
+    if len(records) == 0 or records[0].get('journal') != journal_id:
+        # No journal, or one left from before the campaign file was written, whose changes are already in it
+        return calendar, info, None
+    if records[0]['version'] > JOURNAL_FORMAT_VERSION:
+        raise InvalidCampaignFileException(journal_path(path), f"{{}} is from a newer version {records[0]['version']} "
+                                                               f"of the journal than the supported version "
+                                                               f"{JOURNAL_FORMAT_VERSION}")
+    for change in records[1:]:
+        if change['change'] == 'info':
+            info.update(change['info'])
+        else:
+            calendar.apply_change(change)
+    journal = CampaignJournal(journal_path(path), journal_id, length)
+    calendar.journal = journal
+    return calendar, info, journal
+
+
+def write_campaign(path: str, calendar: DnDCalendar, info: Dict[str, object], journal: CampaignJournal = None,
+                   compression: str = "zlib") -> CampaignJournal:
+    """
+    Saves a calendar. If the calendar records into the journal of the campaign file at the path, only the changes
+    since the last save are appended to the journal. Otherwise, once the journal has grown past JOURNAL_COMPACT_BYTES,
+    or if the calendar has left weather out of it, the whole campaign file is written and a new journal is started.
+    :param path: Path of the campaign file
+    :param calendar: The calendar
+    :param info: Save name, cursor time and calendar used, or whatever else the file should remember
+    :param journal: The journal the calendar records into, if any
+    :param compression: Compression of the campaign file, see write_campaign_file
+    :return: The journal the calendar now records into
+    """
+    if journal is not None and journal.path == journal_path(path) and not journal.missing_weather and \
+            journal.size + journal.pending_bytes < JOURNAL_COMPACT_BYTES:
+        journal.record_info(info)
+        journal.commit()
+        return journal
+    return compact_campaign(path, calendar, info, compression)
+
+
+def compact_campaign(path: str, calendar: DnDCalendar, info: Dict[str, object],
+                     compression: str = "zlib") -> CampaignJournal:
+    """
+    Writes the whole campaign file and starts a new journal for it. If this stops midway, the old campaign file and
+    journal are left as they were, and if it stops between the two, the old journal no longer matches the new file
+    and is ignored.
+    :param path: Path of the campaign file
+    :param calendar: The calendar
+    :param info: Save name, cursor time and calendar used, or whatever else the file should remember
+    :param compression: Compression of the campaign file, see write_campaign_file
+    :return: The new journal, which the calendar now records into
+    """
+    with calendar.lock:  # Nothing may change between the file and the journal
+        journal_id = uuid.uuid4().hex
+        write_campaign_file(path, calendar, dict(info, journal=journal_id), compression)
+        journal = CampaignJournal.create(journal_path(path), journal_id)
+        calendar.journal = journal
+    return journal
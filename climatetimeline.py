@@ -0,0 +1,157 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+
+
+class ClimateTimeline:
+    def __init__(self, climate: str, elevation: int):
+        """
+        The climate and elevation over time. The timeline is split into segments, each lasting from its start until
+        the start of the next one, and the initial settings hold before the first segment. The segment starts are kept
+        sorted, so the settings at any hour are found with a bisect.
+        :param climate: Climate before the first segment
+        :param elevation: Elevation before the first segment
+        """
+        self._initial: Tuple[str, int] = (climate, elevation)
+        self._starts: List[int] = []  # Sorted segment starts
+        self._settings: List[Tuple[str, int]] = []  # (climate, elevation) of each segment
+
+    def __len__(self) -> int:
+        return len(self._starts) + 1
+
+    def at(self, time_from_epoch: int) -> Tuple[str, int]:
+        """
+        Finds the settings at an hour
+        :param time_from_epoch: The hour
+        :return: (climate, elevation)
+        """
+        i = bisect_right(self._starts, time_from_epoch) - 1
+        return self._settings[i] if i >= 0 else self._initial
+
+    @property
+    def latest(self) -> Tuple[str, int]:
+        """
+        The settings of the last segment, which go on indefinitely
+        :return: (climate, elevation)
+        """
+        return self._settings[-1] if len(self._settings) > 0 else self._initial
+
+    def boundaries(self, start_time_from_epoch: int, end_time_from_epoch: int) -> List[int]:
+        """
+        Finds where the settings may change within a range
+        :param start_time_from_epoch: Start of the range, not included
+        :param end_time_from_epoch: End of the range, not included
+        :return: Sorted segment starts in (start, end)
+        """
+        return self._starts[bisect_right(self._starts, start_time_from_epoch):
+                            bisect_left(self._starts, end_time_from_epoch)]
+
+    def next_boundary(self, time_from_epoch: int) -> Optional[int]:
+        """
+        Finds the first segment start after an hour
+        :param time_from_epoch: The hour
+        :return: Time from epoch of the segment start, or None if no segment starts after the hour
+        """
+        i = bisect_right(self._starts, time_from_epoch)
+        return self._starts[i] if i < len(self._starts) else None
+
+    def segments(self, start_time_from_epoch: int, end_time_from_epoch: int) -> List[Tuple[int, int, str, int]]:
+        """
+        Lists the settings over a range
+        :param start_time_from_epoch: The first hour of the range
+        :param end_time_from_epoch: The hour after the last one
+        :return: List of (start, end, climate, elevation) of the segments, cut to the range
+        """
+        starts = [start_time_from_epoch] + self.boundaries(start_time_from_epoch, end_time_from_epoch)
+        return [(start, end, *self.at(start))
+                for start, end in zip(starts, starts[1:] + [end_time_from_epoch]) if start < end]
+
+    def set(self, start_time_from_epoch: int, climate: str = None, elevation: int = None) -> Optional[int]:
+        """
+        Changes the settings from an hour up until the next segment start
+        :param start_time_from_epoch: The first hour to change
+        :param climate: New climate, or None to keep the climate
+        :param elevation: New elevation, or None to keep the elevation
+        :return: The hour after the last changed one, or None if everything after the start was changed
+        """
+        end = self.next_boundary(start_time_from_epoch)
+        self.set_range(start_time_from_epoch, end, climate, elevation)
+        return end
+
+    def set_range(self, start_time_from_epoch: int, end_time_from_epoch: Optional[int], climate: str = None,
+                  elevation: int = None) -> None:
+        """
+        Changes the settings of a range, such as the time the party spent in a region. The settings after the range
+        stay as they were. Segments within the range keep whichever of the settings isn't changed, and segments with
+        the same settings as the one before them are merged into it.
+        :param start_time_from_epoch: The first hour to change
+        :param end_time_from_epoch: The hour after the last one to change, or None to change everything after the start
+        :param climate: New climate, or None to keep the climate of each segment
+        :param elevation: New elevation, or None to keep the elevation of each segment
+        :return: None
+        """
+        if end_time_from_epoch is not None:
+            if end_time_from_epoch <= start_time_from_epoch:
+                return
+            self._put(end_time_from_epoch, self.at(end_time_from_epoch))
+            starts = [start_time_from_epoch] + self.boundaries(start_time_from_epoch, end_time_from_epoch)
+        else:
+            starts = [start_time_from_epoch] + self._starts[bisect_right(self._starts, start_time_from_epoch):]
+        for start in starts:
+            old_climate, old_elevation = self.at(start)
+            self._put(start, (climate if climate is not None else old_climate,
+                              elevation if elevation is not None else old_elevation))
+        self._merge(start_time_from_epoch, end_time_from_epoch)
+
+    def _put(self, start_time_from_epoch: int, settings: Tuple[str, int]) -> None:
+        """
+        Starts a segment at an hour, or changes the settings of the segment starting there
+        :param start_time_from_epoch: Start of the segment
+        :param settings: (climate, elevation) of the segment
+        :return: None
+        """
+        i = bisect_left(self._starts, start_time_from_epoch)
+        if i < len(self._starts) and self._starts[i] == start_time_from_epoch:
+            self._settings[i] = settings
+        else:
+            self._starts.insert(i, start_time_from_epoch)
+            self._settings.insert(i, settings)
+
+    def _merge(self, start_time_from_epoch: int, end_time_from_epoch: Optional[int]) -> None:
+        """
+        Drops the segments starting in a range that don't change the settings of the segment before them
+        :param start_time_from_epoch: The first hour of the range
+        :param end_time_from_epoch: The last hour of the range, or None for no end
+        :return: None
+        """
+        i = bisect_left(self._starts, start_time_from_epoch)
+        while i < len(self._starts) and (end_time_from_epoch is None or self._starts[i] <= end_time_from_epoch):
+            if self._settings[i] == (self._settings[i - 1] if i > 0 else self._initial):
+                del self._starts[i]
+                del self._settings[i]
+            else:
+                i += 1
+
+    def to_json(self):
+        """
+        Encodes the timeline column by column. Climates are saved as indexes into a table of their names and segment
+        starts as the hours since the start before, so a long timeline is mostly small numbers.
+        :return: JSON object
+        """
+        names = sorted({climate for climate, _ in [self._initial] + self._settings})
+        index = {name: i for i, name in enumerate(names)}
+        return {'climates': names,
+                'initial': [index[self._initial[0]], self._initial[1]],
+                'start_deltas': [start - before for start, before in zip(self._starts, [0] + self._starts)],
+                'climate': [index[climate] for climate, _ in self._settings],
+                'elevation': [elevation for _, elevation in self._settings]}
+
+    @staticmethod
+    def from_json(json_obj) -> "ClimateTimeline":
+        names = json_obj['climates']
+        timeline = ClimateTimeline(names[json_obj['initial'][0]], int(json_obj['initial'][1]))
+        start = 0
+        for delta, climate, elevation in zip(json_obj['start_deltas'], json_obj['climate'], json_obj['elevation']):
+            start += int(delta)
+            timeline._starts.append(start)
+            timeline._settings.append((names[climate], int(elevation)))
+        return timeline
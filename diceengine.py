@@ -0,0 +1,161 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple, Sequence, Union
+
+import numpy as np
+
+
+class InvalidDiceExpressionException(Exception):
+    """ Exception raised when a dice expression can't be parsed
+
+        Attributes:
+            expression -- the expression that caused the error
+            message -- explanation of the error
+    """
+
+    def __init__(self, expression: str, message: str = "Dice expression {} is invalid"):
+        self.expression = expression
+        self.message = message.format(expression)
+        super().__init__(self.message)
+
+
+_DICE_PATTERN = re.compile(r"^\s*([+-]?)\s*(\d*)\s*d\s*(\d+)\s*(?:([+-])\s*(\d+))?\s*$")
+
+
+class DiceExpression(NamedTuple):
+    """
+    A compiled dice expression of the form [-]<count>d<sides>[+-<modifier>]. A negative count means that the dice are
+    subtracted from the modifier instead of added to it, so "-3d10" rolls between -30 and -3.
+    """
+    count: int
+    sides: int
+    modifier: int = 0
+
+    @property
+    def minimum(self) -> int:
+        if self.count < 0:
+            return self.count * self.sides + self.modifier
+        return self.count + self.modifier
+
+    @property
+    def maximum(self) -> int:
+        if self.count < 0:
+            return self.count + self.modifier
+        return self.count * self.sides + self.modifier
+
+    def roll(self, rng: np.random.Generator) -> int:
+        """
+        Rolls the expression once
+        :param rng: Random generator to roll with
+        :return: The total of the roll
+        """
+        if self.count == 0:
+            return self.modifier
+        if self.count == 1:
+            return int(rng.integers(1, self.sides + 1)) + self.modifier
+        total = int(rng.integers(1, self.sides + 1, size=abs(self.count)).sum())
+        if self.count < 0:
+            total = -total
+        return total + self.modifier
+
+    def roll_many(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """
+        Rolls the expression many times at once
+        :param rng: Random generator to roll with
+        :param size: How many rolls to make
+        :return: Array of roll totals
+        """
+        if self.count == 0:
+            return np.full(size, self.modifier, dtype=np.int64)
+        totals = rng.integers(1, self.sides + 1, size=(size, abs(self.count))).sum(axis=1)
+        if self.count < 0:
+            totals = -totals
+        return totals + self.modifier
+
+    def from_uniforms(self, uniforms: np.ndarray) -> Union[int, np.ndarray]:
+        """
+        Turns uniform random numbers from [0, 1) into rolls, one number per die. This lets the caller decide where the
+        randomness comes from, which is what makes rolls reproducible from a stored or counter-based random table.
+        :param uniforms: Array whose last axis holds at least abs(count) numbers. For a 1D array a single int is
+                         returned, otherwise an array of totals with the last axis removed.
+        :return: Roll total(s)
+        """
+        dice_count = abs(self.count)
+        sign = -1 if self.count < 0 else 1
+        if uniforms.ndim == 1:
+            total = 0
+            for u in uniforms[:dice_count].tolist():
+                total += int(u * self.sides) + 1
+            return sign * total + self.modifier
+        if dice_count == 0:
+            return np.full(uniforms.shape[:-1], self.modifier, dtype=np.int64)
+        faces = (uniforms[..., :dice_count] * self.sides).astype(np.int64) + 1
+        return sign * faces.sum(axis=-1) + self.modifier
+
+    def __str__(self):
+        if self.modifier == 0:
+            return f"{self.count}d{self.sides}"
+        return f"{self.count}d{self.sides}{self.modifier:+d}"
+
+
+@lru_cache(maxsize=None)
+def compile_dice(expression: str) -> DiceExpression:
+    """
+    Parses a dice expression. Results are cached, so the same expression is only ever parsed once.
+    :param expression: Dice expression such as "1d100", "2d6-7" or "-3d10"
+    :return: The compiled expression
+    :raises InvalidDiceExpressionException: If the expression can't be parsed
+    """
+    match = _DICE_PATTERN.match(expression)
+    if match is None:
+        raise InvalidDiceExpressionException(expression)
+    sign, count, sides, modifier_sign, modifier = match.groups()
+    count = int(count) if count != "" else 1
+    if sign == "-":
+        count = -count
+    if int(sides) < 1:
+        raise InvalidDiceExpressionException(expression, message="Dice in {} need at least one side")
+    if modifier is None:
+        modifier = 0
+    elif modifier_sign == "-":
+        modifier = -int(modifier)
+    else:
+        modifier = int(modifier)
+    return DiceExpression(count=count, sides=int(sides), modifier=modifier)
+
+
+def roll(expression: Union[str, DiceExpression], rng: np.random.Generator, size: int = None):
+    """
+    Rolls a dice expression
+    :param expression: Expression string or an already compiled expression
+    :param rng: Random generator to roll with
+    :param size: If given, rolls this many times and returns an array of totals
+    :return: Roll total, or an array of them if size was given
+    """
+    if isinstance(expression, str):
+        expression = compile_dice(expression)
+    if size is None:
+        return expression.roll(rng)
+    return expression.roll_many(rng, size)
+
+
+def rolls_from_uniforms(expressions: Sequence[DiceExpression], choices: np.ndarray,
+                        uniforms: np.ndarray) -> np.ndarray:
+    """
+    Rolls a different expression for each row of uniform random numbers, for example a column of a roll table where
+    each row landed on a different line of the table
+    :param expressions: The possible expressions
+    :param choices: Index into expressions for each row
+    :param uniforms: 2D array of uniform random numbers from [0, 1), one row per roll and one column per die
+    :return: Array of roll totals
+    """
+    counts = np.array([e.count for e in expressions], dtype=np.int64)[choices]
+    sides = np.array([e.sides for e in expressions], dtype=np.int64)[choices]
+    modifiers = np.array([e.modifier for e in expressions], dtype=np.int64)[choices]
+    dice_counts = np.abs(counts)
+    most_dice = int(dice_counts.max()) if dice_counts.shape[0] > 0 else 0
+    if most_dice == 0:
+        return modifiers
+    faces = (uniforms[:, :most_dice] * sides[:, None]).astype(np.int64) + 1
+    faces[np.arange(most_dice)[None, :] >= dice_counts[:, None]] = 0
+    return np.sign(counts) * faces.sum(axis=1) + modifiers
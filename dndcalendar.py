@@ -1,12 +1,56 @@
+import base64
 import curses
+import functools
+import threading
 import uuid
+import zlib
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 import numpy as np
-from WeatherGenerator import Weather, WeatherGenerator, WeatherGeneratorState
+
+from WeatherGenerator import GeneratorCheckpoint, Weather, WeatherGenerator, WeatherGeneratorState, \
+    PRECIPITATION_DURATION_FLOOR, WEATHER_BLOCK_ATTRIBUTES, WEATHER_BLOCK_DTYPE, WEATHER_SCHEMA, block_row_to_weather, \
+    block_warning_symbols, weather_to_block_row
+from climatetimeline import ClimateTimeline
+from eventindex import EventIndex, EventView
 from gui_utils import draw_box
+from intervalset import IntervalSet
 from reckoninghandler import ReckoningHandler
+from schema import Field, Schema
+
+# Version of the save layout written by DnDCalendar.to_json. Saves without a version are from before versioning and
+# count as version 1.
+SAVE_FORMAT_VERSION = 6
+
+
+class UnsupportedSaveVersionException(Exception):
+    """ Exception raised when a save was written by a newer version of the calendar than this one
+
+        Attributes:
+            version -- the format version of the save
+            message -- explanation of the error
+    """
+
+    def __init__(self, version: int, message: str = "Save format version {} is newer than the supported version {}"):
+        self.version = version
+        self.message = message.format(version, SAVE_FORMAT_VERSION)
+        super().__init__(self.message)
+
+
+class UnknownClimateException(Exception):
+    """ Exception raised when a climate name is not one the weather generator has
+
+        Attributes:
+            climate -- name of the climate that caused the error
+            message -- explanation of the error
+    """
+
+    def __init__(self, climate: str, message: str = "Climate {} is not recognized"):
+        self.climate = climate
+        self.message = message.format(climate)
+        super().__init__(self.message)
 
 
 class Event:
@@ -28,16 +72,11 @@ class Event:
             self.duration = 1  # anything less than 1 hour doesn't really make a difference in the calendar
 
     def to_json(self):
-        return {attr: getattr(self,attr) for attr in dir(self) if not attr.startswith("__") and not callable(getattr(self, attr))}
+        return EVENT_SCHEMA.encode(self)
 
     @staticmethod
     def from_json(json_obj):
-        e = Event("", "", 1)
-        d = dir(e)
-        for key, val in json_obj.items():
-            if key in d:
-                setattr(e, key, val)
-        return e
+        return EVENT_SCHEMA.decode(json_obj)
 
     def __eq__(self, other):
         return self.id == other.id
@@ -59,29 +98,15 @@ class Hour:
     """
     time_from_epoch: int  # Current time
     weather: Weather  # Current weather
-    generator_state: WeatherGeneratorState  # The state of the weather generator at this point
-    events: List[Event]  # List of events at this hour
+    events: Sequence[Event]  # Events at this hour
 
 
     def to_json(self):
-        res = {}
-        res["time_from_epoch"] = self.time_from_epoch
-        res['weather'] = self.weather.to_json()
-        res['generator_state'] = self.generator_state.to_json()
-        res['events'] = []
-        for event in self.events:
-            res['events'].append(event.to_json())
-        return res
+        return HOUR_SCHEMA.encode(self)
 
     @staticmethod
     def from_json(json_obj):
-        time_from_epoch = json_obj['time_from_epoch']
-        weather = Weather.from_json(json_obj['weather'])
-        generator_state = WeatherGeneratorState.from_json(json_obj['generator_state'])
-        events = []
-        for event in json_obj['events']:
-            events.append(Event.from_json(event))
-        return Hour(time_from_epoch=time_from_epoch, weather=weather, generator_state=generator_state, events=events)
+        return HOUR_SCHEMA.decode(json_obj)
 
     def event_str(self, maxwidth: int = 16):
         """
@@ -89,16 +114,501 @@ class Hour:
         :param maxwidth: Max number of characters for the event description
         :return: Event listing
         """
-        if len(self.events) == 0:
-            event_str = " "*maxwidth
-        elif len(self.events) == 1:
-            if len(self.events[0].description) > maxwidth:
-                event_str = self.events[0].description[:maxwidth - 3] + "..."
-            else:
-                event_str = self.events[0].description
+        return event_summary(self.events, maxwidth)
+
+
+def event_summary(events: Sequence[Event], maxwidth: int = 16) -> str:
+    """
+    Returns the event listing of an hour as a string
+    :param events: Events on the hour
+    :param maxwidth: Max number of characters for the event description
+    :return: Event listing
+    """
+    if len(events) == 0:
+        event_str = " "*maxwidth
+    elif len(events) == 1:
+        if len(events[0].description) > maxwidth:
+            event_str = events[0].description[:maxwidth - 3] + "..."
         else:
-            event_str = f"{'[...]':<{maxwidth}}"
-        return event_str
+            event_str = events[0].description
+    else:
+        event_str = f"{'[...]':<{maxwidth}}"
+    return event_str
+
+
+@dataclass
+class HourRange:
+    """
+    What's needed to draw consecutive hours, one element per hour in each list and array
+    """
+    start: int  # Time from epoch of the first hour
+    weather: np.ndarray  # Weather as WEATHER_BLOCK_DTYPE
+    warnings: List[str]  # Warning symbols of the weather, as given by Weather.warning_symbols
+    dates: List[str]  # Short date strings
+    hours: np.ndarray  # Hour of the day
+    events: List[List[Event]]  # Events on each hour, ordered by start time
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def event_str(self, index: int, maxwidth: int = 16) -> str:
+        """
+        Returns the event listing of an hour as a string, like Hour.event_str
+        :param index: Index of the hour in the range
+        :param maxwidth: Max number of characters for the event description
+        :return: Event listing
+        """
+        return event_summary(self.events[index], maxwidth)
+
+
+EVENT_SCHEMA = Schema(Event, (
+    Field("delete_event", default=False),
+    Field("location", default=""),
+    Field("description", default=""),
+    Field("start_time_epoch", default=1),
+    Field("duration", default=1),
+    Field("id", default_factory=lambda: str(uuid.uuid4())),
+))
+
+HOUR_SCHEMA = Schema(Hour, (
+    Field("time_from_epoch"),
+    Field("weather", encode=WEATHER_SCHEMA.encode, decode=WEATHER_SCHEMA.decode),
+    Field("events", encode=lambda events: [EVENT_SCHEMA.encode(event) for event in events],
+          decode=lambda events: [EVENT_SCHEMA.decode(event) for event in events], default_factory=list),
+))
+
+
+def _intervals_to_json(hours: List[int]) -> List[List[int]]:
+    """
+    Turns hours into runs of consecutive hours for saving
+    :param hours: Times from epoch
+    :return: List of [start, end) pairs
+    """
+    return [[start, end] for start, end in IntervalSet.from_points(hours)]
+
+
+def block_to_json(block: np.ndarray) -> Dict[str, str]:
+    """
+    Encodes weather for a change in the journal or the overrides of a seed save
+    :param block: Array of WEATHER_BLOCK_DTYPE
+    :return: Dict of the zlib compressed bytes of each column in base64, by WEATHER_BLOCK_DTYPE field
+    """
+    return {name: base64.b64encode(zlib.compress(block[name].tobytes())).decode() for name in WEATHER_BLOCK_DTYPE.names}
+
+
+def block_from_json(block_json: Dict[str, str], num_hours: int) -> np.ndarray:
+    """
+    Decodes weather encoded by block_to_json
+    :param block_json: The encoded columns
+    :param num_hours: Number of hours in the block
+    :return: Array of WEATHER_BLOCK_DTYPE
+    """
+    block = np.zeros(num_hours, dtype=WEATHER_BLOCK_DTYPE)
+    for name, data in block_json.items():
+        if name in WEATHER_BLOCK_DTYPE.names:
+            block[name] = np.frombuffer(zlib.decompress(base64.b64decode(data)), dtype=WEATHER_BLOCK_DTYPE[name])
+    return block
+
+
+def checkpoints_to_json(checkpoints: Dict[int, GeneratorCheckpoint]) -> Dict[int, dict]:
+    return {int(t): checkpoint.to_json() for t, checkpoint in checkpoints.items()}
+
+
+def checkpoints_from_json(checkpoints_json: Dict[str, dict]) -> Dict[int, GeneratorCheckpoint]:
+    return {int(t): GeneratorCheckpoint.from_json(checkpoint) for t, checkpoint in checkpoints_json.items()}
+
+
+HISTORY_CHUNK_HOURS = 24 * 32  # Hours in each chunk of a HistoryStore
+HISTORY_CACHE_BYTES = 2**20  # Weather kept in memory by the calendars of the UI, about 12 years
+
+
+@dataclass
+class CacheCounters:
+    """ How the weather chunks of a HistoryStore have been found """
+    hits: int = 0  # The chunk was in memory
+    misses: int = 0  # The chunk had been evicted and was recomputed
+    evictions: int = 0  # A chunk was dropped to stay within the budget
+
+
+class HistoryStore:
+    def __init__(self):
+        """
+        The generated hours of a calendar. Weather is kept in chunks of HISTORY_CHUNK_HOURS hours, each chunk holding one
+        typed NumPy column per WEATHER_BLOCK_DTYPE field, and events are kept in an EventIndex. Works like a
+        Dict[int, Hour], but the Hours are built when they're asked for and their events are a view into the index.
+        Changing the weather of a built Hour doesn't change the store, so use write_block() and the event methods for
+        that.
+        With enable_cache() the chunks become a least recently used cache: chunks that can be recomputed are dropped
+        when the memory budget is exceeded, and recomputed when they're used again.
+        With attach_saved() the chunks of a saved campaign are only read from the save when they're first used. They
+        can be dropped and read again for as long as they haven't been written to.
+        """
+        self.generated_hours = IntervalSet()  # Which hours have been written
+        self._chunks: "OrderedDict[int, Dict[str, np.ndarray]]" = OrderedDict()  # Least recently used first
+        self.events = EventIndex()
+        self.counters = CacheCounters()
+        self.budget_bytes: Optional[int] = None
+        self._materialize: Optional[Callable[[int, int], np.ndarray]] = None
+        self._release: Optional[Callable[[int, int], bool]] = None
+        self._evicted: Set[int] = set()  # Chunks with generated hours that aren't in memory
+        self._pinned: Set[int] = set()  # Chunks that can't be recomputed, until they're written again
+        self._saved: Set[int] = set()  # Chunks that are the same as in the save, whether they're in memory or not
+        self._load_saved: Optional[Callable[[int, int], Dict[str, np.ndarray]]] = None
+        self._unload_saved: Optional[Callable[[int, int], None]] = None
+
+    def enable_cache(self, budget_bytes: int, materialize: Callable[[int, int], np.ndarray],
+                     release: Callable[[int, int], bool]) -> None:
+        """
+        Limits the memory taken by the weather columns. When a chunk is used and the columns take more than the budget,
+        the least recently used chunks are evicted until they fit. Chunks that can't be recomputed stay in memory, so
+        the budget can be exceeded by them.
+        :param budget_bytes: Memory the weather columns may take
+        :param materialize: Called with the [start, end) hours of an evicted chunk when it's used again. Returns the
+                            weather of the hours as an array of WEATHER_BLOCK_DTYPE, zeros for the hours that haven't
+                            been generated.
+        :param release: Called with the [start, end) hours of a chunk before it's evicted. Returns False if the hours
+                        can't be recomputed, in which case the chunk is kept.
+        :return: None
+        """
+        self.budget_bytes = budget_bytes
+        self._materialize = materialize
+        self._release = release
+        self._evict()
+
+    def attach_saved(self, hours: IntervalSet, chunk_indexes: Iterable[int],
+                     load: Callable[[int, int], Dict[str, np.ndarray]], unload: Callable[[int, int], None]) -> None:
+        """
+        Adds the hours of a save without reading their weather. Each chunk is read when it's first used, and can be
+        dropped from memory without asking to release it, until it's written to. Also used after chunks in memory have
+        been written to a save, with no new hours, so that they can be dropped.
+        :param hours: The hours in the save
+        :param chunk_indexes: Indexes of the chunks in the save
+        :param load: Called with the [start, end) hours of a chunk to read it. Returns the weather columns of the chunk
+                     by WEATHER_BLOCK_DTYPE field. They may be read-only, in which case they're copied when written to.
+        :param unload: Called with the [start, end) hours of a chunk that was read from the save when it's dropped
+        :return: None
+        """
+        for start, end in hours:
+            self.generated_hours.add(start, end)
+        chunk_indexes = list(chunk_indexes)
+        self._saved.update(chunk_indexes)
+        self._pinned.difference_update(chunk_indexes)
+        self._load_saved = load
+        self._unload_saved = unload
+
+    def _columns(self, chunk_index: int, create: bool = False) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Gets the weather columns of a chunk, recomputing them if the chunk was evicted
+        :param chunk_index: Index of the chunk
+        :param create: Whether to create empty columns for a chunk that has never been written
+        :return: Dict of column by WEATHER_BLOCK_DTYPE field, or None if the chunk doesn't exist and create is False
+        """
+        columns = self._chunks.get(chunk_index)
+        if columns is not None:
+            self.counters.hits += 1
+            self._chunks.move_to_end(chunk_index)
+            return columns
+        if chunk_index in self._evicted:
+            self.counters.misses += 1
+            self._evicted.discard(chunk_index)
+            block = self._materialize(chunk_index * HISTORY_CHUNK_HOURS, (chunk_index + 1) * HISTORY_CHUNK_HOURS)
+            columns = {name: np.ascontiguousarray(block[name]) for name in WEATHER_BLOCK_DTYPE.names}
+        elif chunk_index in self._saved:
+            self.counters.misses += 1
+            columns = self._load_saved(chunk_index * HISTORY_CHUNK_HOURS, (chunk_index + 1) * HISTORY_CHUNK_HOURS)
+        elif create:
+            columns = {name: np.zeros(HISTORY_CHUNK_HOURS, dtype=WEATHER_BLOCK_DTYPE[name])
+                       for name in WEATHER_BLOCK_DTYPE.names}
+        else:
+            return None
+        self._chunks[chunk_index] = columns
+        self._evict(keep=chunk_index)
+        return columns
+
+    def _evict(self, keep: int = None) -> None:
+        """
+        Evicts the least recently used chunks until the weather columns fit into the budget
+        :param keep: Chunk that is being used and must not be evicted
+        :return: None
+        """
+        if self.budget_bytes is None:
+            return
+        chunk_bytes = HISTORY_CHUNK_HOURS * WEATHER_BLOCK_DTYPE.itemsize
+        candidates = iter(list(self._chunks.keys()))
+        while len(self._chunks) * chunk_bytes > self.budget_bytes:
+            chunk_index = next(candidates, None)
+            if chunk_index is None:
+                return  # Everything left is pinned
+            if chunk_index == keep or chunk_index in self._pinned:
+                continue
+            if chunk_index in self._saved:
+                # Can be read from the save again
+                self._unload_saved(chunk_index * HISTORY_CHUNK_HOURS, (chunk_index + 1) * HISTORY_CHUNK_HOURS)
+                del self._chunks[chunk_index]
+                self.counters.evictions += 1
+                continue
+            if not self._release(chunk_index * HISTORY_CHUNK_HOURS, (chunk_index + 1) * HISTORY_CHUNK_HOURS):
+                self._pinned.add(chunk_index)
+                continue
+            del self._chunks[chunk_index]
+            self._evicted.add(chunk_index)
+            self.counters.evictions += 1
+
+    def copy_saved_columns(self) -> None:
+        """
+        Copies the columns in memory that were read from the save and may still use its memory, such as views into the
+        map of a campaign file, so that the save can be closed
+        :return: None
+        """
+        for chunk_index, columns in self._chunks.items():
+            if chunk_index in self._saved:
+                for name, column in columns.items():
+                    if not column.flags.writeable:
+                        columns[name] = column.copy()
+
+    def snapshot(self) -> "HistoryStore":
+        """
+        Copies the hours of the store without copying their weather. The columns in memory are made read-only and
+        shared with the copy, and whichever store writes to a chunk first copies its columns, so the copy keeps the
+        weather as it was. Chunks that aren't in memory are recomputed or read from the save by the copy itself, see
+        DnDCalendar.snapshot. The events aren't copied.
+        :return: HistoryStore
+        """
+        snapshot = HistoryStore()
+        snapshot.generated_hours = self.generated_hours.copy()
+        for chunk_index, columns in self._chunks.items():
+            for column in columns.values():
+                column.setflags(write=False)
+            snapshot._chunks[chunk_index] = dict(columns)
+        snapshot._evicted = set(self._evicted)
+        snapshot._pinned = set(self._pinned)
+        snapshot._saved = set(self._saved)
+        return snapshot
+
+    def chunk_indexes(self) -> List[int]:
+        """
+        Lists the chunks that have generated hours
+        :return: Sorted chunk indexes
+        """
+        indexes = []
+        for start, end in self.generated_hours:
+            first = start // HISTORY_CHUNK_HOURS
+            if len(indexes) > 0 and indexes[-1] == first:
+                first += 1
+            indexes.extend(range(first, (end - 1) // HISTORY_CHUNK_HOURS + 1))
+        return indexes
+
+    def is_saved(self, chunk_index: int) -> bool:
+        """
+        Checks whether a chunk is the same as in the save attached with attach_saved()
+        :param chunk_index: Index of the chunk
+        :return: True if the chunk hasn't been written to since it was saved
+        """
+        return chunk_index in self._saved
+
+    def ensure_resident(self, time_from_epoch: int) -> None:
+        """
+        Recomputes the chunk of an hour if it has been evicted, or reads it if it's only in the save, along with
+        whatever the calendar dropped with it
+        :param time_from_epoch: The hour
+        :return: None
+        """
+        self._columns(time_from_epoch // HISTORY_CHUNK_HOURS)
+
+    def __contains__(self, time_from_epoch: int) -> bool:
+        return time_from_epoch in self.generated_hours
+
+    def __len__(self) -> int:
+        return self.generated_hours.total_length
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self.generated_hours:
+            yield from range(start, end)
+
+    def keys(self) -> Iterator[int]:
+        return iter(self)
+
+    def items(self) -> Iterator[Tuple[int, Hour]]:
+        for time_from_epoch in self:
+            yield time_from_epoch, self[time_from_epoch]
+
+    def __getitem__(self, time_from_epoch: int) -> Hour:
+        if time_from_epoch not in self.generated_hours:
+            raise KeyError(time_from_epoch)
+        chunk_index, offset = divmod(time_from_epoch, HISTORY_CHUNK_HOURS)
+        columns = self._columns(chunk_index)
+        row = {name: column[offset] for name, column in columns.items()}
+        return Hour(time_from_epoch=time_from_epoch, weather=block_row_to_weather(row),
+                    events=EventView(self.events, time_from_epoch, time_from_epoch + 1))
+
+    def __setitem__(self, time_from_epoch: int, hour: Hour) -> None:
+        block = np.zeros(1, dtype=WEATHER_BLOCK_DTYPE)
+        weather_to_block_row(hour.weather, block[0:1])
+        self.write_block(time_from_epoch, block)
+        for event in hour.events:
+            if event not in self.events:
+                self.events.add(event)
+
+    def write_block(self, start_time_from_epoch: int, block: np.ndarray) -> None:
+        """
+        Stores the weather of consecutive hours
+        :param start_time_from_epoch: The hour of the first element of the block
+        :param block: Array of WEATHER_BLOCK_DTYPE
+        :return: None
+        """
+        start_time_from_epoch = int(start_time_from_epoch)
+        end_time_from_epoch = start_time_from_epoch + block.shape[0]
+        # Marked as generated first, so that a chunk written to here and evicted before the write is done gets these
+        # hours recomputed too
+        self.generated_hours.add(start_time_from_epoch, end_time_from_epoch)
+        t = start_time_from_epoch
+        while t < end_time_from_epoch:
+            chunk_index, offset = divmod(t, HISTORY_CHUNK_HOURS)
+            count = min(HISTORY_CHUNK_HOURS - offset, end_time_from_epoch - t)
+            columns = self._columns(chunk_index, create=True)
+            self._pinned.discard(chunk_index)
+            self._saved.discard(chunk_index)
+            for name, column in columns.items():
+                if not column.flags.writeable:
+                    columns[name] = column.copy()  # Columns straight from the save file, or shared with a snapshot
+            part = block[t - start_time_from_epoch:t - start_time_from_epoch + count]
+            for name in WEATHER_BLOCK_DTYPE.names:
+                columns[name][offset:offset + count] = part[name]
+            t += count
+
+    def read_block(self, start_time_from_epoch: int, end_time_from_epoch: int) -> np.ndarray:
+        """
+        Reads the weather of consecutive hours. Hours that haven't been written are all zeros.
+        :param start_time_from_epoch: The first hour to read
+        :param end_time_from_epoch: The hour after the last one to read
+        :return: Array of WEATHER_BLOCK_DTYPE
+        """
+        block = np.zeros(max(end_time_from_epoch - start_time_from_epoch, 0), dtype=WEATHER_BLOCK_DTYPE)
+        t = start_time_from_epoch
+        while t < end_time_from_epoch:
+            chunk_index, offset = divmod(t, HISTORY_CHUNK_HOURS)
+            count = min(HISTORY_CHUNK_HOURS - offset, end_time_from_epoch - t)
+            columns = self._columns(chunk_index)
+            if columns is not None:
+                part = block[t - start_time_from_epoch:t - start_time_from_epoch + count]
+                for name in WEATHER_BLOCK_DTYPE.names:
+                    part[name] = columns[name][offset:offset + count]
+            t += count
+        return block
+
+    def add_event(self, event: Event) -> None:
+        """
+        Adds an event on the hours it spans
+        :param event: Event to add
+        :return: None
+        """
+        self.events.add(event)
+
+    def remove_event(self, event: Event) -> None:
+        """
+        Removes an event if it's there
+        :param event: Event to remove
+        :return: None
+        """
+        self.events.remove(event)
+
+    def move_event(self, event: Event) -> None:
+        """
+        Updates an event after its time or text was changed in place
+        :param event: Event that was changed
+        :return: None
+        """
+        self.events.move(event)
+
+    def to_json(self) -> Dict[int, dict]:
+        """
+        Encodes the weather of every hour in the layout of Hour.to_json, but straight from the weather columns without
+        building Hours. Events are left out, they're saved once each by events_to_json().
+        :return: Dict of hour JSON by time from epoch
+        """
+        attributes = [WEATHER_BLOCK_ATTRIBUTES[name] for name in WEATHER_BLOCK_DTYPE.names]
+        res = {}
+        for start, end in self.generated_hours:
+            block = self.read_block(start, end)
+            rows = zip(*[block[name].tolist() for name in WEATHER_BLOCK_DTYPE.names])
+            for time_from_epoch, row in zip(range(start, end), rows):
+                res[time_from_epoch] = {'time_from_epoch': time_from_epoch, 'weather': dict(zip(attributes, row))}
+        return res
+
+    def events_to_json(self) -> Dict[str, dict]:
+        """
+        Encodes every event once
+        :return: Dict of event JSON by event id
+        """
+        return {event.id: EVENT_SCHEMA.encode(event) for event in self.events}
+
+    @staticmethod
+    def from_json(history_json, events_json=None) -> "HistoryStore":
+        """
+        Decodes hours saved by to_json and events saved by events_to_json, see write_hours_json. Every event is built
+        once and shared by all the hours it's on.
+        :param history_json: Dict of hour JSON by time from epoch
+        :param events_json: Dict of event JSON by event id
+        :return: HistoryStore
+        """
+        store = HistoryStore()
+        if events_json is not None:
+            for event_json in events_json.values():
+                store.events.add(EVENT_SCHEMA.decode(event_json))
+        store.write_hours_json((int(key), val) for key, val in history_json.items())
+        return store
+
+    def write_hours_json(self, hours: Iterable[Tuple[int, dict]]) -> None:
+        """
+        Stores hours in the layout of Hour.to_json. The weather goes straight into the columns, a run of consecutive
+        hours at a time, without building Weathers. Events of the hours are ignored.
+        :param hours: (time from epoch, hour JSON) of the hours, in any order
+        :return: None
+        """
+        hours = sorted(hours, key=lambda hour: hour[0])
+        if len(hours) == 0:
+            return
+        times = np.array([t for t, _ in hours], dtype=np.int64)
+        weathers = [val['weather'] for _, val in hours]
+        block = np.zeros(len(hours), dtype=WEATHER_BLOCK_DTYPE)
+        fields = {field.name: field for field in WEATHER_SCHEMA.fields}
+        for name in WEATHER_BLOCK_DTYPE.names:
+            field = fields[WEATHER_BLOCK_ATTRIBUTES[name]]
+            values = [weather.get(field.name, field.default) for weather in weathers]
+            if field.decode is not None and any(isinstance(value, str) for value in values):
+                values = [field.decode(value) for value in values]  # Older saves have display strings
+            values = np.asarray(values, dtype=np.int64)
+            if name == 'precipitation_duration':
+                # Older saves let the duration count down without a limit, far past what the column holds
+                values = np.maximum(values, PRECIPITATION_DURATION_FLOOR)
+            limits = np.iinfo(WEATHER_BLOCK_DTYPE[name])
+            if values.min() < limits.min or values.max() > limits.max:
+                raise ValueError(f"{field.name} of the hours {times[0]}-{times[-1]} doesn't fit in {limits.dtype}")
+            block[name] = values
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(times) != 1) + 1, [len(hours)]))
+        for run_start, run_end in zip(run_starts[:-1].tolist(), run_starts[1:].tolist()):
+            self.write_block(int(times[run_start]), block[run_start:run_end])
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory taken by the weather columns in memory
+        :return: Size in bytes
+        """
+        return sum(column.nbytes for columns in self._chunks.values() for column in columns.values())
+
+
+def _synchronized(method):
+    """
+    Makes a DnDCalendar method hold the lock of the calendar, so that it can be called while a Pregenerator is filling
+    in the history from another thread
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class GeneratingPopupWindow:
     def __init__(self):
@@ -112,78 +622,561 @@ class GeneratingPopupWindow:
 
 class DnDCalendar:
     def __init__(self, import_history=None, climate: str = "temperate",
-                 elevation: int = 1500):
+                 elevation: int = 1500, seed: int = None, import_checkpoints=None, history_budget_bytes: int = None,
+                 import_climate_timeline: ClimateTimeline = None, import_stale_hours: IntervalSet = None):
         """
         Contains the data for each hour of each day in the entire calendar
-        :param import_history: Allows importing already existing history
-        :param climate: Which climate to use
-        :param elevation: What the elevation is
+        :param import_history: Allows importing already existing history, either as a HistoryStore or a Dict[int, Hour]
+        :param climate: Which climate to use, unless a climate timeline is imported
+        :param elevation: What the elevation is, unless a climate timeline is imported
+        :param seed: Weather seed. With a seed the weather of any hour can be recomputed exactly, no matter in which
+                     order the hours get generated. Without one every generated run of hours is random.
+        :param import_checkpoints: Weather generator checkpoints that go with the imported history
+        :param history_budget_bytes: If given, the weather of the history is kept within this much memory. Weather that
+                                     doesn't fit is dropped and recomputed from the generator checkpoints when it's
+                                     needed again. With a seed the checkpoints are dropped too.
+        :param import_climate_timeline: Climate and elevation over time that go with the imported history
+        :param import_stale_hours: Hours of the imported history that are waiting to be regenerated
         """
         if import_history is None:
-            import_history = {}
+            import_history = HistoryStore()
+        elif not isinstance(import_history, HistoryStore):
+            history_store = HistoryStore()
+            for time_from_epoch, hour in import_history.items():
+                history_store[int(time_from_epoch)] = hour
+            import_history = history_store
+        if import_checkpoints is None:
+            import_checkpoints = {}
         self.reckoningHandler = ReckoningHandler()
-        self.history: Dict[int, Hour] = import_history
-        self.climate = climate
-        self.elevation = elevation
-        self.weather_generator = WeatherGenerator()
+        self.history: HistoryStore = import_history
+        if import_climate_timeline is None:
+            import_climate_timeline = ClimateTimeline(climate, elevation)
+        self.climate_timeline = import_climate_timeline
+        self.seed = seed
+        self.weather_generator = WeatherGenerator(seed=seed)
+        # Generator checkpoints at the first hour of every generated day and of every generated run. The state of the
+        # generator at any generated hour can be replayed from the checkpoint at or before it on the same day.
+        self._checkpoints: Dict[int, GeneratorCheckpoint] = import_checkpoints
+        # Where the history was loaded from with attach_saved_history, and the chunks whose checkpoints are only there
+        self._saved_history = None
+        self._saved_checkpoints_missing: Set[int] = set()
+        # Gets every change made to the calendar with record(change), see apply_change. Set by CampaignJournal.
+        self.journal = None
+        # Number of edits made to the calendar, whether or not there's a journal. Weather generated or regenerated
+        # because it was read or pregenerated isn't counted, as it's not an edit.
+        self.changes = 0
+        # Generated hours whose climate or elevation has changed since. They are regenerated when they're read through
+        # the calendar, or by pregenerate, instead of all at once when the change is made.
+        self._stale_hours = import_stale_hours if import_stale_hours is not None else IntervalSet()
+        self.show_generating_popup = True  # Set to False when there is no curses screen to draw on
+        # Held while the history or the weather generator is used. Reentrant, as the public methods call each other.
+        self.lock = threading.RLock()
 
         self._time_generated = 24 * 3  # How many hours are generated before/after a given time at most
+        self._generated_hours = self.history.generated_hours  # Index of the hours in history
+        if history_budget_bytes is not None:
+            self.history.enable_cache(history_budget_bytes, self._materialize_hours, self._release_hours)
 
-    def to_json(self):
+    @property
+    def climate(self) -> str:
+        """
+        The climate from the last change onwards, which new hours past the end of the climate timeline get
+        :return: Name of the climate
+        """
+        return self.climate_timeline.latest[0]
+
+    @property
+    def elevation(self) -> int:
+        """
+        The elevation from the last change onwards, which new hours past the end of the climate timeline get
+        :return: Elevation in ft above sea level
+        """
+        return self.climate_timeline.latest[1]
+
+    def climate_at(self, time_from_epoch: int) -> Tuple[str, int]:
+        """
+        Finds the climate and elevation at a time
+        :param time_from_epoch: The time
+        :return: (climate, elevation)
+        """
+        return self.climate_timeline.at(time_from_epoch)
+
+    def climate_segments(self, start_time_from_epoch: int, end_time_from_epoch: int) -> List[Tuple[int, int, str, int]]:
+        """
+        Lists the climates and elevations over a range
+        :param start_time_from_epoch: The first hour
+        :param end_time_from_epoch: The hour after the last one
+        :return: List of (start, end, climate, elevation), cut to the range
+        """
+        return self.climate_timeline.segments(start_time_from_epoch, end_time_from_epoch)
+
+    @_synchronized
+    def to_json(self, weather: bool = True):
+        """
+        Encodes the calendar
+        :param weather: Whether to include the weather of the history and the generator checkpoints. Without them the
+                        save only has the settings and the events, for containers that store the weather themselves.
+        :return: JSON object
+        """
         res = {}
-        res['history'] = {}
-        for key, val in self.history.items():
-            res['history'][int(key)] = val.to_json()
-        res['climate'] = self.climate
-        res['elevation'] = self.elevation
+        res['history'] = self.history.to_json() if weather else {}
+        res['events'] = self.history.events_to_json()
+        res['climate_timeline'] = self.climate_timeline.to_json()
+        res['stale'] = [[start, end] for start, end in self._stale_hours]
+        res['seed'] = self.seed
+        res['checkpoints'] = {}
+        if weather:
+            for chunk_index in self.history.chunk_indexes():
+                for key, val in self.chunk_checkpoints(chunk_index).items():
+                    res['checkpoints'][int(key)] = val.to_json()
+        res['version'] = SAVE_FORMAT_VERSION
         return res
 
+    @_synchronized
+    def chunk_checkpoints(self, chunk_index: int) -> Dict[int, GeneratorCheckpoint]:
+        """
+        Gets the generator checkpoints of the hours of a history chunk, including ones that were dropped with the
+        weather of the chunk or haven't been read from the save yet
+        :param chunk_index: Index of the chunk
+        :return: Checkpoints by time from epoch
+        """
+        start = chunk_index * HISTORY_CHUNK_HOURS
+        self.history.ensure_resident(start)
+        return {t: self._checkpoints[t] for t in range(start, start + HISTORY_CHUNK_HOURS) if t in self._checkpoints}
+
+    def snapshot(self) -> "DnDCalendar":
+        """
+        Copies the calendar, so that it can be saved in another thread while this one keeps changing. The lock is only
+        held while the hours, checkpoints, events and settings are copied, which takes about as long as encoding the
+        events. The weather is shared until either calendar writes to it, see HistoryStore.snapshot, and the copy
+        recomputes or reads from the save whatever isn't in memory. The event index is rebuilt after the lock has been
+        released.
+        :return: DnDCalendar that nothing else uses
+        """
+        with self.lock:
+            history = self.history.snapshot()
+            events_json = self.history.events_to_json()
+            checkpoints = dict(self._checkpoints)
+            climate_timeline = ClimateTimeline.from_json(self.climate_timeline.to_json())
+            stale_hours = self._stale_hours.copy()
+            saved_history = self._saved_history
+            saved_checkpoints_missing = set(self._saved_checkpoints_missing)
+        for event_json in events_json.values():
+            history.events.add(Event.from_json(event_json))
+        snapshot = DnDCalendar(import_history=history, seed=self.seed, import_checkpoints=checkpoints,
+                               import_climate_timeline=climate_timeline, import_stale_hours=stale_hours)
+        snapshot.show_generating_popup = False
+        if saved_history is not None:
+            # A save that computes its chunks with the calendar, like a seed save, has to compute them with the copy
+            snapshot._saved_history = saved_history.bind(snapshot) if hasattr(saved_history, 'bind') else saved_history
+            snapshot._saved_checkpoints_missing = saved_checkpoints_missing
+            history.attach_saved(IntervalSet(), (), snapshot._load_saved_hours, snapshot._unload_saved_hours)
+        if self.history.budget_bytes is not None:
+            history.enable_cache(self.history.budget_bytes, snapshot._materialize_hours, snapshot._release_hours)
+        return snapshot
+
+    def attach_saved_history(self, saved_history) -> None:
+        """
+        Reads the weather and the checkpoints of the history from a save as they're needed, a chunk at a time
+        :param saved_history: Object with the hours and chunk_indexes in the save, read_chunk(chunk_index) returning
+                              the weather columns of a chunk by WEATHER_BLOCK_DTYPE field and
+                              read_checkpoints(chunk_index) returning the checkpoints of a chunk by time from epoch
+        :return: None
+        """
+        self._saved_history = saved_history
+        self._saved_checkpoints_missing.update(saved_history.chunk_indexes)
+        self.history.attach_saved(saved_history.hours, saved_history.chunk_indexes, self._load_saved_hours,
+                                  self._unload_saved_hours)
+
+    @property
+    def saved_history(self):
+        """ The save the history is read from, see attach_saved_history, or None """
+        return self._saved_history
+
+    @_synchronized
+    def close_saved_history(self) -> None:
+        """
+        Closes the save the history is read from, if it has a close(), after copying the weather read from it that's
+        in memory. The rest of the save can't be read after this, so it's only for when the calendar is done with, or
+        is about to read from another save with history_saved.
+        :return: None
+        """
+        if self._saved_history is not None and hasattr(self._saved_history, 'close'):
+            self.history.copy_saved_columns()
+            self._saved_history.close()
+
+    @_synchronized
+    def unsaved_chunks(self, saved_history) -> List[int]:
+        """
+        Lists the chunks of the history that differ from a save. If the history isn't read from that save, that's all
+        of them.
+        :param saved_history: The save, see attach_saved_history
+        :return: Sorted chunk indexes
+        """
+        chunk_indexes = self.history.chunk_indexes()
+        if saved_history is not self._saved_history:
+            return chunk_indexes
+        return [chunk_index for chunk_index in chunk_indexes if not self.history.is_saved(chunk_index)]
+
+    @_synchronized
+    def history_saved(self, saved_history, chunk_indexes: Iterable[int]) -> None:
+        """
+        Reads chunks from a save from now on, after they've been written into it. They can then be dropped from memory
+        even if they couldn't be recomputed. Chunks that are still read from another save must have been written too,
+        and the other save is closed, see close_saved_history.
+        :param saved_history: The save, see attach_saved_history
+        :param chunk_indexes: Indexes of the chunks that were written
+        :return: None
+        """
+        if saved_history is not self._saved_history:
+            self.close_saved_history()
+        self._saved_history = saved_history
+        self.history.attach_saved(IntervalSet(), chunk_indexes, self._load_saved_hours, self._unload_saved_hours)
+
+    def _load_saved_hours(self, start_time_from_epoch: int, end_time_from_epoch: int) -> Dict[str, np.ndarray]:
+        """
+        Called by the history when a chunk is read from the save
+        :param start_time_from_epoch: The first hour of the chunk
+        :param end_time_from_epoch: The hour after the last one
+        :return: Weather columns of the chunk
+        """
+        self._restore_saved_checkpoints(start_time_from_epoch, end_time_from_epoch)
+        return self._saved_history.read_chunk(start_time_from_epoch // HISTORY_CHUNK_HOURS)
+
+    def _unload_saved_hours(self, start_time_from_epoch: int, end_time_from_epoch: int) -> None:
+        """
+        Called by the history when a chunk that's the same as in the save is dropped. Its checkpoints are dropped too.
+        :param start_time_from_epoch: The first hour of the chunk
+        :param end_time_from_epoch: The hour after the last one
+        :return: None
+        """
+        for t in range(start_time_from_epoch, end_time_from_epoch):
+            self._checkpoints.pop(t, None)
+        self._saved_checkpoints_missing.add(start_time_from_epoch // HISTORY_CHUNK_HOURS)
+
+    def _restore_saved_checkpoints(self, start_time_from_epoch: int, end_time_from_epoch: int) -> None:
+        """
+        Reads the checkpoints of the chunks in a range that are only in the save. Has to be done before checkpoints in
+        the range are changed, or they'd be overwritten by the saved ones when the chunk is read.
+        :param start_time_from_epoch: The first hour
+        :param end_time_from_epoch: The hour after the last one
+        :return: None
+        """
+        if len(self._saved_checkpoints_missing) == 0:
+            return
+        first, last = start_time_from_epoch // HISTORY_CHUNK_HOURS, (end_time_from_epoch - 1) // HISTORY_CHUNK_HOURS
+        for chunk_index in sorted(i for i in self._saved_checkpoints_missing if first <= i <= last):
+            self._saved_checkpoints_missing.discard(chunk_index)
+            self._checkpoints.update(self._saved_history.read_checkpoints(chunk_index))
+
     @staticmethod
-    def from_json(json_obj):
-        climate = json_obj['climate']
-        elevation = json_obj['elevation']
-        history = {}
-        for key, val in json_obj['history'].items():
-            history[int(key)] = Hour.from_json(val)
-        return DnDCalendar(import_history=history, climate=climate, elevation=elevation)
+    def from_json(json_obj, history_budget_bytes: int = None, import_history: HistoryStore = None):
+        """
+        Loads a calendar from a save written by to_json. Older versions of the save layout are upgraded first.
+        :param json_obj: The save
+        :param history_budget_bytes: Memory the weather of the history may take, see DnDCalendar
+        :param import_history: The weather of the history, if it was decoded from the save beforehand, such as by
+                               import_json_save. The save then has no hours, but has to have whatever the upgrades
+                               would have taken from them: the checkpoints of a version 1 save, the event table of a
+                               version 2 save and the 'history_end' of a version 4 save or older.
+        :return: DnDCalendar
+        :raises UnsupportedSaveVersionException: If the save is from a newer version than this one
+        """
+        version = json_obj.get('version', 1)
+        if version > SAVE_FORMAT_VERSION:
+            raise UnsupportedSaveVersionException(version)
+        while version < SAVE_FORMAT_VERSION:
+            json_obj = _SAVE_UPGRADES[version](json_obj)
+            version += 1
+        if import_history is None:
+            history = HistoryStore.from_json(json_obj['history'], json_obj['events'])
+        else:
+            history = import_history
+            for event_json in json_obj['events'].values():
+                history.events.add(Event.from_json(event_json))
+        checkpoints = {}
+        for key, val in json_obj['checkpoints'].items():
+            checkpoints[int(key)] = GeneratorCheckpoint.from_json(val)
+        return DnDCalendar(import_history=history, seed=json_obj.get('seed'), import_checkpoints=checkpoints,
+                           history_budget_bytes=history_budget_bytes,
+                           import_climate_timeline=ClimateTimeline.from_json(json_obj['climate_timeline']),
+                           import_stale_hours=IntervalSet(json_obj['stale']))
+
 
     def get_climates(self):
         return self.weather_generator.climate_list
 
-    def _add_hours(self, start_time_from_epoch: int, num_hours: int, weather_generator: WeatherGenerator) -> None:
+    def _add_hours(self, start_time_from_epoch: int, num_hours: int, weather_generator: WeatherGenerator,
+                   journaled: bool = True) -> None:
         """
         Adds hours into the calendar from the start time
         :param start_time_from_epoch: The start hour from epoch (the first hour that will be generated)
         :param num_hours: Number of hours generated. Must be at least 1.
         :param weather_generator: Weather generator to use.
+        :param journaled: Whether to record weather that can't be recomputed in the journal. If not, the journal is
+                          told it's missing weather, and the next save writes the whole campaign file.
         :return: None
         """
         # Somehow these end up sometimes being numpy int32's which breaks JSON serialization.
         # FIXME: Figure out how the hell this happens.
         start_time_from_epoch = int(start_time_from_epoch)
         num_hours = int(num_hours)
-        if start_time_from_epoch - 1 in self.history:
-            weather_generator_state = self.history[start_time_from_epoch - 1].generator_state
-            # Check that season hasn't changed
-            season = self.reckoningHandler.get_season(start_time_from_epoch)
-            if weather_generator_state.season != season:
-                weather_generator_state.season = season
-            weather_generator.set_state(weather_generator_state)
+        # Stop at the first already generated hour
+        next_generated = self._generated_hours.first_from(start_time_from_epoch)
+        if next_generated is not None:
+            num_hours = min(num_hours, next_generated - start_time_from_epoch)
+        if num_hours <= 0:
+            return
+        self._restore_saved_checkpoints(start_time_from_epoch - 1, start_time_from_epoch + num_hours)
+        if self.seed is not None:
+            block, checkpoints = self.compute_weather(start_time_from_epoch, num_hours)
+            self._checkpoints.update(checkpoints)
+            self.history.write_block(start_time_from_epoch, block)
+        else:
+            self._simulate(start_time_from_epoch, num_hours, weather_generator)
+        if self.journal is not None and self.seed is None:
+            # Seeded weather is recomputed when it's next read, so only the weather of a seedless calendar is journaled
+            if journaled:
+                self.journal.record(dict(self._weather_change(start_time_from_epoch, num_hours), change='generate'))
+            else:
+                self.journal.missing_weather = True
+
+    def _weather_change(self, start_time_from_epoch: int, num_hours: int) -> dict:
+        """
+        Describes generated hours of a calendar without a seed for the journal, whose weather can't be recomputed and
+        is recorded as it is, along with its checkpoints
+        :param start_time_from_epoch: The first hour
+        :param num_hours: Number of hours
+        :return: Change without its kind
+        """
+        end_time_from_epoch = start_time_from_epoch + num_hours
+        return {'start': start_time_from_epoch, 'hours': num_hours,
+                'weather': block_to_json(self.history.read_block(start_time_from_epoch, end_time_from_epoch)),
+                'checkpoints': checkpoints_to_json({t: self._checkpoints[t] for t in range(
+                    start_time_from_epoch, end_time_from_epoch) if t in self._checkpoints})}
+
+    def _write_weather(self, start_time_from_epoch: int, block: np.ndarray,
+                       checkpoints: Dict[int, GeneratorCheckpoint]) -> None:
+        """
+        Writes recorded weather over the hours it's for, replacing the checkpoints of the hours
+        :param start_time_from_epoch: The first hour
+        :param block: Array of WEATHER_BLOCK_DTYPE
+        :param checkpoints: Checkpoints of the hours
+        :return: None
+        """
+        end_time_from_epoch = start_time_from_epoch + block.shape[0]
+        self._restore_saved_checkpoints(start_time_from_epoch - 1, end_time_from_epoch)
+        for t in range(start_time_from_epoch, end_time_from_epoch):
+            self._checkpoints.pop(t, None)
+        self._checkpoints.update(checkpoints)
+        self.history.write_block(start_time_from_epoch, block)
+
+    def _simulate(self, start_time_from_epoch: int, num_hours: int, weather_generator: WeatherGenerator) -> None:
+        """
+        Generates hours without a seed, an hour at a time. Continues from the hour before the start if it's been
+        generated, otherwise starts anew. Checkpoints are made at the start, at the start of every day and wherever the
+        climate timeline has a segment start, so that replaying from a checkpoint never crosses a change of settings.
+        :param start_time_from_epoch: The first hour to generate
+        :param num_hours: Number of hours to generate
+        :param weather_generator: Weather generator to use
+        :return: None
+        """
+        season = self.reckoningHandler.get_season(start_time_from_epoch)
+        climate, elevation = self.climate_timeline.at(start_time_from_epoch)
+        if self._replay_to(start_time_from_epoch - 1, weather_generator):
+            # Check that the season and the settings haven't changed
+            weather_generator.change_season(season)
+            weather_generator.change_climate(climate)
+            weather_generator.change_elevation(elevation)
             weather_generator.advance_hour()
         else:
-            season = self.reckoningHandler.get_season(start_time_from_epoch)
-            self.weather_generator.initialize(season=season, climate=self.climate, elevation=self.elevation,
-                                              hour=start_time_from_epoch % 24)
+            weather_generator.initialize(season=season, climate=climate, elevation=elevation,
+                                         hour=start_time_from_epoch % 24, day=start_time_from_epoch // 24)
+        boundaries = set(self.climate_timeline.boundaries(start_time_from_epoch,
+                                                          start_time_from_epoch + num_hours))
+        block = np.zeros(num_hours, dtype=WEATHER_BLOCK_DTYPE)
         for hour in range(num_hours):
             this_hour = start_time_from_epoch + hour
-            weather = weather_generator.get_weather()
-            generator_state = weather_generator.get_state()
-            if this_hour in self.history:
-                break  # This means that we hit a section of already generated hours. Staph.
-            self.history[start_time_from_epoch + hour] = Hour(time_from_epoch=this_hour, weather=weather,
-                                                              generator_state=generator_state, events=[])
+            if hour == 0 or this_hour % 24 == 0 or this_hour in boundaries:
+                self._checkpoints[this_hour] = weather_generator.get_checkpoint()
+            weather_to_block_row(weather_generator.get_weather(), block[hour:hour + 1])
+            if this_hour + 1 in boundaries:
+                climate, elevation = self.climate_timeline.at(this_hour + 1)
+                weather_generator.change_climate(climate)
+                weather_generator.change_elevation(elevation)
+            weather_generator.advance_hour()
+        self.history.write_block(start_time_from_epoch, block)
+
+    def _replay_to(self, time_from_epoch: int, weather_generator: WeatherGenerator) -> bool:
+        """
+        Puts a weather generator into the state it was in at a generated hour by replaying the hours from the
+        checkpoint before it. There's a checkpoint at the start of every day, so this never takes more than 23 hours.
+        :param time_from_epoch: The hour to replay to
+        :param weather_generator: Weather generator to replay with
+        :return: True if the generator was set, False if there is no checkpoint to replay from
+        """
+        checkpoint_time = time_from_epoch
+        while checkpoint_time not in self._checkpoints:
+            if checkpoint_time % 24 == 0:
+                return False
+            checkpoint_time -= 1
+        weather_generator.restore_checkpoint(self._checkpoints[checkpoint_time])
+        for _ in range(time_from_epoch - checkpoint_time):
             weather_generator.advance_hour()
+        return True
+
+    @_synchronized
+    def get_generator_state(self, time_from_epoch: int) -> WeatherGeneratorState:
+        """
+        Get the state the weather generator was in at a given hour
+        :param time_from_epoch: The time from epoch
+        :return: The generator state, or None if the hour hasn't been generated
+        """
+        weather_generator = WeatherGenerator(seed=self.seed)
+        self._refresh(time_from_epoch, time_from_epoch + 1)
+        self.history.ensure_resident(time_from_epoch)  # Brings back dropped checkpoints
+        if not self._replay_to(time_from_epoch, weather_generator):
+            return None
+        return weather_generator.get_state()
+
+    @_synchronized
+    def compute_weather(self, start_time_from_epoch: int, num_hours: int) \
+            -> Tuple[np.ndarray, Dict[int, GeneratorCheckpoint]]:
+        """
+        Recomputes the weather of a seeded calendar. Only a few days before the start time have to be simulated, and
+        the result doesn't depend on what has or hasn't been generated before, only on the climate timeline.
+        :param start_time_from_epoch: The first hour to compute
+        :param num_hours: Number of hours to compute
+        :return: Weather block of WEATHER_BLOCK_DTYPE and the generator checkpoints of the days the hours are in
+        """
+        generator = self.weather_generator
+        first_day = start_time_from_epoch // 24
+        end_day = (start_time_from_epoch + num_hours - 1) // 24 + 1
+        warm_up_day = generator.warm_up_start(first_day)
+        seasons = [self.reckoningHandler.get_season(day * 24) for day in range(warm_up_day, end_day)]
+        # The season and the settings are only checked at the start of each generated block, so split the block where
+        # the season changes and where a segment of the climate timeline starts
+        splits = {day * 24 for day in range(warm_up_day + 1, end_day) if seasons[day - warm_up_day] !=
+                  seasons[day - warm_up_day - 1]}
+        splits.update(self.climate_timeline.boundaries(warm_up_day * 24, end_day * 24))
+        splits = sorted(splits)
+        state = generator.warm_up_state(warm_up_day, seasons[0], *self.climate_timeline.at(warm_up_day * 24))
+        blocks = []
+        checkpoints = {}
+        for run_start, run_end in zip([warm_up_day * 24] + splits, splits + [end_day * 24]):
+            state.season = seasons[run_start // 24 - warm_up_day]
+            state.climate, state.elevation = self.climate_timeline.at(run_start)
+            run_checkpoints = []
+            block, state = generator.generate_block(state, run_end - run_start, run_checkpoints)
+            blocks.append(block)
+            for i, checkpoint in run_checkpoints:
+                t = run_start + i
+                if t >= first_day * 24:
+                    checkpoints[t] = checkpoint
+        offset = start_time_from_epoch - warm_up_day * 24
+        return np.concatenate(blocks)[offset:offset + num_hours], checkpoints
+
+    def _recompute_hours(self, start_time_from_epoch: int, end_time_from_epoch: int) \
+            -> Tuple[np.ndarray, Dict[int, GeneratorCheckpoint]]:
+        """
+        Recomputes the weather of the generated hours in a range. Seeded hours are computed from the climate timeline,
+        others are replayed from the checkpoints. Each replay starts at a checkpoint and stops at the next one or at the
+        end of the day, as the generator may have been started anew at a checkpoint. Hours without a checkpoint to
+        replay from are left as zeros.
+        :param start_time_from_epoch: The first hour
+        :param end_time_from_epoch: The hour after the last one
+        :return: Weather block of WEATHER_BLOCK_DTYPE covering the range, and the recomputed seeded checkpoints
+        """
+        block = np.zeros(end_time_from_epoch - start_time_from_epoch, dtype=WEATHER_BLOCK_DTYPE)
+        checkpoints = {}
+        weather_generator = WeatherGenerator(seed=self.seed)
+        for run_start, run_end in self._generated_hours.overlapping(start_time_from_epoch, end_time_from_epoch):
+            if self.seed is not None:
+                run_block, run_checkpoints = self.compute_weather(run_start, run_end - run_start)
+                block[run_start - start_time_from_epoch:run_end - start_time_from_epoch] = run_block
+                checkpoints.update((t, checkpoint) for t, checkpoint in run_checkpoints.items()
+                                   if start_time_from_epoch <= t < end_time_from_epoch)
+                continue
+            t = run_start
+            while t < run_end:
+                segment_end = t + 1
+                while segment_end < min(run_end, (t // 24 + 1) * 24) and segment_end not in self._checkpoints:
+                    segment_end += 1
+                if t in self._checkpoints:
+                    weather_generator.restore_checkpoint(self._checkpoints[t])
+                    for i in range(t - start_time_from_epoch, segment_end - start_time_from_epoch):
+                        weather_to_block_row(weather_generator.get_weather(), block[i:i + 1])
+                        weather_generator.advance_hour()
+                t = segment_end
+        return block, checkpoints
+
+    @_synchronized
+    def recompute_chunk(self, chunk_index: int) -> Tuple[np.ndarray, Dict[int, GeneratorCheckpoint]]:
+        """
+        Recomputes the generated hours of a history chunk the way they would be after being dropped, without touching
+        the history
+        :param chunk_index: Index of the chunk
+        :return: Weather block of WEATHER_BLOCK_DTYPE covering the chunk, zeros for the hours that haven't been
+                 generated, and the recomputed seeded checkpoints
+        """
+        start = chunk_index * HISTORY_CHUNK_HOURS
+        return self._recompute_hours(start, start + HISTORY_CHUNK_HOURS)
 
+    def _release_hours(self, start_time_from_epoch: int, end_time_from_epoch: int) -> bool:
+        """
+        Called by the history before the weather of a chunk is dropped. Checks that the weather can be recomputed, and
+        with a seed also drops the checkpoints of the chunk, as they can be recomputed along with the weather.
+        :param start_time_from_epoch: The first hour of the chunk
+        :param end_time_from_epoch: The hour after the last one
+        :return: Whether the weather can be dropped
+        """
+        times = [t for t in range(start_time_from_epoch, end_time_from_epoch) if t in self._checkpoints]
+        checkpoints = [self._checkpoints[t] for t in times]
+        for run_start, run_end in self._generated_hours.overlapping(start_time_from_epoch, end_time_from_epoch):
+            first = max(run_start, start_time_from_epoch)
+            for t in range(first, min(run_end, end_time_from_epoch)):
+                if t != first and t % 24 != 0:
+                    continue
+                # Seeded weather is computed from the checkpoints at the start of each day, other weather is replayed
+                # from the checkpoints at the start of each run and day
+                if (t - t % 24 if self.seed is not None else t) not in self._checkpoints:
+                    return False
+        if self.seed is None:
+            # Checkpoints of old saves don't have the roll key needed to replay them
+            return all(checkpoint.roll_key is not None for checkpoint in checkpoints)
+        for t in times:
+            del self._checkpoints[t]
+        return True
+
+    def _materialize_hours(self, start_time_from_epoch: int, end_time_from_epoch: int) -> np.ndarray:
+        """
+        Called by the history when the weather of a dropped chunk is needed again. Checkpoints dropped with it are put
+        back, unless new ones have been made since.
+        :param start_time_from_epoch: The first hour of the chunk
+        :param end_time_from_epoch: The hour after the last one
+        :return: Weather block of WEATHER_BLOCK_DTYPE covering the chunk
+        """
+        block, checkpoints = self._recompute_hours(start_time_from_epoch, end_time_from_epoch)
+        for t, checkpoint in checkpoints.items():
+            self._checkpoints.setdefault(t, checkpoint)
+        return block
+
+    def _plan_generation(self, time_from_epoch: int) -> Tuple[int, int]:
+        """
+        Figures out which hours to generate so that the given time and some time around it exist
+        :param time_from_epoch: The time that needs to exist
+        :return: The first hour to generate and the number of hours to generate
+        """
+        last_generated = self._generated_hours.last_before(time_from_epoch)
+        if last_generated is not None:
+            times_since_last_hour = time_from_epoch - last_generated
+            # FIXME: Check if this is off by one
+            if times_since_last_hour <= self._time_generated:
+                # Close enough to continue on from the last generated hour
+                return last_generated + 1, times_since_last_hour + self._time_generated
+        return time_from_epoch - self._time_generated, self._time_generated * 2
+
+    @_synchronized
     def get_time(self, time_from_epoch: int) -> Hour:
         """
         Get a given datetime. If the date is not currently in the calendar, it will be generated.
@@ -192,104 +1185,490 @@ class DnDCalendar:
         """
         # If the hour isn't in the list, generate it and some time before it
         if time_from_epoch not in self.history:
-            # find the smallest hour
-            win = GeneratingPopupWindow()
-            generated_hours = np.sort(np.array(list(self.history.keys())))
-            hours_before = generated_hours[np.where(generated_hours < time_from_epoch)[0]]
-            if hours_before.shape[0] == 0:  # There are no hours before time_from_epoch generated
-                start_time_from_epoch = time_from_epoch - self._time_generated
-                self._add_hours(start_time_from_epoch, num_hours=self._time_generated * 2,
-                                weather_generator=self.weather_generator)
-            else:  # There are hours, check if they are at most time_generated in the past
-                times_since_last_hour = time_from_epoch - int(hours_before[-1])
-                # FIXME: Check if this is off by one
-                if times_since_last_hour <= self._time_generated:
-                    start_time_from_epoch = int(hours_before[-1]) + 1
-                    hours_added = times_since_last_hour + self._time_generated
-                    self._add_hours(start_time_from_epoch, num_hours=hours_added,
-                                    weather_generator=self.weather_generator)
-                else:
-                    start_time_from_epoch = time_from_epoch - self._time_generated
-                    self._add_hours(start_time_from_epoch, num_hours=self._time_generated * 2,
-                                    weather_generator=self.weather_generator)
+            win = GeneratingPopupWindow() if self.show_generating_popup else None
+            start_time_from_epoch, num_hours = self._plan_generation(time_from_epoch)
+            self._add_hours(start_time_from_epoch, num_hours=num_hours, weather_generator=self.weather_generator)
             del win
+        if time_from_epoch in self._stale_hours:
+            self._refresh(time_from_epoch - self._time_generated, time_from_epoch + self._time_generated)
         return self.history[time_from_epoch]
 
+    @_synchronized
+    def get_range(self, start_time_from_epoch: int, end_time_from_epoch: int, calendar_name: str,
+                  unicode: bool = False) -> HourRange:
+        """
+        Gets consecutive hours at once for drawing them. Missing hours are generated a gap at a time, the weather is
+        read as a single block, the dates are worked out once per day, and the events are looked up once for the range.
+        :param start_time_from_epoch: The first hour
+        :param end_time_from_epoch: The hour after the last one
+        :param calendar_name: What calendar the dates are in
+        :param unicode: Use unicode warning symbols
+        :return: HourRange
+        """
+        gaps = self._generated_hours.gaps(start_time_from_epoch, end_time_from_epoch)
+        if len(gaps) > 0:
+            win = GeneratingPopupWindow() if self.show_generating_popup else None
+            for gap_start, gap_end in gaps:
+                self._add_hours(gap_start, gap_end - gap_start, weather_generator=self.weather_generator)
+            del win
+        self._refresh(start_time_from_epoch, end_time_from_epoch)
+        num_hours = end_time_from_epoch - start_time_from_epoch
+        weather = self.history.read_block(start_time_from_epoch, end_time_from_epoch)
+        # Days start at midnight, so the date only has to be worked out for the first hour of each day
+        dates = []
+        hours = np.zeros(num_hours, dtype=np.int64)
+        t = start_time_from_epoch
+        while t < end_time_from_epoch:
+            day_end = min((t // 24 + 1) * 24, end_time_from_epoch)
+            date_info = self.reckoningHandler.epoch_to_date(t, calendar_name)
+            dates.extend([date_info.date_string(short=True)] * (day_end - t))
+            hours[t - start_time_from_epoch:day_end - start_time_from_epoch] = np.arange(date_info.hour,
+                                                                                         date_info.hour + day_end - t)
+            t = day_end
+        events = [[] for _ in range(num_hours)]
+        for event in self.history.events.overlapping(start_time_from_epoch, end_time_from_epoch):
+            first = max(event.start_time_epoch, start_time_from_epoch)
+            last = min(event.start_time_epoch + max(event.duration, 1), end_time_from_epoch)
+            for t in range(first, last):
+                events[t - start_time_from_epoch].append(event)
+        return HourRange(start=start_time_from_epoch, weather=weather,
+                         warnings=block_warning_symbols(weather, unicode), dates=dates, hours=hours, events=events)
+
+    @_synchronized
     def add_event(self, event: Event) -> None:
         """
         Add a new event to the calendar
         :param event: The event object to add
         :return: None
         """
-        # check that date exists
-        self.get_time(event.start_time_epoch)
-        for hour in range(event.duration):
-            self.history[event.start_time_epoch + hour].events.append(event)
+        self._generate_event_hours(event)
+        self.history.add_event(event)
+        self.changes += 1
+        if self.journal is not None:
+            self.journal.record({'change': 'add_event', 'event': event.to_json()})
 
+    @_synchronized
     def remove_event(self, event: Event) -> None:
         """
         Remove an event from the calendar
         :param event: Event to be removed
         :return: None
         """
-        # Check that the time exists
-        self.get_time(event.start_time_epoch)
-        for hour in range(event.duration+1):
-            if event in self.history[event.start_time_epoch + hour].events:
-                self.history[event.start_time_epoch + hour].events.remove(event)
+        self.history.remove_event(event)
+        self.changes += 1
+        if self.journal is not None:
+            self.journal.record({'change': 'remove_event', 'id': event.id})
+
+    @_synchronized
+    def move_event(self, event: Event) -> None:
+        """
+        Updates an event after it was changed in place, such as by EventEditWindow
+        :param event: Event that was changed
+        :return: None
+        """
+        self._generate_event_hours(event)
+        self.history.move_event(event)
+        self.changes += 1
+        if self.journal is not None:
+            self.journal.record({'change': 'move_event', 'event': event.to_json()})
+
+    def search_events(self, query: str) -> List[Event]:
+        """
+        Finds the events whose location or description has every word of the query. Words match by prefix and
+        regardless of case.
+        :param query: Words to look for
+        :return: List of events, ordered by start time
+        """
+        return self.history.events.search(query)
+
+    def location_at(self, time_from_epoch: int) -> Optional[str]:
+        """
+        Finds where the party was at a time, going by the location of the latest event that started at or before it
+        :param time_from_epoch: The time
+        :return: Name of the location, or None if there are no events with a location before the time
+        """
+        return self.history.events.locations.location_at(time_from_epoch)
+
+    def location_visits(self, location: str) -> List[Tuple[int, Optional[int]]]:
+        """
+        Finds every visit of the party to a location
+        :param location: Name of the location
+        :return: List of (arrival, departure) times, ordered by arrival. The departure is None for the current location.
+        """
+        return self.history.events.locations.visits(location)
+
+    def location_dwell_times(self, until: int = None) -> Dict[str, int]:
+        """
+        Totals the hours the party has spent at each location
+        :param until: If given, the stay at the current location counts up to this time. Otherwise it isn't counted.
+        :return: Hours by location name
+        """
+        return self.history.events.locations.dwell_times(until)
+
+    @_synchronized
+    def pregenerate(self, start_time_from_epoch: int, end_time_from_epoch: int, max_hours: int,
+                    from_end: bool = False) -> int:
+        """
+        Generates some of the missing hours in a range, or once none are missing, regenerates some of the stale ones.
+        Meant to be called repeatedly from a background thread, so that the lock is only held for a little while at a
+        time.
+        :param start_time_from_epoch: The first hour of the range
+        :param end_time_from_epoch: The hour after the last one
+        :param max_hours: Most hours to generate in one call
+        :param from_end: Whether to generate the hours closest to the end of the range first. Only seeded weather can
+                         be generated backwards without breaks, so without a seed each gap is still filled from its
+                         start.
+        :return: Number of hours generated. 0 if there are no missing or stale hours in the range.
+        """
+        gaps = self._generated_hours.gaps(start_time_from_epoch, end_time_from_epoch)
+        stale = len(gaps) == 0
+        if stale:
+            gaps = self._stale_hours.overlapping(start_time_from_epoch, end_time_from_epoch)
+        if len(gaps) == 0:
+            return 0
+        if from_end and self.seed is not None:
+            gap_start, gap_end = gaps[-1]
+            first = max(gap_start, gap_end - max_hours)
+        else:
+            gap_start, gap_end = gaps[0]
+            first = self._stale_hours.find(gap_start)[0] if stale and self.seed is None else gap_start
+        num_hours = min(gap_end - first, max_hours)
+        # Pregenerated hours aren't journaled, as the weather of a year could take megabytes. The journal is told
+        # instead, so the next save writes them into the campaign file along with everything else.
+        if stale:
+            self._regenerate_weather(first, first + num_hours, journaled=False)
+        else:
+            self._add_hours(first, num_hours, self.weather_generator, journaled=False)
+        return num_hours
+
+    def _generate_event_hours(self, event: Event) -> None:
+        """
+        Makes sure every hour an event is on has been generated
+        :param event: The event
+        :return: None
+        """
+        end = event.start_time_epoch + max(event.duration, 1)
+        gaps = self._generated_hours.gaps(event.start_time_epoch, end)
+        while len(gaps) > 0:
+            self.get_time(gaps[0][0])
+            gaps = self._generated_hours.gaps(gaps[0][0], end)
+
+    @_synchronized
+    def regenerate_weather(self, starting_time: int, end_time: int = None) -> None:
+        """
+        Regenerates the weather of the generated hours in a range right away
+        :param starting_time: Time from epoch of the first hour
+        :param end_time: The hour after the last one, or None to regenerate everything from the starting time onwards
+        :return: None
+        """
+        self._regenerate_weather(starting_time, end_time)
+        self.changes += 1
+
+    def _regenerate_weather(self, starting_time: int, end_time: Optional[int], journaled: bool = True) -> None:
+        """
+        Regenerates the weather of the generated hours in a range, see regenerate_weather
+        :param starting_time: Time from epoch of the first hour
+        :param end_time: The hour after the last one, or None to regenerate everything from the starting time onwards
+        :param journaled: Whether to record the regeneration in the journal. If not, the journal is told it's missing
+                          weather, and the next save writes the whole campaign file. Seeded regenerations needn't be
+                          journaled, as the change that made the hours stale is replayed and marks them stale again.
+        :return: None
+        """
+        if end_time is None:
+            end_time = self._generated_hours.end
+        self.weather_generator = WeatherGenerator(seed=self.seed)
+        change = {'change': 'regenerate', 'start': starting_time, 'end': end_time}
+        if self.seed is None:
+            change['runs'] = []
+        for run_start, run_end in self._generated_hours.overlapping(starting_time, end_time):
+            self._restore_saved_checkpoints(run_start - 1, run_end)
+            for t in range(run_start, run_end):
+                self._checkpoints.pop(t, None)
+            if self.seed is not None:
+                block, checkpoints = self.compute_weather(run_start, run_end - run_start)
+                self._checkpoints.update(checkpoints)
+                self.history.write_block(run_start, block)
+                continue
+            self._simulate(run_start, run_end - run_start, self.weather_generator)
+            if self.journal is not None and journaled:
+                change['runs'].append(self._weather_change(run_start, run_end - run_start))
+        self._stale_hours.remove(starting_time, end_time)
+        if self.journal is not None:
+            if journaled:
+                self.journal.record(change)
+            elif self.seed is None:
+                self.journal.missing_weather = True
 
-    def regenerate_weather(self, starting_time: int) -> None:
+    def _affected_end(self, end_time: Optional[int]) -> int:
+        """
+        Finds how far a change of the settings up to a time changes the weather
+        :param end_time: The hour after the last changed one, or None if the change goes on indefinitely
+        :return: The hour after the last one whose weather may change
         """
-        Regenerates weather from the starting time onwards
-        :param starting_time: Time from epoch
+        if end_time is None:
+            return max(self._generated_hours.end, 0)
+        if self.seed is not None:
+            # Seeded weather depends on the settings of a few days before it
+            return self.weather_generator.settled_hour(end_time)
+        # The hours after the change replay from the checkpoint at the start of their day, which is regenerated too
+        return -(-end_time // 24) * 24
+
+    def _mark_stale(self, start_time_from_epoch: int, end_time_from_epoch: int) -> None:
+        """
+        Marks the generated hours in a range to be regenerated when they're next read
+        :param start_time_from_epoch: The first hour
+        :param end_time_from_epoch: The hour after the last one
         :return: None
         """
-        date_info = self.reckoningHandler.epoch_to_date(starting_time, 'kitsune')
-        hour = date_info.hour
-        season = self.reckoningHandler.get_season(starting_time)
-        self.weather_generator = WeatherGenerator()
-        self.weather_generator.initialize(season, self.climate, self.elevation, hour)
-        generated_times = np.array(list(self.history.keys()))
-        hours_to_generate = generated_times[np.where(generated_times >= starting_time)]
-        previous_hour = int(hours_to_generate[0]-2)
-        for t in hours_to_generate:
-            if previous_hour is None:
-                previous_hour = int(t-2)
-            if previous_hour < t-1:
-                hour = self.reckoningHandler.epoch_to_date(int(t), 'human').hour
-                season = self.reckoningHandler.get_season(starting_time)
-                self.weather_generator.initialize(season, self.climate, self.elevation, hour)
-            self.history[int(t)].weather = self.weather_generator.get_weather()
-            self.history[int(t)].generator_state = self.weather_generator.get_state()
-            self.weather_generator.advance_hour()
-            previous_hour = t
+        for run_start, run_end in self._generated_hours.overlapping(start_time_from_epoch, end_time_from_epoch):
+            self._stale_hours.add(run_start, run_end)
 
+    def _refresh(self, start_time_from_epoch: int, end_time_from_epoch: int) -> None:
+        """
+        Regenerates the stale hours in a range. Seeded hours are regenerated on their own. Without a seed the weather
+        has to carry on from the hour before, so the stale hours are regenerated from the start of their stale run.
+        :param start_time_from_epoch: The first hour
+        :param end_time_from_epoch: The hour after the last one
+        :return: None
+        """
+        for stale_start, stale_end in self._stale_hours.overlapping(start_time_from_epoch, end_time_from_epoch):
+            if self.seed is None:
+                stale_start = self._stale_hours.find(stale_start)[0]
+            self._regenerate_weather(stale_start, stale_end)
 
+    @_synchronized
     def change_climate(self, new_climate_start_time: int, new_climate: str) -> None:
         """
-        Change climate starting from new_climate_start_time. This will go through times already generated from this
-        point onwards and re-generates the weather for each of them to match the climate.
+        Change the climate from new_climate_start_time up until the next change in the climate timeline. The weather
+        of the generated hours in that segment, and of the few hours after it whose weather depends on it, is
+        regenerated when it's next read.
         :param new_climate_start_time: time from epoch when the new climate starts
         :param new_climate: What climate to set to
         :return:
         """
         # check that the climate is real
         if new_climate in self.get_climates():
-            self.climate = new_climate
-            self.regenerate_weather(starting_time=new_climate_start_time)
+            end_time = self.climate_timeline.set(new_climate_start_time, climate=new_climate)
+            self._mark_stale(new_climate_start_time, self._affected_end(end_time))
+            self._record_region(new_climate_start_time, end_time, new_climate, None)
             print(f"Changed climate to {new_climate}")
 
+    @_synchronized
     def change_elevation(self, new_elevation_start_time: int, new_elevation: int) -> None:
         """
-        Change current elevation from the starting time to new elevation.
+        Change the elevation from the starting time up until the next change in the climate timeline. The weather is
+        regenerated like with change_climate.
         :param new_elevation_start_time:
         :param new_elevation:
         :return:
         """
-        self.elevation = new_elevation
-        self.regenerate_weather(starting_time=new_elevation_start_time)
+        end_time = self.climate_timeline.set(new_elevation_start_time, elevation=new_elevation)
+        self._mark_stale(new_elevation_start_time, self._affected_end(end_time))
+        self._record_region(new_elevation_start_time, end_time, None, new_elevation)
         print(f"Changed elevation to {new_elevation}")
 
+    @_synchronized
+    def change_region(self, start_time_from_epoch: int, end_time_from_epoch: int, climate: str = None,
+                      elevation: int = None) -> None:
+        """
+        Changes the climate and/or elevation of a range, such as the time the party spent in a region. The settings
+        after the range stay as they were, so only the weather of the range and of the few hours after it whose
+        weather depends on it is regenerated, when it's next read.
+        :param start_time_from_epoch: The first hour to change
+        :param end_time_from_epoch: The hour after the last one to change
+        :param climate: New climate, or None to keep the climate
+        :param elevation: New elevation, or None to keep the elevation
+        :return: None
+        :raises UnknownClimateException: If the climate isn't one of get_climates()
+        """
+        if climate is not None and climate not in self.get_climates():
+            raise UnknownClimateException(climate)
+        self.climate_timeline.set_range(start_time_from_epoch, end_time_from_epoch, climate, elevation)
+        self._mark_stale(start_time_from_epoch, self._affected_end(end_time_from_epoch))
+        self._record_region(start_time_from_epoch, end_time_from_epoch, climate, elevation)
+
+    def _record_region(self, start_time_from_epoch: int, end_time_from_epoch: Optional[int], climate: Optional[str],
+                       elevation: Optional[int]) -> None:
+        """
+        Records a change of the climate timeline in the journal, as a change_region of the range that was changed
+        :param start_time_from_epoch: The first hour changed
+        :param end_time_from_epoch: The hour after the last one changed, or None if everything after the start was
+        :param climate: New climate, or None if it wasn't changed
+        :param elevation: New elevation, or None if it wasn't changed
+        :return: None
+        """
+        self.changes += 1
+        if self.journal is not None:
+            self.journal.record({'change': 'region', 'start': start_time_from_epoch, 'end': end_time_from_epoch,
+                                 'climate': climate, 'elevation': elevation})
+
+    @_synchronized
+    def apply_change(self, change: dict) -> None:
+        """
+        Makes a change recorded in the journal again, such as when the journal of a campaign file is replayed. Applying
+        the changes in the order they were recorded to the calendar they were recorded on gives the same calendar.
+        :param change: The change, with its kind in 'change'
+        :return: None
+        :raises ValueError: If the kind of the change isn't known
+        """
+        kind = change['change']
+        if kind == 'add_event':
+            self.add_event(Event.from_json(change['event']))
+        elif kind == 'remove_event':
+            event = self.history.events.get(change['id'])
+            if event is not None:
+                self.remove_event(event)
+        elif kind == 'move_event':
+            updated = Event.from_json(change['event'])
+            event = self.history.events.get(updated.id)
+            if event is None:
+                self.add_event(updated)
+            else:
+                vars(event).update(vars(updated))
+                self.move_event(event)
+        elif kind == 'region':
+            self.change_region(change['start'], change['end'], change['climate'], change['elevation'])
+        elif kind == 'generate':
+            if 'weather' in change:
+                self._write_weather(change['start'], block_from_json(change['weather'], change['hours']),
+                                    checkpoints_from_json(change['checkpoints']))
+            else:
+                self._add_hours(change['start'], change['hours'], self.weather_generator)
+        elif kind == 'regenerate':
+            if 'runs' in change:
+                for run in change['runs']:
+                    self._write_weather(run['start'], block_from_json(run['weather'], run['hours']),
+                                        checkpoints_from_json(run['checkpoints']))
+                self._stale_hours.remove(change['start'], change['end'])
+            else:
+                self.regenerate_weather(change['start'], change['end'])
+        else:
+            raise ValueError(f"Unknown change {kind}")
+
+
+def _upgrade_save_v1(json_obj):
+    """
+    Upgrades a version 1 save to version 2. The oldest saves stored a generator state on every hour instead of
+    checkpoints. Only the states at the places where checkpoints would be are kept. The random numbers of those days
+    can't be recovered, so generation continuing from them rolls new ones.
+    :param json_obj: Version 1 save
+    :return: Version 2 save
+    """
+    json_obj = dict(json_obj)
+    json_obj.setdefault('seed', None)
+    if 'checkpoints' not in json_obj:
+        history_json = json_obj['history']
+        times = {int(key) for key in history_json.keys()}
+        checkpoints = {}
+        for key, val in history_json.items():
+            t = int(key)
+            if 'generator_state' in val and (t % 24 == 0 or t - 1 not in times or t + 1 not in times):
+                # Every hour of a run used to share the same state object, so the time in it can't be trusted
+                state = dict(val['generator_state'], hour=t % 24, day=t // 24)
+                checkpoints[t] = {'state': state, 'roll_key': None}
+        json_obj['checkpoints'] = checkpoints
+    json_obj['version'] = 2
+    return json_obj
+
+
+def _upgrade_save_v2(json_obj):
+    """
+    Upgrades a version 2 save to version 3. Version 2 saves had the whole event on every hour it's on, version 3 saves
+    have an event table with each event once. The events left in the hours are ignored when loading.
+    :param json_obj: Version 2 save
+    :return: Version 3 save
+    """
+    json_obj = dict(json_obj)
+    if 'events' in json_obj:
+        json_obj['version'] = 3
+        return json_obj  # Made while the history was streamed in
+    events = {}
+    event_hours = {}
+    for key, val in json_obj['history'].items():
+        for event in val.get('events', ()):
+            if 'id' not in event:
+                event = dict(event, id=str(uuid.uuid4()))
+            events.setdefault(event['id'], event)
+            event_hours.setdefault(event['id'], []).append(int(key))
+    json_obj['events'] = {event_id: {'event': event, 'hours': _intervals_to_json(event_hours[event_id])}
+                          for event_id, event in events.items()}
+    json_obj['version'] = 3
+    return json_obj
+
+
+def _upgrade_save_v3(json_obj):
+    """
+    Upgrades a version 3 save to version 4. Version 3 event tables had the hours of each event next to it, version 4
+    event tables only have the events, which are on the hours their start time and duration say.
+    :param json_obj: Version 3 save
+    :return: Version 4 save
+    """
+    json_obj = dict(json_obj)
+    json_obj['events'] = {event_id: entry['event'] for event_id, entry in json_obj['events'].items()}
+    json_obj['version'] = 4
+    return json_obj
+
+
+def _upgrade_save_v4(json_obj):
+    """
+    Upgrades a version 4 save to version 5. Version 4 saves only had the latest climate and elevation, version 5 saves
+    have a climate timeline. The timeline is rebuilt from the settings of the checkpoints, with the latest settings
+    after the last generated hour. Older versions computed the seeded weather after a change as if the new settings had
+    always been there, so the days around every change are marked stale to be computed the way they are now.
+    :param json_obj: Version 4 save
+    :return: Version 5 save
+    """
+    json_obj = dict(json_obj)
+    latest = (json_obj['climate'], json_obj['elevation'])
+    checkpoints = sorted((int(key), val['state']) for key, val in json_obj['checkpoints'].items())
+    settings = [(t, (state.get('climate', latest[0]), state.get('elevation', latest[1]))) for t, state in checkpoints]
+    initial = current = settings[0][1] if len(settings) > 0 else latest
+    segments = []
+    changes = []
+    for t, setting in settings:
+        if setting != current:
+            segments.append([t, *setting])
+            changes.append(t)
+            current = setting
+    if 'history_end' in json_obj:
+        history_end = json_obj.pop('history_end')  # The history was streamed in
+    else:
+        history_end = max((int(key) + 1 for key in json_obj['history']), default=None)
+    if history_end is not None and current != latest:
+        segments.append([history_end, *latest])
+    stale = IntervalSet()
+    if json_obj.get('seed') is not None:
+        generator = WeatherGenerator(seed=json_obj['seed'])
+        for t in changes:
+            stale.add(t - t % 24, generator.settled_hour(t + 24))
+    json_obj['climate_timeline'] = {'initial': list(initial), 'segments': segments}
+    json_obj['stale'] = [[start, end] for start, end in stale]
+    del json_obj['climate']
+    del json_obj['elevation']
+    json_obj['version'] = 5
+    return json_obj
+
+
+def _upgrade_save_v5(json_obj):
+    """
+    Upgrades a version 5 save to version 6. Version 5 saves had the climate timeline as a list of segments, version 6
+    saves have it in columns, see ClimateTimeline.to_json.
+    :param json_obj: Version 5 save
+    :return: Version 6 save
+    """
+    json_obj = dict(json_obj)
+    timeline = ClimateTimeline(*json_obj['climate_timeline']['initial'])
+    for start, climate, elevation in json_obj['climate_timeline']['segments']:
+        timeline.set(int(start), climate, int(elevation))
+    json_obj['climate_timeline'] = timeline.to_json()
+    json_obj['version'] = 6
+    return json_obj
+
+
+# Functions upgrading a save from the version they're keyed by to the next one
+_SAVE_UPGRADES = {1: _upgrade_save_v1, 2: _upgrade_save_v2, 3: _upgrade_save_v3, 4: _upgrade_save_v4,
+                  5: _upgrade_save_v5}
+
 
 if __name__ == "__main__":
     cal = DnDCalendar()
@@ -307,4 +1686,4 @@ if __name__ == "__main__":
         h = cal.get_time(t - 24 + d)
         date_str = rh.epoch_to_date(t - 24 + d, 'human').datetime_string()
         print(
-            f"{date_str} {h.weather.warning_symbols(unicode=True)} {h.weather.get_temperature_str()} {h.weather.wind_direction_symb()}{h.weather.wind_speed_str():>6} {h.weather.wind_strength:>10} {h.weather.cloud_cover_formatted()} {h.weather.get_precipitation_formatted()}")
+            f"{date_str} {h.weather.warning_symbols(unicode=True)} {h.weather.get_temperature_str()} {h.weather.wind_direction_symb()}{h.weather.wind_speed_str():>6} {h.weather.wind_strength_str():>10} {h.weather.cloud_cover_formatted()} {h.weather.get_precipitation_formatted()}")
@@ -0,0 +1,160 @@
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from locationtimeline import LocationTimeline
+from textindex import TextIndex
+
+if TYPE_CHECKING:
+    from dndcalendar import Event
+
+
+class EventIndex:
+    def __init__(self):
+        """
+        Index of events by the hours they're on, [start_time_epoch, start_time_epoch + duration). Events are grouped by
+        the bit length of their duration, so no event in a group is more than twice as long as the shortest one it
+        could have. Each group is kept sorted by start time. Finding the events overlapping a range takes one bisect per
+        group, and only looks at events that start less than the longest duration of their group before the range.
+        Events are found by their id, so an event whose time was changed in place can still be moved or removed. The
+        locations and descriptions of the events are kept in a TextIndex for searching, and the locations also make up
+        the LocationTimeline of where the party was.
+        """
+        self._events: Dict[str, "Event"] = {}
+        self._spans: Dict[str, Tuple[int, int]] = {}  # The (start, duration) each event is indexed under
+        self._groups: Dict[int, List[Tuple[int, str]]] = {}  # Sorted (start, id) by duration bit length
+        self._text = TextIndex()  # Event ids by the words of their location and description
+        self.locations = LocationTimeline()  # Where the party was, from the start times and locations of the events
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __iter__(self) -> Iterator["Event"]:
+        """
+        Iterates over every event, ordered by start time
+        """
+        return iter(sorted(self._events.values(), key=lambda e: (self._spans[e.id][0], e.id)))
+
+    def __contains__(self, event: "Event") -> bool:
+        return event.id in self._events
+
+    def get(self, event_id: str) -> Optional["Event"]:
+        """
+        Finds an event by its id
+        :param event_id: Id of the event
+        :return: The event, or None if it's not in the index
+        """
+        return self._events.get(event_id)
+
+    def add(self, event: "Event") -> None:
+        """
+        Adds an event. If it's already in the index, it's moved to its current time instead.
+        :param event: Event to add
+        :return: None
+        """
+        if event.id in self._events:
+            self.move(event)
+            return
+        start, duration = event.start_time_epoch, max(event.duration, 1)
+        self._events[event.id] = event
+        self._spans[event.id] = (start, duration)
+        insort(self._groups.setdefault(duration.bit_length(), []), (start, event.id))
+        self._text.add(event.id, f"{event.location} {event.description}")
+        if event.location.strip() != "":
+            self.locations.add(event.id, start, event.location.strip())
+
+    def remove(self, event: "Event") -> None:
+        """
+        Removes an event if it's in the index. The event is removed from where it was indexed, even if its time has
+        been changed since.
+        :param event: Event to remove
+        :return: None
+        """
+        span = self._spans.pop(event.id, None)
+        if span is None:
+            return
+        del self._events[event.id]
+        self._text.remove(event.id)
+        self.locations.remove(event.id)
+        start, duration = span
+        group = self._groups[duration.bit_length()]
+        del group[bisect_left(group, (start, event.id))]
+        if len(group) == 0:
+            del self._groups[duration.bit_length()]
+
+    def move(self, event: "Event") -> None:
+        """
+        Updates the place of an event after its start time, duration, location or description was changed
+        :param event: Event that was changed
+        :return: None
+        """
+        self.remove(event)
+        self.add(event)
+
+    def overlapping(self, start: int, end: int) -> List["Event"]:
+        """
+        Finds the events on any of the hours in [start, end)
+        :param start: First hour
+        :param end: The hour after the last one
+        :return: List of events, ordered by start time
+        """
+        found = []
+        for bit_length, group in self._groups.items():
+            longest = (1 << bit_length) - 1
+            first = bisect_left(group, (start - longest + 1,))
+            last = bisect_left(group, (end,))
+            for event_start, event_id in group[first:last]:
+                if event_start + self._spans[event_id][1] > start:
+                    found.append((event_start, event_id))
+        if len(self._groups) > 1:
+            found.sort()
+        return [self._events[event_id] for _, event_id in found]
+
+    def search(self, query: str) -> List["Event"]:
+        """
+        Finds the events whose location or description has every word of the query. Words match by prefix and
+        regardless of case.
+        :param query: Words to look for
+        :return: List of events, ordered by start time
+        """
+        found = sorted((self._spans[event_id][0], event_id) for event_id in self._text.search(query))
+        return [self._events[event_id] for _, event_id in found]
+
+    def at(self, time_from_epoch: int) -> List["Event"]:
+        """
+        Finds the events on an hour
+        :param time_from_epoch: The hour
+        :return: List of events, ordered by start time
+        """
+        return self.overlapping(time_from_epoch, time_from_epoch + 1)
+
+
+class EventView(Sequence):
+    def __init__(self, index: EventIndex, start: int, end: int):
+        """
+        Read-only list of the events on the hours [start, end). It's looked up from the index every time it's read, so
+        it always reflects the events currently in the index.
+        :param index: Index to look the events up from
+        :param start: First hour
+        :param end: The hour after the last one
+        """
+        self._index = index
+        self._start = start
+        self._end = end
+
+    def __getitem__(self, item):
+        return self._index.overlapping(self._start, self._end)[item]
+
+    def __len__(self) -> int:
+        return len(self._index.overlapping(self._start, self._end))
+
+    def __iter__(self) -> Iterator["Event"]:
+        return iter(self._index.overlapping(self._start, self._end))
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
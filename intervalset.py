@@ -0,0 +1,189 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+
+class IntervalSet:
+    def __init__(self, intervals=None):
+        """
+        Sorted set of disjoint, half-open integer intervals [start, end). Touching or overlapping intervals are merged
+        when added, so lookups only ever need a single bisect over the interval starts.
+        :param intervals: Optional iterable of (start, end) tuples to start with
+        """
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        if intervals is not None:
+            for start, end in intervals:
+                self.add(start, end)
+
+    @staticmethod
+    def from_points(points) -> "IntervalSet":
+        """
+        Builds an interval set out of individual integer points, merging consecutive points into runs
+        :param points: Iterable of integers
+        :return: IntervalSet
+        """
+        result = IntervalSet()
+        run_start = None
+        previous = None
+        for point in sorted(int(p) for p in points):
+            if run_start is None:
+                run_start = point
+            elif point != previous + 1:
+                result._starts.append(run_start)
+                result._ends.append(previous + 1)
+                run_start = point
+            previous = point
+        if run_start is not None:
+            result._starts.append(run_start)
+            result._ends.append(previous + 1)
+        return result
+
+    def copy(self) -> "IntervalSet":
+        """
+        Copies the set without merging its intervals again
+        :return: IntervalSet
+        """
+        result = IntervalSet()
+        result._starts = list(self._starts)
+        result._ends = list(self._ends)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(zip(self._starts, self._ends))
+
+    def __contains__(self, point: int) -> bool:
+        return self.find(point) is not None
+
+    @property
+    def total_length(self) -> int:
+        """
+        Number of integer points covered by the set
+        :return: int
+        """
+        return sum(end - start for start, end in self)
+
+    @property
+    def end(self) -> int:
+        """
+        End of the last interval in the set (exclusive). For an empty set this is the smallest possible value.
+        :return: int
+        """
+        if len(self._ends) == 0:
+            return -2**63
+        return self._ends[-1]
+
+    def find(self, point: int) -> Optional[Tuple[int, int]]:
+        """
+        Finds the interval containing a point
+        :param point: Point to look for
+        :return: (start, end) of the containing interval, or None if the point is not covered
+        """
+        i = bisect_right(self._starts, point) - 1
+        if i >= 0 and point < self._ends[i]:
+            return self._starts[i], self._ends[i]
+        return None
+
+    def last_before(self, point: int) -> Optional[int]:
+        """
+        Finds the largest covered point that is strictly smaller than the given point
+        :param point: Point to look from
+        :return: The covered point, or None if nothing before the point is covered
+        """
+        i = bisect_left(self._starts, point) - 1
+        if i < 0:
+            return None
+        return min(self._ends[i], point) - 1
+
+    def first_from(self, point: int) -> Optional[int]:
+        """
+        Finds the smallest covered point that is larger than or equal to the given point
+        :param point: Point to look from
+        :return: The covered point, or None if nothing at or after the point is covered
+        """
+        i = bisect_right(self._starts, point) - 1
+        if i >= 0 and point < self._ends[i]:
+            return point
+        if i + 1 < len(self._starts):
+            return self._starts[i + 1]
+        return None
+
+    def overlapping(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """
+        Returns the covered parts of [start, end), clipped to the range
+        :param start: Start of the range (inclusive)
+        :param end: End of the range (exclusive)
+        :return: List of (start, end) tuples in ascending order
+        """
+        result = []
+        i = max(bisect_right(self._starts, start) - 1, 0)
+        while i < len(self._starts) and self._starts[i] < end:
+            if self._ends[i] > start:
+                result.append((max(self._starts[i], start), min(self._ends[i], end)))
+            i += 1
+        return result
+
+    def gaps(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """
+        Returns the uncovered parts of [start, end)
+        :param start: Start of the range (inclusive)
+        :param end: End of the range (exclusive)
+        :return: List of (start, end) tuples in ascending order
+        """
+        result = []
+        cursor = start
+        for covered_start, covered_end in self.overlapping(start, end):
+            if covered_start > cursor:
+                result.append((cursor, covered_start))
+            cursor = covered_end
+        if cursor < end:
+            result.append((cursor, end))
+        return result
+
+    def add(self, start: int, end: int) -> None:
+        """
+        Adds [start, end) to the set, merging it with any interval it overlaps or touches
+        :param start: Start of the interval (inclusive)
+        :param end: End of the interval (exclusive)
+        :return: None
+        """
+        start = int(start)
+        end = int(end)
+        if end <= start:
+            return
+        # Every interval whose end is >= start and whose start is <= end gets merged
+        lo = bisect_left(self._ends, start)
+        hi = bisect_right(self._starts, end)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def remove(self, start: int, end: int) -> None:
+        """
+        Removes [start, end) from the set, splitting intervals as needed
+        :param start: Start of the range (inclusive)
+        :param end: End of the range (exclusive)
+        :return: None
+        """
+        start = int(start)
+        end = int(end)
+        if end <= start:
+            return
+        lo = bisect_right(self._ends, start)
+        hi = bisect_left(self._starts, end)
+        if lo >= hi:
+            return
+        new_starts = []
+        new_ends = []
+        if self._starts[lo] < start:
+            new_starts.append(self._starts[lo])
+            new_ends.append(start)
+        if self._ends[hi - 1] > end:
+            new_starts.append(end)
+            new_ends.append(self._ends[hi - 1])
+        self._starts[lo:hi] = new_starts
+        self._ends[lo:hi] = new_ends
@@ -0,0 +1,303 @@
+import codecs
+import json
+import os
+import re
+import uuid
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dndcalendar import DnDCalendar, HistoryStore
+from intervalset import IntervalSet
+
+IMPORT_READ_BYTES = 2**20  # Bytes read from the save at a time
+IMPORT_BATCH_HOURS = 4096  # Hours decoded into the weather columns at a time
+# Where a member of an object keyed by integers, such as the history, may end and the next one start. This can't be
+# inside a string, where the quote would be escaped, but it can be inside an object keyed by integers in a member, or
+# past the end of the object.
+_MEMBER_END = re.compile(r'}\s*,\s*"-?\d+"\s*:')
+
+
+class _JsonReader:
+    def __init__(self, f: BinaryIO, progress: Optional[Callable[[int], None]] = None):
+        """
+        Parses a JSON document a piece at a time. Objects can be walked member by member with members(), and any value
+        can be decoded whole with value(). Only the part of the document that hasn't been parsed yet is kept in memory,
+        so a large object can be read without decoding all of it at once.
+        :param f: File open for binary reading
+        :param progress: Called with the number of bytes read so far whenever more is read
+        """
+        self._file = f
+        self._progress = progress
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._text = ""
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+
+    def _read(self, min_bytes: int = IMPORT_READ_BYTES) -> bool:
+        """
+        Reads more of the file, dropping the text that has been parsed
+        :param min_bytes: Bytes to read at least
+        :return: False if the whole file had already been read
+        """
+        if self._eof:
+            return False
+        data = self._file.read(max(min_bytes, IMPORT_READ_BYTES))
+        self._eof = len(data) == 0
+        self.bytes_read += len(data)
+        self._text = self._text[self._pos:] + self._decoder.decode(data, final=self._eof)
+        self._pos = 0
+        if self._progress is not None:
+            self._progress(self.bytes_read)
+        return True
+
+    def peek(self) -> str:
+        """
+        Skips whitespace
+        :return: The next character, or an empty string at the end of the document
+        """
+        while True:
+            while self._pos < len(self._text) and self._text[self._pos] in " \t\n\r":
+                self._pos += 1
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._read():
+                return ""
+
+    def expect(self, characters: str) -> str:
+        """
+        Reads one of the given characters
+        :param characters: Characters that may come next
+        :return: The character read
+        :raises json.JSONDecodeError: If something else comes next
+        """
+        character = self.peek()
+        if character == "" or character not in characters:
+            raise json.JSONDecodeError(f"Expecting one of {characters!r}", self._text, self._pos)
+        self._pos += 1
+        return character
+
+    def value(self):
+        """
+        Decodes the next value whole
+        :return: The value
+        :raises json.JSONDecodeError: If the document isn't valid JSON
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError:
+                # The value may go on past what has been read. Reading as much again as is left keeps a long value
+                # from being parsed over and over.
+                if not self._read(len(self._text) - self._pos):
+                    raise
+                continue
+            if end == len(self._text) and self._read():
+                continue  # A number may go on past what has been read
+            self._pos = end
+            return value
+
+    def member_batches(self) -> Iterator[dict]:
+        """
+        Decodes the next object, keyed by integers and with objects as its values, a batch of members at a time. Each
+        batch has the members that have been read whole, and is decoded in one go. Only one batch is kept decoded at a
+        time.
+        :return: Iterator of dicts with the members of each batch
+        :raises json.JSONDecodeError: If the document isn't valid JSON
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            batch = self._decode_batch()
+            if batch is None:
+                key = self.value()
+                self.expect(":")
+                batch = {key: self.value()}
+            yield batch
+            if self.expect(",}") == "}":
+                return
+
+    def _decode_batch(self) -> Optional[dict]:
+        """
+        Decodes the members that have been read whole, up to the last place where one ends. A place inside a member or
+        past the end of the object can't be decoded as the end of an object. Those past the end come after all the
+        others, so the last place that can be decoded is searched for by bisection.
+        :return: Dict of the members, or None if there's no place where a member ends
+        """
+        if len(self._text) - self._pos < IMPORT_READ_BYTES // 2:
+            self._read()
+        ends = [match.start() for match in _MEMBER_END.finditer(self._text, self._pos, self._pos + IMPORT_READ_BYTES)]
+        found = None
+        low, high = 0, len(ends)
+        guess = high - 1  # Usually every place read is in the object
+        while low < high:
+            try:
+                found = (ends[guess], json.loads(f"{{{self._text[self._pos:ends[guess] + 1]}}}"))
+                low = guess + 1
+            except json.JSONDecodeError:
+                high = guess
+            guess = (low + high) // 2
+        if found is None:
+            return None
+        self._pos = found[0] + 1
+        return found[1]
+
+    def members(self) -> Iterator[str]:
+        """
+        Walks the members of the next object. The value of each member has to be read before the next key.
+        :return: Iterator of the keys
+        :raises json.JSONDecodeError: If the document isn't valid JSON
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+
+class _HistoryImporter:
+    def __init__(self):
+        """
+        Takes the hours of a save as they're parsed and writes their weather into a HistoryStore a batch at a time.
+        Older saves keep generator states and events on the hours, which the upgrades of the save need, so those are
+        picked up on the way.
+        """
+        self.store = HistoryStore()
+        self._hours = IntervalSet()
+        self._batch: List[Tuple[int, dict]] = []
+        # Version 1 saves have a generator state on every hour. The ones at the start of a day are kept, and the rest
+        # until both of the hours around them have been seen, as the ones at the edges of the runs are kept too.
+        self._states: Dict[int, dict] = {}
+        self._edge_states: Dict[int, dict] = {}
+        # Version 2 saves and older have the events on the hours
+        self._events: Dict[str, dict] = {}
+        self._event_hours: Dict[str, IntervalSet] = {}
+
+    def read(self, reader: _JsonReader) -> None:
+        """
+        Reads the hours of a save, an object of hour JSON by time from epoch
+        :param reader: Reader at the object
+        :return: None
+        """
+        for hours in reader.member_batches():
+            self._add(hours)
+        self._write_batch()
+
+    def _add(self, hours: Dict[str, dict]) -> None:
+        """
+        Takes a batch of hours
+        :param hours: Hour JSON by time from epoch
+        :return: None
+        """
+        times = [int(key) for key in hours.keys()]
+        for start, end in IntervalSet.from_points(times):
+            self._hours.add(start, end)
+        self._batch.extend(zip(times, hours.values()))
+        if len(self._batch) >= IMPORT_BATCH_HOURS:
+            self._write_batch()
+        for time_from_epoch, hour_json in zip(times, hours.values()):
+            if 'generator_state' in hour_json:
+                if time_from_epoch % 24 == 0:
+                    self._states[time_from_epoch] = hour_json['generator_state']
+                else:
+                    self._edge_states[time_from_epoch] = hour_json['generator_state']
+            for event in hour_json.get('events', ()):
+                if 'id' not in event:
+                    event = dict(event, id=str(uuid.uuid4()))
+                self._events.setdefault(event['id'], event)
+                self._event_hours.setdefault(event['id'], IntervalSet()).add(time_from_epoch, time_from_epoch + 1)
+        if len(self._edge_states) > 0:
+            for time_from_epoch in times:
+                for t in (time_from_epoch - 1, time_from_epoch, time_from_epoch + 1):
+                    if t in self._edge_states and t - 1 in self._hours and t + 1 in self._hours:
+                        del self._edge_states[t]
+
+    def _write_batch(self) -> None:
+        self.store.write_hours_json(self._batch)
+        self._batch = []
+
+    def finish(self, calendar_json: dict) -> dict:
+        """
+        Adds what the upgrades of an older save would take from its hours, see DnDCalendar.from_json
+        :param calendar_json: The save without its hours
+        :return: The save for DnDCalendar.from_json, with the history imported
+        """
+        calendar_json = dict(calendar_json, history={})
+        if 'checkpoints' not in calendar_json:
+            states = {**self._states, **self._edge_states}
+            # Every hour of a run used to share the same state object, so the time in it can't be trusted
+            calendar_json['checkpoints'] = {t: {'state': dict(state, hour=t % 24, day=t // 24), 'roll_key': None}
+                                            for t, state in sorted(states.items())}
+        if 'events' not in calendar_json:
+            calendar_json['events'] = {event_id: {'event': event,
+                                                  'hours': [[start, end] for start, end in self._event_hours[event_id]]}
+                                       for event_id, event in self._events.items()}
+        if calendar_json.get('version', 1) <= 4:
+            calendar_json['history_end'] = self._hours.end if len(self._hours) > 0 else None
+        return calendar_json
+
+
+def _read_member(reader: _JsonReader, key: str, target: dict, importer: _HistoryImporter) -> None:
+    if key == 'history':
+        importer.read(reader)
+        target[key] = {}
+    else:
+        target[key] = reader.value()
+
+
+def import_json_save(path: str, history_budget_bytes: int = None,
+                     progress: Callable[[int, int], None] = None) -> Tuple[DnDCalendar, Dict[str, object]]:
+    """
+    Loads a JSON save, of any version, without decoding the whole file at once. The hours are parsed one at a time
+    and their weather written straight into the history a batch at a time, so the memory needed is about that of the
+    loaded calendar instead of several times the size of the file.
+    :param path: Path of the save. Either a save of the menu, with the calendar under 'calendar', or a calendar alone.
+    :param history_budget_bytes: Memory the weather of the history may take, see DnDCalendar
+    :param progress: Called with the bytes read so far and the size of the file as the file is read
+    :return: The calendar and the rest of the save, such as the save name, cursor time and calendar used
+    :raises json.JSONDecodeError: If the file isn't valid JSON
+    :raises UnsupportedSaveVersionException: If the save is from a newer version than this one
+    """
+    total_bytes = os.path.getsize(path)
+    importer = _HistoryImporter()
+    save = {}
+    with open(path, 'rb') as f:
+        reader = _JsonReader(f, None if progress is None else lambda bytes_read: progress(bytes_read, total_bytes))
+        for key in reader.members():
+            if key == 'calendar':
+                calendar_json = {}
+                for calendar_key in reader.members():
+                    _read_member(reader, calendar_key, calendar_json, importer)
+                save[key] = calendar_json
+            else:
+                _read_member(reader, key, save, importer)
+    if 'calendar' in save:
+        calendar_json = save.pop('calendar')
+    else:
+        calendar_json, save = save, {}  # A calendar alone
+    calendar = DnDCalendar.from_json(importer.finish(calendar_json), history_budget_bytes=history_budget_bytes,
+                                     import_history=importer.store)
+    return calendar, save
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    # Loads a JSON save both ways and checks that they're the same: jsonimport.py save.json
+    start = time.perf_counter()
+    imported, info = import_json_save(sys.argv[1], progress=lambda done, total: print(
+        f"\r{done / max(total, 1):6.1%}", end="", flush=True))
+    print(f"\nImported {len(imported.history)} hours in {time.perf_counter() - start:.2f} s, {info}")
+    with open(sys.argv[1]) as f:
+        data = json.load(f)
+    loaded = DnDCalendar.from_json(data.get('calendar', data))
+    assert json.dumps(imported.to_json(), sort_keys=True) == json.dumps(loaded.to_json(), sort_keys=True)
+    print("Same calendar as with json.load")
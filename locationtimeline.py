@@ -0,0 +1,147 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class LocationTimeline:
+    def __init__(self):
+        """
+        Where the party was over time. Every entry is a point in time where the party was at a location, and the party
+        stays there until the next entry. Consecutive entries at the same location make up one visit. The entries are
+        kept sorted, so the location at any time is a single bisect, and the time spent at every location is kept up to
+        date as entries are added and removed.
+        """
+        self._entries: List[Tuple[int, Hashable]] = []  # Sorted (start, key)
+        self._locations: Dict[Hashable, str] = {}  # Location of each entry by key
+        self._starts: Dict[Hashable, int] = {}  # Start of each entry by key
+        self._by_location: Dict[str, List[Tuple[int, Hashable]]] = {}  # Sorted entries of each location
+        self._dwell: Dict[str, int] = {}  # Hours spent at each location, not counting the stay of the last entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._starts
+
+    def _duration(self, index: int) -> int:
+        """
+        Hours from an entry to the next one
+        :param index: Index of the entry
+        :return: Hours, or 0 for the last entry
+        """
+        if index + 1 >= len(self._entries):
+            return 0
+        return self._entries[index + 1][0] - self._entries[index][0]
+
+    def _location_of(self, index: int) -> str:
+        return self._locations[self._entries[index][1]]
+
+    def _add_dwell(self, index: int, sign: int) -> None:
+        location = self._location_of(index)
+        self._dwell[location] = self._dwell.get(location, 0) + sign * self._duration(index)
+
+    def add(self, key: Hashable, start: int, location: str) -> None:
+        """
+        Adds an entry. If the key already has an entry, it's replaced.
+        :param key: Key the entry is found by, such as the id of the event it came from
+        :param start: Time from epoch the party arrived at the location
+        :param location: Name of the location
+        :return: None
+        """
+        self.remove(key)
+        entry = (start, key)
+        index = bisect_left(self._entries, entry)
+        if index > 0:
+            self._add_dwell(index - 1, -1)
+        self._entries.insert(index, entry)
+        self._locations[key] = location
+        self._starts[key] = start
+        insort(self._by_location.setdefault(location, []), entry)
+        if index > 0:
+            self._add_dwell(index - 1, 1)
+        self._add_dwell(index, 1)
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Removes the entry of a key if it has one
+        :param key: Key of the entry
+        :return: None
+        """
+        start = self._starts.pop(key, None)
+        if start is None:
+            return
+        entry = (start, key)
+        index = bisect_left(self._entries, entry)
+        if index > 0:
+            self._add_dwell(index - 1, -1)
+        self._add_dwell(index, -1)
+        location = self._locations.pop(key)
+        del self._entries[index]
+        if index > 0:
+            self._add_dwell(index - 1, 1)
+        entries = self._by_location[location]
+        del entries[bisect_left(entries, entry)]
+        if len(entries) == 0:
+            del self._by_location[location]
+            del self._dwell[location]
+
+    def location_at(self, time_from_epoch: int) -> Optional[str]:
+        """
+        Finds where the party was at a time
+        :param time_from_epoch: The time
+        :return: Name of the location, or None if the time is before the first entry
+        """
+        index = bisect_right(self._entries, (time_from_epoch, _AFTER_EVERY_KEY)) - 1
+        if index < 0:
+            return None
+        return self._location_of(index)
+
+    def visits(self, location: str) -> List[Tuple[int, Optional[int]]]:
+        """
+        Finds every visit to a location. Entries following each other at the same location are one visit.
+        :param location: Name of the location
+        :return: List of (arrival, departure) times, ordered by arrival. The departure is None if the party is still
+                 there after the last entry.
+        """
+        result = []
+        for entry in self._by_location.get(location, ()):
+            index = bisect_left(self._entries, entry)
+            if index > 0 and self._location_of(index - 1) == location:
+                continue  # Part of the visit before it
+            last = index
+            while last + 1 < len(self._entries) and self._location_of(last + 1) == location:
+                last += 1
+            departure = self._entries[last + 1][0] if last + 1 < len(self._entries) else None
+            result.append((entry[0], departure))
+        return result
+
+    def dwell_times(self, until: int = None) -> Dict[str, int]:
+        """
+        Totals the hours spent at each location
+        :param until: If given, the stay after the last entry counts up to this time. Otherwise it isn't counted.
+        :return: Hours by location name
+        """
+        dwell = dict(self._dwell)
+        if until is not None and len(self._entries) > 0:
+            last_start, last_key = self._entries[-1]
+            if until > last_start:
+                dwell[self._locations[last_key]] += until - last_start
+        return dwell
+
+    def locations(self) -> List[str]:
+        """
+        Returns every location in the timeline
+        :return: Sorted list of location names
+        """
+        return sorted(self._by_location.keys())
+
+
+class _AfterEveryKey:
+    """ Compares greater than any key, so that bisecting with it finds every entry starting at the same time """
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_AFTER_EVERY_KEY = _AfterEveryKey()
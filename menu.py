@@ -1,9 +1,16 @@
 import curses
 
-from WeatherGenerator import ClimateData
+from WeatherGenerator import get_climate_data, new_seed
+from autosave import Autosaver, autosave_path
 from calendarwindow import CalendarWindow
-from dndcalendar import DnDCalendar
+from campaigndatabase import CAMPAIGN_DATABASE_EXTENSION, CampaignDatabase, is_campaign_database, \
+    open_campaign_database, write_campaign_database
+from campaignfile import is_campaign_file
+from campaignjournal import CampaignJournal, open_campaign, write_campaign
+from dndcalendar import DnDCalendar, HISTORY_CACHE_BYTES
 from gui_utils import draw_box, define_colors, elevation_to_str
+from jsonimport import import_json_save
+from seedsave import SEED_SAVE_EXTENSION, SeedSave, is_seed_save, read_seed_save, write_seed_save
 import tkinter
 from tkinter import filedialog
 from dateprompt import DatePrompt
@@ -11,6 +18,25 @@ from prompts import ClimateAndElevationPrompt, CampaignNamePrompt
 from text_changers import LogoLoader
 import json
 import numpy as np
+from typing import Optional
+
+class ProgressPopupWindow:
+    def __init__(self, text: str):
+        self._window = curses.newwin(5, 21, curses.LINES//2-3, curses.COLS//2-10)
+        self._window.attron(curses.color_pair(1))
+        draw_box(self._window, 0, 0, 5, 21)
+        self._text = text
+        self._percent = None
+        self.update(0, 1)
+
+    def update(self, done: int, total: int):
+        percent = done * 100 // max(total, 1)
+        if percent != self._percent:
+            self._percent = percent
+            s = f"{self._text} {percent:3}%"
+            self._window.addstr(2, 1, f"{s:^18}")
+            self._window.refresh()
+
 
 class ConfirmDialog:
     def __init__(self, confirm_text: str):
@@ -64,6 +90,11 @@ class ConfirmDialog:
             elif char == 10:
                 return win.enter()
 
+
+CAMPAIGN_FILE_TYPES = [("Campaign", "*.dndc"), ("Campaign database", f"*{CAMPAIGN_DATABASE_EXTENSION}"),
+                       ("Seed save", f"*{SEED_SAVE_EXTENSION}"), ("JSON export", "*.json"), ("All files", "*")]
+
+
 class MainMenuWindow:
     def __init__(self):
         """
@@ -101,11 +132,15 @@ class MainMenuWindow:
 
         self._save_name = "Campaign"
         self._save_file = ""
+        self._journal: CampaignJournal = None  # Journal of the campaign file the calendar was loaded from or saved to
+        self._database: CampaignDatabase = None  # Database the calendar reads its history from, if any
+        self._seed_save: SeedSave = None  # Seed save the calendar was loaded from or saved to, if any
+        self._autosaver: Autosaver = None
         self._calendar: DnDCalendar = None
         self._calendar_win = None
         self._climate_selection = 0
         self._elevation_selection = 0
-        self._climates = ClimateData().climates
+        self._climates = get_climate_data().climates
         self._elevations = ["Sea level", "Lowlands", "Highlands"]
 
         self.logo = LogoLoader.load_logo("logo.txt")
@@ -140,8 +175,9 @@ class MainMenuWindow:
             date_info = self._calendar.reckoningHandler.epoch_to_date(self._calendar_win._cursor_time, self._calendar_win._used_calendar)
             self._window.addstr(self.save_start_y+4, self.save_start_x+3, f"Date: {date_info.date_string(short=True)}")
             self._window.addstr(self.save_start_y+5, self.save_start_x+3, f"Time: {date_info.time_string()}")
-            self._window.addstr(self.save_start_y+7, self.save_start_x+3, f"Climate: {self._calendar.climate}")
-            self._window.addstr(self.save_start_y+8, self.save_start_x+3, f"Elevation: {elevation_to_str(self._calendar.elevation)}")
+            climate, elevation = self._calendar.climate_at(self._calendar_win._cursor_time)
+            self._window.addstr(self.save_start_y+7, self.save_start_x+3, f"Climate: {climate}")
+            self._window.addstr(self.save_start_y+8, self.save_start_x+3, f"Elevation: {elevation_to_str(elevation)}")
         else:
             self._window.addstr(self.save_start_y+2, self.save_start_x+3, f"{'No save loaded':^{self.save_info_width-6}}")
 
@@ -200,32 +236,125 @@ class MainMenuWindow:
         else:
             self._elevation_selection = 2
 
-        self._calendar = DnDCalendar(climate=climate, elevation=elevation)
+        self.stop_autosave()
+        if self._calendar_win is not None:
+            self._calendar_win.close()
+        if self._calendar is not None:
+            self._calendar.close_saved_history()
+        self._calendar = DnDCalendar(climate=climate, elevation=elevation, seed=new_seed(),
+                                     history_budget_bytes=HISTORY_CACHE_BYTES)
+        self._save_file = ""
+        self._journal = None
+        self._seed_save = None
+        self.replace_database(None)
         self._calendar_win = CalendarWindow(start_time, self._calendar)
         self._calendar_win._used_calendar = calendar_name
+        self.start_autosave()
 
     def load_campaign(self):
-        f = filedialog.askopenfile()
-        if f is not None:
-            data = json.load(f)
+        path = filedialog.askopenfilename(filetypes=CAMPAIGN_FILE_TYPES)
+        if path:
+            database = None
+            seed_save = None
+            if is_campaign_database(path):
+                calendar, data, database = open_campaign_database(path, history_budget_bytes=HISTORY_CACHE_BYTES)
+                self._save_file = path
+                journal = None
+            elif is_campaign_file(path):
+                calendar, data, journal = open_campaign(path, history_budget_bytes=HISTORY_CACHE_BYTES)
+                self._save_file = path
+            elif is_seed_save(path):
+                calendar, data, seed_save = read_seed_save(path, history_budget_bytes=HISTORY_CACHE_BYTES)
+                self._save_file = path
+                journal = None
+            else:
+                # JSON export or a save from an older version, which can be large, so it's read a piece at a time
+                popup = ProgressPopupWindow("Loading")
+                calendar, data = import_json_save(path, history_budget_bytes=HISTORY_CACHE_BYTES, progress=popup.update)
+                self._save_file = ""
+                journal = None
+            self.stop_autosave()  # It may be reading from the database that's replaced
+            self._journal = journal
+            self._seed_save = seed_save
+            self.replace_database(database)
             self._save_name = data['save_name']
-            self._calendar = DnDCalendar.from_json(data['calendar'])
+            if self._calendar_win is not None:
+                self._calendar_win.close()
+            if self._calendar is not None:
+                self._calendar.close_saved_history()
+            self._calendar = calendar
             self._climates = self._calendar.get_climates()
             self._calendar_win = CalendarWindow(data['current_time'], self._calendar)
             self._calendar_win._used_calendar = data['calendar_used']
-            f.close()
+            self.start_autosave()
             self.run_calendar()
 
+    def save_info(self) -> dict:
+        """
+        What is saved along with the calendar
+        :return: Save name, cursor time and calendar used
+        """
+        return {'save_name': self._save_name, 'current_time': int(self._calendar_win._cursor_time),
+                'calendar_used': self._calendar_win._used_calendar}
+
     def save_campaign(self):
-        data = {}
-        data['calendar'] = self._calendar.to_json()
-        data['save_name'] = self._save_name
-        data['current_time'] = int(self._calendar_win._cursor_time)
-        data['calendar_used'] = self._calendar_win._used_calendar
-        f = filedialog.asksaveasfile()
-        if f is not None:
-            json.dump(data, f)
-        f.close()
+        data = self.save_info()
+        path = filedialog.asksaveasfilename(defaultextension=".dndc", filetypes=CAMPAIGN_FILE_TYPES)
+        if not path:
+            return
+        self.stop_autosave()  # It may be reading from a database that's replaced
+        if path.lower().endswith(".json"):
+            # Exported as JSON, with every hour written out
+            data['calendar'] = self._calendar.to_json()
+            with open(path, 'w') as f:
+                json.dump(data, f)
+        elif path.lower().endswith(CAMPAIGN_DATABASE_EXTENSION):
+            # Only the changes since the last save are written if the calendar was opened from or saved to the same
+            # database
+            self.replace_database(write_campaign_database(path, self._calendar, data, self._database))
+            self._calendar.journal = self._journal = None  # The journal only follows saves into the campaign file
+            self._save_file = path
+        elif path.lower().endswith(SEED_SAVE_EXTENSION) and self._calendar.seed is not None:
+            # Only the seed, the settings, the events and the weather the seed wouldn't give are written. Calendars
+            # without a seed, from older versions, are saved as campaign files instead.
+            self._seed_save = write_seed_save(path, self._calendar, data, self._seed_save)
+            self._calendar.journal = self._journal = None  # The journal only follows saves into the campaign file
+            self.replace_database(None)  # The calendar reads its history from the seed save now
+            self._save_file = path
+        else:
+            # Only the changes since the last save are written if the campaign was last saved to the same file
+            self._journal = write_campaign(path, self._calendar, data, self._journal)
+            self._save_file = path
+        self.start_autosave()
+
+    def start_autosave(self):
+        """
+        Starts autosaving the calendar in the background next to where it was last saved or loaded from, see
+        autosave_path. Changes made before this count as saved.
+        :return: None
+        """
+        self.stop_autosave()
+        self._autosaver = Autosaver(self._calendar, autosave_path(self._save_file), self.save_info)
+        self._autosaver.start()
+
+    def stop_autosave(self):
+        """
+        Stops autosaving, waiting for an autosave that is being written
+        :return: None
+        """
+        if self._autosaver is not None:
+            self._autosaver.stop()
+            self._autosaver = None
+
+    def replace_database(self, database: Optional[CampaignDatabase]):
+        """
+        Closes the database the calendar read its history from, unless it's the same as the new one
+        :param database: Database the calendar reads its history from now, or None
+        :return: None
+        """
+        if self._database is not None and self._database is not database:
+            self._database.close()
+        self._database = database
 
     def continue_campaign(self):
         self.run_calendar()
@@ -283,18 +412,20 @@ class MainMenuWindow:
 
     def enter(self):
         if self._cursor[0] == 3:
+            self.stop_autosave()
             exit()
         elif self._cursor[0] == 2:
             self.start_new()
             self.run_calendar()
         elif self._cursor[0] == 1:
-            result = ClimateAndElevationPrompt.execute(self._calendar.climate, self._calendar.elevation)
+            old_climate, old_elevation = self._calendar.climate_at(self._calendar_win._cursor_time)
+            result = ClimateAndElevationPrompt.execute(old_climate, old_elevation)
             climate = str(result[0])
             elevation = int(result[1])
             print(climate, elevation)
-            if climate != self._calendar.climate:
+            if climate != old_climate:
                 self._calendar.change_climate(new_climate_start_time=self._calendar_win._cursor_time, new_climate=climate)
-            if elevation_to_str(elevation) != elevation_to_str(self._calendar.elevation):
+            if elevation_to_str(elevation) != elevation_to_str(old_elevation):
                 self._calendar.change_elevation(new_elevation_start_time=self._calendar_win._cursor_time, new_elevation=elevation)
         elif self._cursor[0] == 0:
             if self.save_loaded:
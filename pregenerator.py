@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Optional, Tuple
+
+from dndcalendar import DnDCalendar
+
+PREGENERATION_BATCH_HOURS = 24  # Hours generated at a time, so the calendar lock is never held for long
+
+
+class Pregenerator:
+    def __init__(self, calendar: DnDCalendar, ahead: int = 24 * 7, behind: int = 24 * 2):
+        """
+        Generates the hours around a cursor in a background thread, so that scrolling doesn't have to stop and wait
+        for get_time to generate them. The hours in the scroll direction are generated first. All the generating goes
+        through DnDCalendar.pregenerate, which holds the lock of the calendar a batch at a time.
+        :param calendar: Calendar to generate for
+        :param ahead: Hours past the cursor to have generated in the scroll direction
+        :param behind: Hours past the cursor to have generated in the other direction
+        """
+        self._calendar = calendar
+        self._ahead = ahead
+        self._behind = behind
+        self._condition = threading.Condition()
+        self._target: Optional[Tuple[int, int, int]] = None  # (cursor time, direction, margin) still to be generated
+        self._stopped = False
+        self.hours_generated = 0  # Hours the thread has generated
+        self.busy_seconds = 0.0  # Time the thread has spent generating
+        self._thread = threading.Thread(target=self._run, name="Pregenerator", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the thread after the batch it's on
+        :return: None
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def follow(self, cursor_time: int, direction: int = 1, margin: int = 0) -> None:
+        """
+        Tells the thread where the cursor is
+        :param cursor_time: Time from epoch of the cursor
+        :param direction: 1 if scrolling forward in time, -1 if backwards
+        :param margin: Hours on each side of the cursor that are shown, added to the hours ahead and behind
+        :return: None
+        """
+        with self._condition:
+            self._target = (cursor_time, direction, margin)
+            self._condition.notify()
+
+    def _ranges(self, cursor_time: int, direction: int, margin: int) -> Tuple[Tuple[int, int, bool], ...]:
+        """
+        The ranges to generate around the cursor, in the order to generate them in
+        :param cursor_time: Time from epoch of the cursor
+        :param direction: 1 if scrolling forward in time, -1 if backwards
+        :param margin: Hours on each side of the cursor that are shown
+        :return: (start, end, from_end) of the ranges. from_end is set for the range before the cursor, so that the
+                 hours closest to the cursor are generated first.
+        """
+        if direction >= 0:
+            after, before = self._ahead + margin, self._behind + margin
+        else:
+            after, before = self._behind + margin, self._ahead + margin
+        after_range = (cursor_time, cursor_time + after + 1, False)
+        before_range = (cursor_time - before, cursor_time, True)
+        return (after_range, before_range) if direction >= 0 else (before_range, after_range)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and self._target is None:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                target = self._target
+            start = time.perf_counter()
+            generated = 0
+            for range_start, range_end, from_end in self._ranges(*target):
+                generated = self._calendar.pregenerate(range_start, range_end, PREGENERATION_BATCH_HOURS, from_end)
+                if generated > 0:
+                    break
+            self.busy_seconds += time.perf_counter() - start
+            self.hours_generated += generated
+            if generated == 0:
+                with self._condition:
+                    if self._target == target:
+                        self._target = None  # Everything around the cursor is there until it moves
@@ -1,7 +1,7 @@
 import curses
 import curses.textpad
 
-from WeatherGenerator import ClimateData
+from WeatherGenerator import get_climate_data
 from gui_utils import draw_box, define_colors, elevation_to_str
 import numpy as np
 
@@ -102,7 +102,7 @@ class ClimateAndElevationPrompt:
         self.window.addstr(2, 3, "Select climate and elevation: ")
         self.selection = 0
 
-        self.climates = ClimateData().climates
+        self.climates = get_climate_data().climates
         if start_climate is None:
             self.climate_select = 1
         else:
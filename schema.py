@@ -0,0 +1,68 @@
+from typing import Any, Callable, Dict, NamedTuple, Sequence
+
+
+class Field(NamedTuple):
+    """
+    One serialized attribute of a class. Without an encoder or decoder the value is stored as it is. When a save doesn't
+    have the field, it's set to the default, or to the result of default_factory if one is given.
+    """
+    name: str
+    encode: Callable[[Any], Any] = None
+    decode: Callable[[Any], Any] = None
+    default: Any = None
+    default_factory: Callable[[], Any] = None
+
+
+class Schema:
+    def __init__(self, cls: type, fields: Sequence[Field]):
+        """
+        Explicit JSON layout of a class. The encode and decode functions are generated once from the field list, so
+        serializing an object is a single dict display and deserializing it is a run of attribute stores, without
+        looking anything up by reflection. Decoding doesn't call __init__, which also works for frozen dataclasses.
+        :param cls: Class the schema is for
+        :param fields: Serialized attributes in the order they're written
+        """
+        self.cls = cls
+        self.fields = tuple(fields)
+        self.names = tuple(field.name for field in self.fields)
+        self.encode: Callable[[Any], Dict[str, Any]] = self._compile_encoder()
+        self.decode: Callable[[Dict[str, Any]], Any] = self._compile_decoder()
+
+    def _compile_encoder(self) -> Callable[[Any], Dict[str, Any]]:
+        namespace = {}
+        items = []
+        for i, field in enumerate(self.fields):
+            value = f"obj.{field.name}"
+            if field.encode is not None:
+                namespace[f"encode_{i}"] = field.encode
+                value = f"encode_{i}({value})"
+            items.append(f"{field.name!r}: {value}")
+        source = f"def encode(obj):\n    return {{{', '.join(items)}}}\n"
+        return _compile(source, "encode", namespace, self.cls)
+
+    def _compile_decoder(self) -> Callable[[Dict[str, Any]], Any]:
+        namespace = {"cls": self.cls, "new": object.__new__, "setattr": object.__setattr__, "missing": _MISSING}
+        lines = ["def decode(json_obj):", "    obj = new(cls)"]
+        for i, field in enumerate(self.fields):
+            lines.append(f"    value = json_obj.get({field.name!r}, missing)")
+            if field.default_factory is not None:
+                namespace[f"default_{i}"] = field.default_factory
+                default = f"default_{i}()"
+            else:
+                namespace[f"default_{i}"] = field.default
+                default = f"default_{i}"
+            value = "value"
+            if field.decode is not None:
+                namespace[f"decode_{i}"] = field.decode
+                value = f"decode_{i}(value)"
+            lines.append(f"    setattr(obj, {field.name!r}, {default} if value is missing else {value})")
+        lines.append("    return obj")
+        return _compile("\n".join(lines) + "\n", "decode", namespace, self.cls)
+
+
+_MISSING = object()
+
+
+def _compile(source: str, name: str, namespace: Dict[str, Any], cls: type) -> Callable:
+    exec(compile(source, f"<schema {cls.__name__}.{name}>", "exec"), namespace)
+    return namespace[name]
@@ -0,0 +1,186 @@
+import curses
+from curses import textpad
+from typing import List, Optional
+
+from dndcalendar import DnDCalendar, Event
+from gui_utils import define_colors, draw_box
+
+
+class SearchPrompt:
+    def __init__(self, calendar: DnDCalendar, calendar_name: str):
+        """
+        Creates a prompt for searching events by their location and description. The first row is the query, the rows
+        below it are the events found.
+        :param calendar: Calendar to search
+        :param calendar_name: What calendar the dates of the events are shown in
+        """
+        # created in the center of the screen
+        self._window_height = min(20, curses.LINES)
+        self._window_width = min(70, curses.COLS)
+        self._start_x = curses.COLS//2 - self._window_width//2
+        self._start_y = curses.LINES//2 - self._window_height//2
+        self._window = curses.newwin(self._window_height, self._window_width, self._start_y, self._start_x)
+        self._window.attron(curses.color_pair(1))
+        self._calendar = calendar
+        self._calendar_name = calendar_name
+
+        self._query_y_offset = 2
+        self._results_y_offset = 4
+        self._x_offset = 3
+        self._query_width = self._window_width - 2*self._x_offset - len("Search: ")
+        self._max_results = self._window_height - self._results_y_offset - 1
+
+        self._query = ""
+        self._query_chars_entered = 0
+        self._results: List[Event] = []
+        self._current_selection = 0  # 0 is the query, 1 and up are the results
+        self._first_shown_result = 0
+
+    def draw_frame(self) -> None:
+        """
+        Draw the frame for the prompt (borders and stuff)
+        :return: None
+        """
+        draw_box(self._window, 0, 0, self._window_height, self._window_width)
+
+    def draw_query(self) -> None:
+        """
+        Draws the query row
+        :return: None
+        """
+        self._window.addstr(self._query_y_offset, self._x_offset, "Search: ")
+        if self._current_selection == 0:
+            self._window.attron(curses.A_REVERSE)
+        query = self._query if len(self._query) > 0 else "_" * self._query_width
+        self._window.addstr(self._query_y_offset, self._x_offset + len("Search: "), f"{query:<{self._query_width}}")
+        self._window.attroff(curses.A_REVERSE)
+
+    def draw_results(self) -> None:
+        """
+        Draws the events found, scrolled so that the selected one is visible
+        :return: None
+        """
+        width = self._window_width - 2*self._x_offset
+        if len(self._results) == 0 and len(self._query) > 0:
+            self._window.addstr(self._results_y_offset, self._x_offset, f"{'No events found':<{width}}")
+            for row in range(1, self._max_results):
+                self._window.addstr(self._results_y_offset + row, self._x_offset, " " * width)
+            return
+        for row in range(self._max_results):
+            i = self._first_shown_result + row
+            if i >= len(self._results):
+                self._window.addstr(self._results_y_offset + row, self._x_offset, " " * width)
+                continue
+            event = self._results[i]
+            date_info = self._calendar.reckoningHandler.epoch_to_date(event.start_time_epoch, self._calendar_name)
+            result_str = f"{date_info.date_string(short=True)} {date_info.time_string()} {event.location}: " \
+                         f"{event.description}"
+            if self._current_selection == i + 1:
+                self._window.attron(curses.A_REVERSE)
+            self._window.addstr(self._results_y_offset + row, self._x_offset, f"{result_str[:width]:<{width}}")
+            self._window.attroff(curses.A_REVERSE)
+
+    def edit_query(self) -> None:
+        """
+        Lets the user type the query and then searches with it
+        :return: None
+        """
+        win = curses.newwin(1, self._query_width + 1, self._start_y + self._query_y_offset,
+                            self._start_x + self._x_offset + len("Search: "))
+        win.attron(curses.color_pair(1))
+        curses.curs_set(True)
+        win.addstr(0, 0, self._query)
+        self._query_chars_entered = len(self._query)
+        pad = textpad.Textbox(win)
+        self._query = pad.edit(self.enter_is_terminate)[:self._query_width].strip()
+        curses.curs_set(False)
+        del pad
+        del win
+        self._results = self._calendar.search_events(self._query)
+        self._first_shown_result = 0
+        self._current_selection = 1 if len(self._results) > 0 else 0
+
+    def enter_is_terminate(self, x):
+        if x == 10:
+            return 7
+        elif x == 8 and self._query_chars_entered > 0:
+            self._query_chars_entered -= 1
+            return x
+        elif x == 8 and self._query_chars_entered <= 0:
+            return ""
+        elif self._query_chars_entered < self._query_width:
+            self._query_chars_entered += 1
+            return x
+
+    def up(self) -> None:
+        if self._current_selection > 0:
+            self._current_selection -= 1
+            if 0 < self._current_selection <= self._first_shown_result:
+                self._first_shown_result = self._current_selection - 1
+
+    def down(self) -> None:
+        if self._current_selection < len(self._results):
+            self._current_selection += 1
+            if self._current_selection > self._first_shown_result + self._max_results:
+                self._first_shown_result = self._current_selection - self._max_results
+
+    def enter(self) -> Optional[int]:
+        """
+        Edits the query if it's selected. If an event is selected, returns its start time.
+        :return: Start time of the selected event as time since epoch, or None
+        """
+        if self._current_selection == 0:
+            self.edit_query()
+            return None
+        return self._results[self._current_selection - 1].start_time_epoch
+
+    @staticmethod
+    def execute(calendar: DnDCalendar, calendar_name: str) -> Optional[int]:
+        """
+        Shows the prompt until an event is picked or the prompt is closed with q
+        :param calendar: Calendar to search
+        :param calendar_name: What calendar the dates of the events are shown in
+        :return: Start time of the picked event as time since epoch, or None if nothing was picked
+        """
+        win = SearchPrompt(calendar, calendar_name)
+        win.redraw()
+        win.edit_query()
+        while True:
+            win.redraw()
+            char = win._window.getch()
+            if char == ord('q'):
+                break  # q
+            elif char == ord('w'):
+                win.up()
+            elif char == ord('s'):
+                win.down()
+            elif char == 10:
+                r = win.enter()
+                if r is not None:
+                    del win
+                    return r
+        return None
+
+    def redraw(self):
+        self.draw_frame()
+        self.draw_query()
+        self.draw_results()
+        self._window.refresh()
+
+
+def main(stdscr):
+    curses.noecho()
+    curses.curs_set(0)
+    curses.cbreak()
+    stdscr.nodelay(0)
+    stdscr.keypad(True)
+    define_colors()
+    stdscr.clear()
+    calendar = DnDCalendar()
+    calendar.add_event(Event("Denford", "The dragon attacks the town", 100000*24+10, 4))
+    calendar.add_event(Event("Dragonspear", "Arrival at the castle", 100000*24+40, 2))
+    print(SearchPrompt.execute(calendar, 'human'))
+
+
+if __name__ == "__main__":
+    curses.wrapper(main)
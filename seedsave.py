@@ -0,0 +1,369 @@
+import json
+import os
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from WeatherGenerator import GeneratorCheckpoint, WEATHER_BLOCK_DTYPE
+from campaignfile import InvalidCampaignFileException
+from dndcalendar import DnDCalendar, HISTORY_CHUNK_HOURS, block_from_json, block_to_json, checkpoints_from_json, \
+    checkpoints_to_json
+from intervalset import IntervalSet
+
+SEED_SAVE_MAGIC = b"DNDSEED\0"
+SEED_SAVE_VERSION = 1
+SEED_SAVE_EXTENSION = ".dnds"
+_HEADER = struct.Struct("<8sH")  # Magic and version, followed by the zlib compressed JSON of the save
+
+
+class UnseededCalendarException(Exception):
+    """ Exception raised when a calendar without a seed is saved as a seed save, as its weather can't be regenerated
+
+        Attributes:
+            message -- explanation of the error
+    """
+
+    def __init__(self, message: str = "Only a calendar with a seed can be saved as a seed save"):
+        self.message = message
+        super().__init__(self.message)
+
+
+def is_seed_save(path: str) -> bool:
+    """
+    Checks whether a file is a seed save, as opposed to a campaign file or a JSON save
+    :param path: Path of the file
+    :return: True if the file starts with the seed save magic
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(SEED_SAVE_MAGIC)) == SEED_SAVE_MAGIC
+
+
+def _hour_mask(hours: IntervalSet, start_time_from_epoch: int, end_time_from_epoch: int) -> np.ndarray:
+    """
+    Marks the hours of a range that are in a set
+    :param hours: The set
+    :param start_time_from_epoch: The first hour of the range
+    :param end_time_from_epoch: The hour after the last one
+    :return: Array of bools, one per hour of the range
+    """
+    mask = np.zeros(end_time_from_epoch - start_time_from_epoch, dtype=bool)
+    for start, end in hours.overlapping(start_time_from_epoch, end_time_from_epoch):
+        mask[start - start_time_from_epoch:end - start_time_from_epoch] = True
+    return mask
+
+
+def _rows_differ(block: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """
+    Compares two weather blocks bit by bit
+    :param block: Array of WEATHER_BLOCK_DTYPE
+    :param other: Array of WEATHER_BLOCK_DTYPE of the same length
+    :return: Array of bools, True where the hours differ
+    """
+    itemsize = WEATHER_BLOCK_DTYPE.itemsize
+    return np.any(np.ascontiguousarray(block).view(np.uint8).reshape(-1, itemsize) !=
+                  np.ascontiguousarray(other).view(np.uint8).reshape(-1, itemsize), axis=1)
+
+
+def _is_stale_checkpoint(time_from_epoch: int, stale_hours: IntervalSet) -> bool:
+    """
+    Checks whether a checkpoint is replaced when stale hours are regenerated. That's the case if any hour from it to
+    the end of its day is stale, even when the checkpoint is at the start of a day whose generated hours start later.
+    :param time_from_epoch: Time of the checkpoint
+    :param stale_hours: Hours waiting to be regenerated
+    :return: True if the checkpoint is stale
+    """
+    return len(stale_hours.overlapping(time_from_epoch, (time_from_epoch // 24 + 1) * 24)) > 0
+
+
+class SeedSave:
+    def __init__(self, info: Dict[str, object], calendar_json: dict, hours: IntervalSet,
+                 overrides: Dict[int, dict]):
+        """
+        The smallest save of a seeded calendar. Its weather is a function of the seed and the climate timeline, so only
+        the settings, the events, which hours have been generated and the weather that the seed wouldn't give are kept.
+        That is weather generated by older versions, such as the hours of an upgraded save. The weather of a
+        chunk is computed again when it's first used, so opening the save takes no longer than a small one.
+        Use open() to read a save and write_seed_save() to write one.
+        :param info: Save name, cursor time and calendar used, or whatever else the file should remember
+        :param calendar_json: The calendar save without its history, see DnDCalendar.to_json
+        :param hours: The generated hours
+        :param overrides: By chunk index, the chunks whose saved weather or checkpoints differ from the computed ones:
+                          'hours' runs of the hours whose weather differs, 'weather' the weather of those hours in
+                          order, see block_to_json, 'checkpoints' the checkpoints that differ and 'removed_checkpoints'
+                          the computed checkpoints that weren't saved
+        """
+        self.info = info
+        self.calendar_json = calendar_json
+        self.hours = hours
+        self.chunk_indexes = sorted({t // HISTORY_CHUNK_HOURS for start, end in hours
+                                     for t in range(start - start % HISTORY_CHUNK_HOURS, end, HISTORY_CHUNK_HOURS)})
+        self.overrides = overrides
+        self.calendar: Optional[DnDCalendar] = None  # Computes the weather of the chunks, set once it's loaded
+        # The last chunk computed, as its checkpoints are read right before its weather
+        self._computed: Optional[Tuple[int, np.ndarray, Dict[int, GeneratorCheckpoint]]] = None
+
+    def bind(self, calendar: DnDCalendar) -> "SeedSave":
+        """
+        Copies the save for another calendar to compute the chunks with, such as a snapshot of the one it was loaded
+        into, see DnDCalendar.snapshot
+        :param calendar: The calendar
+        :return: SeedSave
+        """
+        bound = SeedSave(self.info, self.calendar_json, self.hours, self.overrides)
+        bound.calendar = calendar
+        return bound
+
+    @staticmethod
+    def open(path: str) -> "SeedSave":
+        """
+        Reads a seed save
+        :param path: Path of the file
+        :return: SeedSave
+        :raises InvalidCampaignFileException: If the file isn't a seed save, or is from a newer version
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER.size or data[:len(SEED_SAVE_MAGIC)] != SEED_SAVE_MAGIC:
+            raise InvalidCampaignFileException(path, "{} is not a seed save")
+        _, version = _HEADER.unpack_from(data, 0)
+        if version > SEED_SAVE_VERSION:
+            raise InvalidCampaignFileException(path, f"{{}} is from a newer version {version} of the seed save format "
+                                                     f"than the supported version {SEED_SAVE_VERSION}")
+        save = json.loads(zlib.decompress(data[_HEADER.size:]))
+        return SeedSave(save['info'], save['calendar'], IntervalSet(save['hours']),
+                        {int(key): val for key, val in save['overrides'].items()})
+
+    def _compute(self, chunk_index: int) -> Tuple[np.ndarray, Dict[int, GeneratorCheckpoint]]:
+        """
+        Computes the weather and the checkpoints of a chunk and applies its overrides
+        :param chunk_index: Index of the chunk
+        :return: Weather block of WEATHER_BLOCK_DTYPE covering the chunk and the checkpoints by time from epoch
+        """
+        if self._computed is not None and self._computed[0] == chunk_index:
+            return self._computed[1:]
+        block, checkpoints = self.calendar.recompute_chunk(chunk_index)
+        chunk_overrides = self.overrides.get(chunk_index)
+        if chunk_overrides is not None:
+            start = chunk_index * HISTORY_CHUNK_HOURS
+            mask = _hour_mask(IntervalSet(chunk_overrides['hours']), start, start + HISTORY_CHUNK_HOURS)
+            block[mask] = block_from_json(chunk_overrides['weather'], int(np.count_nonzero(mask)))
+            checkpoints.update(checkpoints_from_json(chunk_overrides['checkpoints']))
+            for t in chunk_overrides['removed_checkpoints']:
+                checkpoints.pop(t, None)
+        self._computed = (chunk_index, block, checkpoints)
+        return block, checkpoints
+
+    def read_chunk(self, chunk_index: int) -> Dict[str, np.ndarray]:
+        """
+        Computes the weather of a chunk
+        :param chunk_index: Index of the chunk
+        :return: Weather columns by WEATHER_BLOCK_DTYPE field
+        """
+        block, _ = self._compute(chunk_index)
+        self._computed = None
+        return {name: np.ascontiguousarray(block[name]) for name in WEATHER_BLOCK_DTYPE.names}
+
+    def read_checkpoints(self, chunk_index: int) -> Dict[int, GeneratorCheckpoint]:
+        """
+        Computes the generator checkpoints of a chunk
+        :param chunk_index: Index of the chunk
+        :return: Checkpoints by time from epoch
+        """
+        return dict(self._compute(chunk_index)[1])
+
+
+def _chunk_overrides(calendar: DnDCalendar, chunk_index: int, stale_hours: IntervalSet) -> Optional[dict]:
+    """
+    Finds the weather and the checkpoints of a chunk that differ from the computed ones. Stale hours and checkpoints
+    are left out, as they're regenerated before they're used.
+    :param calendar: The calendar
+    :param chunk_index: Index of the chunk
+    :param stale_hours: Hours waiting to be regenerated
+    :return: The overrides of the chunk, see SeedSave, or None if it's as computed
+    """
+    start = chunk_index * HISTORY_CHUNK_HOURS
+    end = start + HISTORY_CHUNK_HOURS
+    saved = calendar.history.read_block(start, end)
+    saved_checkpoints = calendar.chunk_checkpoints(chunk_index)
+    computed, computed_checkpoints = calendar.recompute_chunk(chunk_index)
+    differs = _hour_mask(calendar.history.generated_hours, start, end) & ~_hour_mask(stale_hours, start, end) & \
+        _rows_differ(saved, computed)
+    checkpoints = {t: checkpoint for t, checkpoint in saved_checkpoints.items()
+                   if not _is_stale_checkpoint(t, stale_hours) and (
+                       t not in computed_checkpoints or computed_checkpoints[t].to_json() != checkpoint.to_json())}
+    removed = [t for t in computed_checkpoints
+               if t not in saved_checkpoints and not _is_stale_checkpoint(t, stale_hours)]
+    if not differs.any() and len(checkpoints) == 0 and len(removed) == 0:
+        return None
+    hours = IntervalSet.from_points(int(t) + start for t in np.flatnonzero(differs))
+    return {'hours': [[run_start, run_end] for run_start, run_end in hours], 'weather': block_to_json(saved[differs]),
+            'checkpoints': checkpoints_to_json(checkpoints), 'removed_checkpoints': removed}
+
+
+def write_seed_save(path: str, calendar: DnDCalendar, info: Dict[str, object],
+                    seed_save: SeedSave = None) -> SeedSave:
+    """
+    Saves a seeded calendar into a seed save. Every chunk is computed again to find the weather the seed wouldn't
+    give, except for chunks that haven't changed since they were read from or written to the given seed save. The
+    calendar reads its history from the new save from then on. The file is written next to the path and then moved
+    over it, so a save that fails midway leaves the old file as it was.
+    :param path: Path to save to
+    :param calendar: The calendar
+    :param info: Save name, cursor time and calendar used, or whatever else the file should remember
+    :param seed_save: The seed save the calendar was last read from or written to, if any
+    :return: The written save
+    :raises UnseededCalendarException: If the calendar has no seed
+    """
+    if calendar.seed is None:
+        raise UnseededCalendarException()
+    temporary_path = f"{path}.tmp"
+    with calendar.lock:
+        calendar_json = calendar.to_json(weather=False)
+        stale_hours = IntervalSet(calendar_json['stale'])
+        chunk_indexes = calendar.history.chunk_indexes()
+        unsaved = set(calendar.unsaved_chunks(seed_save))
+        overrides = {}
+        for chunk_index in chunk_indexes:
+            if chunk_index in unsaved:
+                chunk_overrides = _chunk_overrides(calendar, chunk_index, stale_hours)
+            else:
+                chunk_overrides = seed_save.overrides.get(chunk_index)
+            if chunk_overrides is not None:
+                overrides[chunk_index] = chunk_overrides
+        written = SeedSave(info, calendar_json, IntervalSet(calendar.history.generated_hours), overrides)
+        save = {'info': info, 'calendar': calendar_json,
+                'hours': [[start, end] for start, end in written.hours], 'overrides': overrides}
+        with open(temporary_path, 'wb') as f:
+            f.write(_HEADER.pack(SEED_SAVE_MAGIC, SEED_SAVE_VERSION))
+            f.write(zlib.compress(json.dumps(save, separators=(',', ':')).encode(), 9))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+        written.calendar = calendar
+        calendar.history_saved(written, chunk_indexes)
+    return written
+
+
+def read_seed_save(path: str, history_budget_bytes: int = None) -> Tuple[DnDCalendar, Dict[str, object], SeedSave]:
+    """
+    Opens a seed save. The weather of the history is computed a chunk at a time as it's used.
+    :param path: Path of the file
+    :param history_budget_bytes: Memory the weather of the history may take, see DnDCalendar
+    :return: The calendar, the info it was saved with and the save, which the calendar reads its history from
+    :raises InvalidCampaignFileException: If the file isn't a seed save, or is from a newer version
+    """
+    seed_save = SeedSave.open(path)
+    calendar = DnDCalendar.from_json(seed_save.calendar_json, history_budget_bytes=history_budget_bytes)
+    seed_save.calendar = calendar
+    calendar.attach_saved_history(seed_save)
+    return calendar, seed_save.info, seed_save
+
+
+@dataclass
+class SeedSaveVerification:
+    """ How the history of a calendar compares with the one regenerated from its seed save """
+    hours_compared: int = 0
+    stale_hours: int = 0  # Skipped, as they're regenerated before they're used
+    mismatched_hours: IntervalSet = field(default_factory=IntervalSet)  # Differing, or generated in only one of them
+    mismatched_checkpoints: List[int] = field(default_factory=list)
+
+    @property
+    def identical(self) -> bool:
+        return len(self.mismatched_hours) == 0 and len(self.mismatched_checkpoints) == 0
+
+
+def verify_seed_save(original: DnDCalendar, regenerated: DnDCalendar, start_time_from_epoch: int = None,
+                     end_time_from_epoch: int = None) -> SeedSaveVerification:
+    """
+    Checks that the weather and the generator checkpoints regenerated from a seed save are bit for bit the same as in
+    the calendar that was saved. Hours and checkpoints that are stale in either calendar are skipped. Goes through the history a
+    chunk at a time, so calendars with a history budget stay within it.
+    :param original: The calendar that was saved
+    :param regenerated: The calendar opened from the seed save
+    :param start_time_from_epoch: The first hour to compare, by default the first generated hour
+    :param end_time_from_epoch: The hour after the last one to compare, by default the end of the history
+    :return: SeedSaveVerification
+    """
+    hours = IntervalSet(original.history.generated_hours)
+    for start, end in regenerated.history.generated_hours:
+        hours.add(start, end)
+    result = SeedSaveVerification()
+    if len(hours) == 0:
+        return result
+    if start_time_from_epoch is None:
+        start_time_from_epoch = next(iter(hours))[0]
+    if end_time_from_epoch is None:
+        end_time_from_epoch = hours.end
+    stale_hours = IntervalSet(original.to_json(weather=False)['stale'])
+    for start, end in regenerated.to_json(weather=False)['stale']:
+        stale_hours.add(start, end)
+    first = start_time_from_epoch // HISTORY_CHUNK_HOURS
+    last = (end_time_from_epoch - 1) // HISTORY_CHUNK_HOURS
+    for chunk_index in range(first, last + 1):
+        start = max(chunk_index * HISTORY_CHUNK_HOURS, start_time_from_epoch)
+        end = min((chunk_index + 1) * HISTORY_CHUNK_HOURS, end_time_from_epoch)
+        if len(hours.overlapping(start, end)) == 0:
+            continue
+        generated = _hour_mask(original.history.generated_hours, start, end)
+        regenerated_hours = _hour_mask(regenerated.history.generated_hours, start, end)
+        stale = _hour_mask(stale_hours, start, end)
+        compared = (generated | regenerated_hours) & ~stale
+        mismatched = compared & ((generated != regenerated_hours) | _rows_differ(
+            original.history.read_block(start, end), regenerated.history.read_block(start, end)))
+        result.hours_compared += int(np.count_nonzero(compared))
+        result.stale_hours += int(np.count_nonzero(stale & (generated | regenerated_hours)))
+        for t in np.flatnonzero(mismatched):
+            result.mismatched_hours.add(start + int(t), start + int(t) + 1)
+        checkpoints = {t: checkpoint.to_json() for t, checkpoint in original.chunk_checkpoints(chunk_index).items()
+                       if start <= t < end and not _is_stale_checkpoint(t, stale_hours)}
+        regenerated_checkpoints = {t: checkpoint.to_json()
+                                   for t, checkpoint in regenerated.chunk_checkpoints(chunk_index).items()
+                                   if start <= t < end and not _is_stale_checkpoint(t, stale_hours)}
+        result.mismatched_checkpoints.extend(sorted(t for t in checkpoints.keys() | regenerated_checkpoints.keys()
+                                                    if checkpoints.get(t) != regenerated_checkpoints.get(t)))
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from campaigndatabase import is_campaign_database, open_campaign_database
+    from campaignfile import is_campaign_file, read_campaign_file
+    from jsonimport import import_json_save
+    # Saves a campaign as a seed save and checks that the history regenerated from it is the same, over the whole
+    # history or the given hours: seedsave.py campaign.dndc seed.dnds [start end]
+
+    def open_original():
+        if is_campaign_database(sys.argv[1]):
+            calendar, calendar_info, _ = open_campaign_database(sys.argv[1])
+        elif is_campaign_file(sys.argv[1]):
+            calendar, calendar_info = read_campaign_file(sys.argv[1])
+        else:
+            calendar, calendar_info = import_json_save(sys.argv[1])
+        calendar.show_generating_popup = False
+        return calendar, calendar_info
+
+    saved, info = open_original()
+    start = time.perf_counter()
+    written = write_seed_save(sys.argv[2], saved, info)
+    print(f"Saved {saved.history.generated_hours.total_length} hours in {time.perf_counter() - start:.2f} s, "
+          f"{os.path.getsize(sys.argv[2]) / 2**10:.1f} KiB against {os.path.getsize(sys.argv[1]) / 2**10:.1f} KiB, "
+          f"{len(written.overrides)} chunks with overrides")
+    start = time.perf_counter()
+    regenerated, _, _ = read_seed_save(sys.argv[2])
+    regenerated.show_generating_popup = False
+    print(f"Opened in {(time.perf_counter() - start) * 1e3:.1f} ms")
+    start = time.perf_counter()
+    bounds = [int(arg) for arg in sys.argv[3:5]]
+    original, _ = open_original()  # The saved calendar reads its history from the seed save now
+    verification = verify_seed_save(original, regenerated, *bounds)
+    print(f"Compared {verification.hours_compared} hours in {time.perf_counter() - start:.2f} s, skipped "
+          f"{verification.stale_hours} stale hours")
+    if not verification.identical:
+        print(f"Mismatched hours {list(verification.mismatched_hours)[:10]}, checkpoints "
+              f"{verification.mismatched_checkpoints[:10]}")
+        sys.exit(1)
+    print("Bit-identical")
@@ -1,3 +1,8 @@
+from WeatherGenerator import Weather
+from weathercodes import PrecipitationType, CLOUD_COVER_LABELS, CLOUD_COVER_SYMBOLS, PRECIPITATION_LABELS, \
+    PRECIPITATION_SYMBOLS
+
+
 class TextBiggener:
     def __init__(self):
         self._big_numbers = self._parse_file("big_numbers.txt")
@@ -74,43 +79,36 @@ class LogoLoader:
 class WeatherSymbols:
     def __init__(self):
         self._symbols = TextBiggener._parse_file("weather_icons.txt", equal_width=True)
+        for symbol in self._symbols:
+            longest_line = 0
+            for s in symbol:
+                if len(s) > longest_line:
+                    longest_line = len(s)
+            for i in range(len(symbol)):
+                symbol[i] = f"{symbol[i]: <{longest_line}}"
 
     def _find_symbol(self, weather_str: str):
-        weather_str = weather_str.lower()
-        if weather_str == "":
-            return self._symbols[0]
-        elif weather_str.find("overcast") != -1:
-            return self._symbols[1]
-        elif weather_str.find("clouds") != -1:
-            return self._symbols[10]
-        elif weather_str.find("fog") != -1:
-            return self._symbols[2]
-        elif weather_str.find("rain") != -1:
-            if weather_str.find("light") != -1:
-                return self._symbols[3]
-            else:
-                return self._symbols[4]
-        elif weather_str.find("snow") != -1:
-            if weather_str.find("light") != -1:
-                return self._symbols[5]
-            else:
-                return self._symbols[6]
-        elif weather_str == "thunderstorm":
-            return self._symbols[7]
-        elif weather_str.find('drizzle') != -1:
-            return self._symbols[9]
+        if weather_str in PRECIPITATION_LABELS[1:]:
+            return self._symbols[PRECIPITATION_SYMBOLS[PRECIPITATION_LABELS.index(weather_str)]]
+        elif weather_str in CLOUD_COVER_LABELS:
+            return self._symbols[CLOUD_COVER_SYMBOLS[CLOUD_COVER_LABELS.index(weather_str)]]
         else:
             return self._symbols[8]
 
+    def weather_to_symbol(self, weather: Weather):
+        """
+        Returns the symbol for the weather: the precipitation if there is any, otherwise the cloud cover
+        :param weather: Weather to draw
+        :return: Lines of the symbol
+        """
+        if weather.precipitation_state != PrecipitationType.NONE:
+            return list(self._symbols[PRECIPITATION_SYMBOLS[weather.precipitation_state]])
+        return list(self._symbols[CLOUD_COVER_SYMBOLS[weather.cloud_cover]])
+
     def weather_string_to_symbol(self, weather_str: str, add_string: bool = False):
-        symbol = self._find_symbol(weather_str)
-        longest_line = 0
-        for s in symbol:
-            if len(s) > longest_line:
-                longest_line = len(s)
-        for i in range(len(symbol)):
-            symbol[i] = f"{symbol[i]: <{longest_line}}"
+        symbol = list(self._find_symbol(weather_str))
         if add_string:
+            longest_line = len(symbol[0]) if len(symbol) > 0 else 0
             if weather_str == "":
                 weather_str = "Sunny"
             symbol.append("")
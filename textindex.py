@@ -0,0 +1,96 @@
+import re
+from bisect import bisect_left, insort
+from typing import Dict, Hashable, List, Set, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into case-folded words
+    :param text: Text to split
+    :return: Words in the order they appear, duplicates included
+    """
+    return _TOKEN_PATTERN.findall(text.casefold())
+
+
+class TextIndex:
+    def __init__(self):
+        """
+        Inverted index from words to the keys of the texts they appear in. The distinct words are also kept sorted, so
+        every word starting with a prefix can be found with a bisect. Texts are added and removed one at a time, so the
+        index is kept up to date instead of being rebuilt.
+        """
+        self._postings: Dict[str, Set[Hashable]] = {}
+        self._words: List[str] = []  # Sorted distinct words
+        self._tokens: Dict[Hashable, Tuple[str, ...]] = {}  # The words each key was indexed under
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tokens
+
+    def add(self, key: Hashable, text: str) -> None:
+        """
+        Indexes a text. If the key already has a text, it's replaced.
+        :param key: Key the text is found by
+        :param text: Text to index
+        :return: None
+        """
+        self.remove(key)
+        tokens = tuple(set(tokenize(text)))
+        self._tokens[key] = tokens
+        for token in tokens:
+            keys = self._postings.get(token)
+            if keys is None:
+                keys = self._postings[token] = set()
+                insort(self._words, token)
+            keys.add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Removes the text of a key if it has one
+        :param key: Key of the text
+        :return: None
+        """
+        tokens = self._tokens.pop(key, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            keys = self._postings[token]
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._postings[token]
+                del self._words[bisect_left(self._words, token)]
+
+    def _prefix_matches(self, prefix: str) -> Set[Hashable]:
+        """
+        Finds the keys of the texts with a word starting with the prefix
+        :param prefix: Case-folded prefix
+        :return: Set of keys
+        """
+        found = set()
+        i = bisect_left(self._words, prefix)
+        while i < len(self._words) and self._words[i].startswith(prefix):
+            found.update(self._postings[self._words[i]])
+            i += 1
+        return found
+
+    def search(self, query: str) -> Set[Hashable]:
+        """
+        Finds the texts that have every word of the query. Each query word matches any word it's the start of, so
+        "drag" finds "dragon" and "Dragonspear".
+        :param query: Words to look for
+        :return: Set of keys of the matching texts. Empty if the query has no words.
+        """
+        prefixes = sorted(set(tokenize(query)), key=len, reverse=True)
+        if len(prefixes) == 0:
+            return set()
+        # The longest prefixes usually match the fewest texts, so they're intersected first
+        found = self._prefix_matches(prefixes[0])
+        for prefix in prefixes[1:]:
+            if len(found) == 0:
+                break
+            found &= self._prefix_matches(prefix)
+        return found
@@ -0,0 +1,132 @@
+from enum import IntEnum
+from typing import Tuple, Union
+
+
+class PrecipitationType(IntEnum):
+    """ Kind of precipitation. The values are also the codes used in weather blocks and saves. """
+    NONE = 0
+    LIGHT_FOG = 1
+    MEDIUM_FOG = 2
+    DRIZZLE = 3
+    LIGHT_RAIN = 4
+    LIGHT_SNOW = 5
+    HEAVY_FOG = 6
+    RAIN = 7
+    MEDIUM_SNOW = 8
+    HEAVY_RAIN = 9
+    THUNDERSTORM = 10
+    HEAVY_SNOW = 11
+
+    @property
+    def label(self) -> str:
+        return PRECIPITATION_LABELS[self]
+
+    @staticmethod
+    def from_label(label: str) -> "PrecipitationType":
+        """
+        Finds the precipitation type with the given display string
+        :param label: Display string, such as "Light rain"
+        :return: PrecipitationType
+        :raises ValueError: If there is no such precipitation type
+        """
+        return PRECIPITATION_TYPES[PRECIPITATION_LABELS.index(label)]
+
+    @staticmethod
+    def from_json(value: Union[int, str]) -> "PrecipitationType":
+        """
+        Reads a precipitation type from a save. Older saves have the display string instead of the code.
+        :param value: Code or display string
+        :return: PrecipitationType, NONE if the string is not recognized
+        """
+        return _from_json(PRECIPITATION_TYPES, PRECIPITATION_LABELS, value)
+
+
+class WindStrength(IntEnum):
+    """ Wind speed classification as per pathfinder 1E rules """
+    LIGHT = 0
+    MODERATE = 1
+    STRONG = 2
+    SEVERE = 3
+    WINDSTORM = 4
+
+    @property
+    def label(self) -> str:
+        return WIND_STRENGTH_LABELS[self]
+
+    @staticmethod
+    def from_label(label: str) -> "WindStrength":
+        """
+        Finds the wind strength with the given display string
+        :param label: Display string, such as "Strong winds"
+        :return: WindStrength
+        :raises ValueError: If there is no such wind strength
+        """
+        return WIND_STRENGTHS[WIND_STRENGTH_LABELS.index(label)]
+
+    @staticmethod
+    def from_json(value: Union[int, str]) -> "WindStrength":
+        """
+        Reads a wind strength from a save. Older saves have the display string instead of the code.
+        :param value: Code or display string
+        :return: WindStrength, LIGHT if the string is not recognized
+        """
+        return _from_json(WIND_STRENGTHS, WIND_STRENGTH_LABELS, value)
+
+
+class CloudCover(IntEnum):
+    """ How much of the sky is covered by clouds """
+    CLEAR = 0
+    LIGHT = 1
+    MEDIUM = 2
+    OVERCAST = 3
+
+    @property
+    def label(self) -> str:
+        return CLOUD_COVER_LABELS[self]
+
+    @staticmethod
+    def from_label(label: str) -> "CloudCover":
+        """
+        Finds the cloud cover with the given display string
+        :param label: Display string, such as "Overcast"
+        :return: CloudCover
+        :raises ValueError: If there is no such cloud cover
+        """
+        return CLOUD_COVERS[CLOUD_COVER_LABELS.index(label)]
+
+    @staticmethod
+    def from_json(value: Union[int, str]) -> "CloudCover":
+        """
+        Reads a cloud cover from a save. Older saves have the display string instead of the code.
+        :param value: Code or display string
+        :return: CloudCover, CLEAR if the string is not recognized
+        """
+        return _from_json(CLOUD_COVERS, CLOUD_COVER_LABELS, value)
+
+
+def _from_json(members: tuple, labels: Tuple[str, ...], value: Union[int, str]):
+    if isinstance(value, str):
+        return members[labels.index(value)] if value in labels else members[0]
+    return members[value]
+
+
+# Members by code. Indexing these is a lot cheaper than calling the enum.
+PRECIPITATION_TYPES: Tuple[PrecipitationType, ...] = tuple(PrecipitationType)
+WIND_STRENGTHS: Tuple[WindStrength, ...] = tuple(WindStrength)
+CLOUD_COVERS: Tuple[CloudCover, ...] = tuple(CloudCover)
+
+# Display strings by code
+PRECIPITATION_LABELS: Tuple[str, ...] = ("", "Light fog", "Medium fog", "Drizzle", "Light rain", "Light snow",
+                                         "Heavy fog", "Rain", "Medium snow", "Heavy rain", "Thunderstorm", "Heavy snow")
+WIND_STRENGTH_LABELS: Tuple[str, ...] = ("Light winds", "Moderate winds", "Strong winds", "Severe winds", "Windstorm")
+CLOUD_COVER_LABELS: Tuple[str, ...] = ("", "Light clouds", "Medium clouds", "Overcast")
+
+# Index of the symbol in weather_icons.txt by code. Without precipitation the cloud cover symbol is used instead.
+PRECIPITATION_SYMBOLS: Tuple[int, ...] = (0, 2, 2, 9, 3, 5, 2, 4, 6, 4, 7, 6)
+CLOUD_COVER_SYMBOLS: Tuple[int, ...] = (0, 10, 10, 1)
+
+# Warning symbols by code, as (plain, unicode)
+PRECIPITATION_WARNINGS: Tuple[Tuple[str, str], ...] = (("", ""),
+                                                       ("F", "🌫"), ("F", "🌫"), ("R", "🌧"), ("R", "🌧"),
+                                                       ("R", "🌧"), ("F", "🌫"), ("R", "🌧"), ("R", "🌧"),
+                                                       ("R", "🌧"), ("S", "⛈"), ("R", "🌧"))